@@ -38,6 +38,8 @@ a = Analysis(
         'numpy.lib.format',
         'numpy.core._dtype_ctypes',
         'pkg_resources.py2_warn',
+        # forkserver服务进程按模块名导入
+        'src.core.worker_preload',
     ],
     hookspath=[],
     hooksconfig={},
@@ -17,6 +17,17 @@ MAIN_WINDOW_HEIGHT = 600
 SETTINGS_WINDOW_WIDTH = 500
 SETTINGS_WINDOW_HEIGHT = 500
 
+# 界面读取后台处理状态的间隔（毫秒）
+UI_POLL_INTERVAL_MS = 100
+
+# 界面的处理任务在子进程中执行，每个子进程最多处理多少个任务后替换为新进程（释放处理产生的内存）；None表示在界面进程内处理
+UI_WORKER_MAX_JOBS = 20
+
+# 工作进程（界面、批量处理、收件箱监听、HTTP任务服务）的启动方式："forkserver"（服务进程预先导入处理模块并载入模板，工作进程由它fork产生，
+# 启动只需几毫秒）或"spawn"（每个工作进程重新导入模块，启动时载入模板）。
+# Windows和打包后的程序不支持forkserver，始终使用spawn，预加载不起作用
+WORKER_START_METHOD = "forkserver"
+
 # 文件路径配置
 PROJECT_ROOT = Path(__file__).parent
 TEMPLATES_DIR = PROJECT_ROOT / "templates"
@@ -38,6 +49,67 @@ TEMPLATE_TYPES = {
     "DPD": "DPD数据预报模板"
 }
 
+# 工作表填充数据并行计算模式：None（顺序计算）、"thread"（线程池）、"process"（进程池）
+SHEET_PAYLOAD_PARALLEL_MODE = None
+SHEET_PAYLOAD_MAX_WORKERS = None
+
+# 数据超过Excel单表行数上限时的分片方式："sheet"（续表，如"子单号 (2)"）、"workbook"（独立工作簿文件）
+OVERFLOW_SHARD_MODE = "sheet"
+
+# 是否将低基数字符串列（国家代码、渠道等）写入共享字符串表，单号等高基数列保持内联字符串
+SHARED_STRINGS_OPTIMIZE = False
+
+# 合计行模式："value"（写入计算好的合计值，打开时无需重算）、"formula"（保留SUM公式并改写为实际数据区）、None（不改动合计行）
+TOTALS_MODE = "value"
+
+# 汇总累计库（SQLite）路径：设置后每次处理UPS数据都保存按国家、按邮编的汇总结果，用于生成周、月汇总表；None表示不保存
+# 例如 PROJECT_ROOT / "data" / "aggregates.db"
+AGGREGATE_STORE_PATH = None
+
+# 数据行数达到该值且安装了Polars时，汇总统计、总结单分类计数和子单号匹配使用Polars惰性查询引擎（结果与pandas一致）；None表示始终使用pandas
+POLARS_ROW_THRESHOLD = 200000
+
+# 输入数据检查结果的输出方式（可选，默认不检查）："json"（输出文件保存后写入旁边的 *.validation.json）、"sheet"（输出工作簿中的"数据检查"工作表）、None（不检查）
+INPUT_VALIDATION = None
+
+# 界面处理时每读取、写入、保存多少行更新一次进度并检查是否已取消
+PROGRESS_CHECK_ROWS = 1000
+
+# 单件明细表文件名规则：主数据文件名（不含扩展名）加以下后缀，如 manifest.xlsx -> manifest_明细.xlsx
+DETAIL_FILE_SUFFIXES = ("_明细", "-明细", "明细")
+
+# 命令行批量处理的进程数（None表示CPU核数）和单个文件的超时时间（秒，None表示不限制）
+BATCH_MAX_WORKERS = None
+BATCH_JOB_TIMEOUT = 600
+
+# 批量任务账本（SQLite）：记录每个任务的输入文件哈希、状态和输出路径，中断后再次执行时跳过已完成的任务；
+# None表示不使用（可用 --ledger 指定）。租约有效期（秒）内执行进程需续约，进程崩溃后任务在租约过期后被重新领取；
+# 租约过期的任务最多领取几次
+BATCH_LEDGER_PATH = None
+BATCH_LEDGER_LEASE = 60
+BATCH_LEDGER_MAX_ATTEMPTS = 3
+
+# 收件箱监听：工作进程数、任务队列容量、文件大小保持不变多少秒后视为写入完成、检查间隔（秒）、
+# 主数据文件等待对应明细表的时间（秒）、明细表等待对应主数据文件的时间（秒，超时后移到failed子文件夹）、
+# 在日志中输出队列深度和耗时统计的间隔（秒）
+WATCH_MAX_WORKERS = 2
+WATCH_QUEUE_SIZE = 20
+WATCH_STABLE_SECONDS = 5
+WATCH_POLL_INTERVAL = 1.0
+WATCH_DETAIL_WAIT = 30
+WATCH_ORPHAN_DETAIL_WAIT = 600
+WATCH_STATUS_INTERVAL = 60
+
+# HTTP任务服务：监听地址（默认只允许本机访问）、端口、工作进程数、任务队列容量（满时拒绝新任务）、单个请求的上传大小上限（MB）、
+# 上传和输出文件的保存目录、已完成任务的保留时间（秒，过期后删除任务及其文件）
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+SERVICE_MAX_WORKERS = 2
+SERVICE_QUEUE_SIZE = 20
+SERVICE_MAX_UPLOAD_MB = 100
+SERVICE_WORK_DIR = PROJECT_ROOT / "service_jobs"
+SERVICE_JOB_TTL = 3600
+
 # UI主题
 UI_THEME = "cosmo"  # ttkbootstrap主题
 
@@ -2,8 +2,10 @@
 """
 Excel数据处理工具 - 主程序入口
 功能：读取Excel文件，根据选择的模板类型进行数据填充，输出到桌面
+不带参数时启动图形界面，带参数时为命令行模式（如 python main.py batch data/*.xlsx）
 """
 import sys
+import multiprocessing
 import os
 import logging
 from pathlib import Path
@@ -24,7 +26,6 @@ project_root = Path(__file__).parent
 sys.path.insert(0, str(project_root))
 
 from config import *
-from src.ui.main_window import MainWindow
 
 def setup_logging():
     """设置日志配置"""
@@ -45,7 +46,8 @@ def main():
         logger = logging.getLogger(__name__)
         logger.info(f"启动 {APP_NAME} v{APP_VERSION}")
         
-        # 创建主窗口并运行
+        # 创建主窗口并运行（命令行模式不需要加载界面模块）
+        from src.ui.main_window import MainWindow
         app = MainWindow()
         app.run()
         
@@ -54,5 +56,16 @@ def main():
         input("按回车键退出...")
         sys.exit(1)
 
+def run_cli(argv):
+    """命令行模式"""
+    setup_logging()
+    from src.cli import main as cli_main
+    sys.exit(cli_main(argv))
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    # 打包后的程序在Windows上以spawn方式启动工作进程
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1:
+        run_cli(sys.argv[1:])
+    else:
+        main()
\ No newline at end of file
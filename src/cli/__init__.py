@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+"""
+命令行入口
+python main.py <子命令> [参数]，不带参数时启动图形界面
+"""
+import argparse
+
+from src.cli import append, batch, rollup, serve, watch
+
+# 子命令名称 -> 模块（提供add_arguments(parser)和run(args)）
+COMMANDS = {
+    "batch": batch,
+    "append": append,
+    "watch": watch,
+    "serve": serve,
+    "rollup": rollup,
+}
+
+
+def build_parser():
+    """创建命令行参数解析器"""
+    parser = argparse.ArgumentParser(prog="main.py", description="Excel数据处理工具（命令行模式）")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    for name, module in COMMANDS.items():
+        module.add_arguments(subparsers.add_parser(name, help=module.HELP, description=module.HELP))
+    return parser
+
+
+def main(argv=None):
+    """
+    解析参数并执行子命令
+
+    Args:
+        argv (list, optional): 命令行参数（不含程序名），默认为sys.argv[1:]
+
+    Returns:
+        int: 退出码
+    """
+    args = build_parser().parse_args(argv)
+    return COMMANDS[args.command].run(args)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+追加子命令
+python main.py append 新增数据 --to 之前的输出文件 [-t UPS] [-d 明细表] [-o 输出文件] [--date 日期]
+"""
+import sys
+from datetime import date
+from pathlib import Path
+
+from config import *
+from src.core.excel_processor import ExcelProcessor
+from src.core.job_runner import find_detail_file
+
+HELP = "将新增的数据文件追加到之前生成的输出文件中（默认覆盖该文件，写入完成后才替换）"
+
+
+def add_arguments(parser):
+    """添加append子命令的参数"""
+    parser.add_argument("input", help="新增的主数据文件")
+    parser.add_argument("--to", required=True, dest="previous_output", help="之前生成的输出文件")
+    parser.add_argument("-t", "--template", choices=list(TEMPLATE_TYPES), default="UPS", help="模板类型（默认UPS，需与之前的输出文件一致）")
+    parser.add_argument("-d", "--detail", help="新增的单件明细表（默认按文件名规则自动匹配）")
+    parser.add_argument("-o", "--output", help="输出文件（默认覆盖之前的输出文件）")
+    parser.add_argument("--date", type=date.fromisoformat, help="新增数据所属日期（YYYY-MM-DD，保存到汇总累计库，默认为文件的修改日期）")
+
+
+def run(args):
+    """
+    执行追加
+
+    Returns:
+        int: 退出码，成功为0，失败为1，文件不存在为2
+    """
+    for path in (args.input, args.previous_output):
+        if not Path(path).is_file():
+            print(f"文件不存在: {path}", file=sys.stderr)
+            return 2
+
+    detail_file = args.detail or find_detail_file(args.input, DETAIL_FILE_SUFFIXES)
+    output_path = ExcelProcessor().append_file(args.input, args.template, args.previous_output,
+                                               str(detail_file) if detail_file else None, args.output, args.date)
+    if output_path is None:
+        print("追加失败，详见日志（之前的输出文件未改动）", file=sys.stderr)
+        return 1
+    print(f"追加完成: {output_path}")
+    return 0
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+批量处理子命令
+python main.py batch 输入... [-t UPS] [-o 输出目录] [-w 进程数] [--timeout 秒] [--ledger 账本.db]
+"""
+import logging
+import sys
+import time
+from pathlib import Path
+
+from config import *
+from src.core.job_ledger import JobLedger, default_owner
+from src.core.job_runner import JobRunner, STATUS_TIMEOUT, build_jobs, summarize
+
+HELP = "批量处理文件、通配符或目录中的Excel数据文件"
+
+
+def add_arguments(parser):
+    """添加batch子命令的参数"""
+    parser.add_argument("inputs", nargs="+", help="主数据文件、通配符（如 data/*.xlsx）或目录；单件明细表按文件名规则自动匹配")
+    parser.add_argument("-t", "--template", choices=list(TEMPLATE_TYPES), default="UPS", help="模板类型（默认UPS）")
+    parser.add_argument("-o", "--output-dir", default=str(DESKTOP_PATH), help="输出目录（默认桌面）")
+    parser.add_argument("-w", "--workers", type=int, default=BATCH_MAX_WORKERS, help="进程数（默认CPU核数）")
+    parser.add_argument("--timeout", type=float, default=BATCH_JOB_TIMEOUT, help="单个文件的超时时间（秒，0表示不限制）")
+    parser.add_argument("--detail-suffix", action="append", dest="detail_suffixes",
+                        help=f"单件明细表文件名后缀，可重复指定（默认 {' '.join(DETAIL_FILE_SUFFIXES)}）")
+    parser.add_argument("--ledger", default=BATCH_LEDGER_PATH,
+                        help="任务账本（SQLite文件）：中断后再次执行时跳过已完成的文件，多个batch进程可共用同一个账本并行处理")
+
+
+def run(args):
+    """
+    执行批量处理并输出吞吐量统计
+
+    Returns:
+        int: 退出码，全部成功为0，有失败或超时为1，没有可处理的文件为2
+    """
+    logger = logging.getLogger(__name__)
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    jobs = build_jobs(args.inputs, args.template, output_dir, args.detail_suffixes or DETAIL_FILE_SUFFIXES)
+    if not jobs:
+        print("没有可处理的文件", file=sys.stderr)
+        return 2
+
+    runner = JobRunner(args.workers, args.timeout, getattr(logging, LOG_LEVEL), LOG_FORMAT,
+                       warm_templates=(args.template,), start_method=WORKER_START_METHOD)
+    logger.info(f"开始批量处理 {len(jobs)} 个文件，进程数 {min(runner.max_workers, len(jobs))}，输出目录 {output_dir}")
+
+    def report(result):
+        if result.success:
+            print(f"[完成] {result.job.name} -> {result.output_path}（{result.rows} 行，{result.elapsed:.1f} 秒）")
+        else:
+            print(f"[{'超时' if result.status == STATUS_TIMEOUT else '失败'}] {result.job.name}: {result.error}")
+
+    start = time.perf_counter()
+    if args.ledger:
+        results, completed = run_with_ledger(runner, jobs, args.ledger, report)
+    else:
+        results, completed = runner.run(jobs, report), []
+    summary = summarize(results, time.perf_counter() - start)
+
+    if completed:
+        print(f"账本中已完成 {len(completed)} 个文件（内容未变），已跳过")
+    print(f"共 {summary['files']} 个文件：成功 {summary['succeeded']}，失败 {summary['failed']}，超时 {summary['timed_out']}")
+    print(f"耗时 {summary['elapsed']:.1f} 秒，{summary['rows']} 行，"
+          f"{summary['files_per_second']:.2f} 文件/秒，{summary['rows_per_second']:.0f} 行/秒")
+    return 0 if summary["succeeded"] == summary["files"] else 1
+
+
+def run_with_ledger(runner: JobRunner, jobs: list, ledger_path, on_result):
+    """
+    登记任务到账本后领取执行，已完成且内容未变的任务跳过
+
+    Returns:
+        tuple: (本进程执行的任务的JobResult列表, 已完成而跳过的BatchJob列表)
+    """
+    logger = logging.getLogger(__name__)
+    ledger = JobLedger(ledger_path, BATCH_LEDGER_LEASE, BATCH_LEDGER_MAX_ATTEMPTS)
+    try:
+        job_ids, completed = ledger.register(jobs)
+        logger.info(f"任务账本 {ledger_path}: {len(jobs)} 个文件，已完成 {len(completed)} 个")
+        results = runner.run_ledger(ledger, job_ids, default_owner(), on_result)
+        logger.info(f"任务账本状态: {ledger.counts(job_ids)}")
+        return results, completed
+    finally:
+        ledger.close()
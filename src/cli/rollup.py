@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""
+汇总表子命令
+python main.py rollup [--period week|month] [--date 日期] [--start 日期 --end 日期] [-o 输出目录]
+"""
+import sys
+from datetime import date
+from pathlib import Path
+
+from config import *
+from src.core.excel_processor import ExcelProcessor
+
+HELP = "根据汇总累计库生成周、月或指定日期范围的UPS汇总表"
+
+
+def add_arguments(parser):
+    """添加rollup子命令的参数"""
+    parser.add_argument("--period", choices=["week", "month"], default="week", help="汇总周期（默认week，周一至周日）")
+    parser.add_argument("--date", type=date.fromisoformat, help="周期内的任意一天（YYYY-MM-DD，默认当天）")
+    parser.add_argument("--start", type=date.fromisoformat, help="自定义开始日期（YYYY-MM-DD，与--end一起指定时忽略--period）")
+    parser.add_argument("--end", type=date.fromisoformat, help="自定义结束日期（YYYY-MM-DD）")
+    parser.add_argument("-o", "--output-dir", default=str(DESKTOP_PATH), help="输出目录（默认桌面）")
+
+
+def run(args):
+    """
+    生成汇总表
+
+    Returns:
+        int: 退出码，成功为0，失败或没有已保存的汇总结果为1，参数错误为2
+    """
+    if (args.start is None) != (args.end is None):
+        print("--start和--end需要一起指定", file=sys.stderr)
+        return 2
+    if not AGGREGATE_STORE_PATH:
+        print("未配置汇总累计库（config.AGGREGATE_STORE_PATH）", file=sys.stderr)
+        return 2
+
+    output_dir = Path(args.output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_path = ExcelProcessor().process_rollup(args.period, args.date, output_dir, args.start, args.end)
+    if output_path is None:
+        print("生成汇总表失败，详见日志", file=sys.stderr)
+        return 1
+    print(f"汇总表已生成: {output_path}")
+    return 0
@@ -0,0 +1,51 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP任务服务子命令
+python main.py serve [--host 127.0.0.1] [--port 8765] [-w 进程数] [--queue-size 容量]
+"""
+import logging
+
+from config import *
+from src.core.http_service import JobHTTPServer, serve_forever
+from src.core.job_service import JobService
+
+HELP = "启动本机HTTP任务服务：上传主数据和明细表、查询任务状态、下载输出文件"
+
+
+def add_arguments(parser):
+    """添加serve子命令的参数"""
+    parser.add_argument("--host", default=SERVICE_HOST, help=f"监听地址（默认{SERVICE_HOST}，只允许本机访问）")
+    parser.add_argument("--port", type=int, default=SERVICE_PORT, help=f"端口（默认{SERVICE_PORT}）")
+    parser.add_argument("-w", "--workers", type=int, default=SERVICE_MAX_WORKERS, help=f"工作进程数（默认{SERVICE_MAX_WORKERS}）")
+    parser.add_argument("--queue-size", type=int, default=SERVICE_QUEUE_SIZE, help=f"任务队列容量（默认{SERVICE_QUEUE_SIZE}）")
+    parser.add_argument("--timeout", type=float, default=BATCH_JOB_TIMEOUT, help="单个文件的超时时间（秒，0表示不限制）")
+    parser.add_argument("--work-dir", default=str(SERVICE_WORK_DIR), help="上传和输出文件的保存目录")
+    parser.add_argument("--job-ttl", type=float, default=SERVICE_JOB_TTL, help="已完成任务的保留时间（秒，0表示一直保留）")
+    parser.add_argument("--max-upload-mb", type=int, default=SERVICE_MAX_UPLOAD_MB, help=f"单个请求的上传大小上限（MB，默认{SERVICE_MAX_UPLOAD_MB}）")
+
+
+def run(args):
+    """
+    持续运行，直到按下Ctrl+C
+
+    Returns:
+        int: 退出码
+    """
+    service = JobService(
+        args.work_dir,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        job_timeout=args.timeout,
+        job_ttl=args.job_ttl,
+        warm_templates=list(TEMPLATE_TYPES),
+        log_level=getattr(logging, LOG_LEVEL),
+        log_format=LOG_FORMAT,
+        start_method=WORKER_START_METHOD,
+    )
+    try:
+        server = JobHTTPServer((args.host, args.port), service, TEMPLATE_TYPES, args.max_upload_mb * 1024 * 1024)
+    except OSError as e:
+        logging.getLogger(__name__).error(f"无法监听 {args.host}:{args.port}: {str(e)}")
+        return 1
+    serve_forever(server)
+    return 0
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""
+收件箱监听子命令
+python main.py watch 收件箱 -o 发件箱 [-t UPS] [-w 进程数] [--queue-size 容量]
+"""
+import logging
+
+from config import *
+from src.core.inbox_daemon import InboxDaemon
+
+HELP = "监听收件箱文件夹，自动处理写入完成的Excel数据文件并输出到发件箱"
+
+
+def add_arguments(parser):
+    """添加watch子命令的参数"""
+    parser.add_argument("inbox", help="收件箱文件夹（处理完成的文件移到其中的processed、failed子文件夹）")
+    parser.add_argument("-o", "--outbox", required=True, help="发件箱文件夹（输出文件和状态文件 _inbox_status.json）")
+    parser.add_argument("-t", "--template", choices=list(TEMPLATE_TYPES), default="UPS", help="模板类型（默认UPS）")
+    parser.add_argument("-w", "--workers", type=int, default=WATCH_MAX_WORKERS, help=f"工作进程数（默认{WATCH_MAX_WORKERS}）")
+    parser.add_argument("--queue-size", type=int, default=WATCH_QUEUE_SIZE, help=f"任务队列容量（默认{WATCH_QUEUE_SIZE}）")
+    parser.add_argument("--timeout", type=float, default=BATCH_JOB_TIMEOUT, help="单个文件的超时时间（秒，0表示不限制）")
+    parser.add_argument("--stable-seconds", type=float, default=WATCH_STABLE_SECONDS, help="文件大小保持不变多少秒后视为写入完成")
+    parser.add_argument("--poll-interval", type=float, default=WATCH_POLL_INTERVAL, help="检查文件状态的间隔（秒）")
+    parser.add_argument("--detail-wait", type=float, default=WATCH_DETAIL_WAIT, help="主数据文件等待对应明细表的时间（秒）")
+    parser.add_argument("--orphan-detail-wait", type=float, default=WATCH_ORPHAN_DETAIL_WAIT,
+                        help="明细表等待对应主数据文件的时间（秒），超时后移到failed子文件夹")
+    parser.add_argument("--detail-suffix", action="append", dest="detail_suffixes",
+                        help=f"单件明细表文件名后缀，可重复指定（默认 {' '.join(DETAIL_FILE_SUFFIXES)}）")
+    parser.add_argument("--polling", action="store_true", help="不使用文件事件通知，始终定时扫描（如网络共享文件夹）")
+
+
+def run(args):
+    """
+    持续运行，直到按下Ctrl+C
+
+    Returns:
+        int: 退出码
+    """
+    daemon = InboxDaemon(
+        args.inbox, args.outbox, args.template,
+        workers=args.workers,
+        queue_size=args.queue_size,
+        job_timeout=args.timeout,
+        stable_seconds=args.stable_seconds,
+        poll_interval=args.poll_interval,
+        detail_suffixes=args.detail_suffixes or DETAIL_FILE_SUFFIXES,
+        detail_wait=args.detail_wait,
+        orphan_detail_wait=args.orphan_detail_wait,
+        use_events=not args.polling,
+        log_level=getattr(logging, LOG_LEVEL),
+        log_format=LOG_FORMAT,
+        start_method=WORKER_START_METHOD,
+    )
+    daemon.serve_forever(WATCH_STATUS_INTERVAL)
+    return 0
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+"""
+汇总累计库
+每次处理的按国家、按邮编分组汇总结果（部分和）保存到本地SQLite数据库，
+周、月汇总直接对部分和再求和，无需重新读取、合并所有原始文件。
+每次记录以数据内容的哈希为标识：同一份数据重复处理（如隔天重新处理、批量和收件箱都处理了同一个文件）只保留一份，
+不同来源的同名文件互不影响；记录所属的日期是数据日期，不随处理日期变化。
+重量、方数按定点整数保存（见aggregation.FIXED_POINT_SCALES），累加结果是精确的
+"""
+import calendar
+import hashlib
+import logging
+import sqlite3
+import threading
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+
+from src.core.aggregation import FIXED_POINT_SCALES
+from src.core.normalizer import to_fixed_point, from_fixed_point
+
+# 部分和的维度
+DIMENSION_COUNTRY = "country"
+DIMENSION_POSTCODE = "postcode"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    content_key TEXT NOT NULL UNIQUE,
+    run_date TEXT NOT NULL,
+    source TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS partials (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    run_date TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    group_key TEXT NOT NULL,
+    field TEXT NOT NULL,
+    value INTEGER NOT NULL,
+    scale INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_partials_date ON partials (run_date, dimension);
+"""
+
+
+class AggregateStore:
+    """按处理批次保存分组汇总的部分和，并按日期范围汇总"""
+
+    def __init__(self, db_path, fixed_point_scales: dict = None):
+        """
+        Args:
+            db_path (str|Path): SQLite数据库文件路径（不存在时自动创建）
+            fixed_point_scales: 定点保存的列及其比例，默认为FIXED_POINT_SCALES，其他列按整数保存
+        """
+        self.logger = logging.getLogger(__name__)
+        self.db_path = str(db_path)
+        self.fixed_point_scales = FIXED_POINT_SCALES if fixed_point_scales is None else fixed_point_scales
+        self._lock = threading.Lock()
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._connection.execute("PRAGMA foreign_keys = ON")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        self._connection.close()
+
+    def record(self, aggregates: dict, content_key: str, run_date, source: str = None,
+               country_column: str = "国家二字码", zipcode_column: str = "收件人邮编"):
+        """
+        保存一次处理的分组汇总结果，同一份数据（content_key相同）重复保存时替换之前的记录
+
+        Args:
+            aggregates: UPSDataProcessor.compute_summary_aggregates的返回值
+            content_key: 数据内容的标识（见content_key）
+            run_date (date|str): 数据所属日期
+            source: 数据来源（如原始文件路径），仅用于查看
+            country_column: 按国家汇总结果中的国家列名
+            zipcode_column: 按邮编汇总结果中的邮编列名
+
+        Returns:
+            int: 本次记录的编号
+        """
+        run_date = self._to_date(run_date).isoformat()
+        rows = []
+        for dimension, key_column in ((DIMENSION_COUNTRY, country_column), (DIMENSION_POSTCODE, zipcode_column)):
+            table = aggregates.get(dimension)
+            if table is None or table.empty:
+                continue
+            keys = table[key_column].astype(str).tolist()
+            for field in table.columns:
+                if field == key_column or not pd.api.types.is_numeric_dtype(table[field]):
+                    continue
+                scale = self.fixed_point_scales.get(field, 1)
+                values = to_fixed_point(table[field], scale).tolist()
+                rows.extend((run_date, dimension, key, field, value, scale) for key, value in zip(keys, values))
+
+        with self._lock, self._connection:
+            replaced = self._connection.execute("DELETE FROM runs WHERE content_key = ?", (content_key,)).rowcount
+            cursor = self._connection.execute(
+                "INSERT INTO runs (content_key, run_date, source, created_at) VALUES (?, ?, ?, ?)",
+                (content_key, run_date, source, datetime.now().isoformat(timespec="seconds")),
+            )
+            run_id = cursor.lastrowid
+            self._connection.executemany(
+                "INSERT INTO partials (run_id, run_date, dimension, group_key, field, value, scale) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(run_id,) + row for row in rows],
+            )
+
+        if replaced:
+            self.logger.info(f"同一份数据已保存过，替换之前的汇总结果: 来源 '{source}'")
+        self.logger.info(f"汇总结果已保存: 来源 '{source}'，日期 {run_date}，{len(rows)} 条部分和")
+        return run_id
+
+    def rollup(self, start_date, end_date, country_column: str = "国家二字码", zipcode_column: str = "收件人邮编"):
+        """
+        汇总日期范围内（含首尾）所有记录的部分和
+
+        Args:
+            start_date (date|str): 开始日期
+            end_date (date|str): 结束日期
+            country_column: 结果中的国家列名
+            zipcode_column: 结果中的邮编列名
+
+        Returns:
+            dict: 与compute_summary_aggregates结构相同，"country" -> 按国家汇总结果，
+                "postcode" -> 按邮编汇总结果，"totals" -> 按国家汇总的各列总计，另含"runs" -> 参与汇总的记录数
+        """
+        start, end = self._to_date(start_date).isoformat(), self._to_date(end_date).isoformat()
+        with self._lock:
+            partials = pd.read_sql_query(
+                "SELECT dimension, group_key, field, scale, SUM(value) AS value FROM partials "
+                "WHERE run_date BETWEEN ? AND ? GROUP BY dimension, group_key, field, scale",
+                self._connection, params=(start, end),
+            )
+            run_count = self._connection.execute(
+                "SELECT COUNT(*) FROM runs WHERE run_date BETWEEN ? AND ?", (start, end)
+            ).fetchone()[0]
+
+        result = {
+            "country": self._pivot(partials, DIMENSION_COUNTRY, country_column),
+            "postcode": self._pivot(partials, DIMENSION_POSTCODE, zipcode_column),
+            "runs": run_count,
+        }
+        # 总计在定点整数上求和后再换算，与逐列累加浮点数不同，结果与一次汇总全部数据一致
+        country = partials[partials["dimension"] == DIMENSION_COUNTRY]
+        result["totals"] = {
+            field: (from_fixed_point(group["value"].sum(), scale).item() if scale != 1 else group["value"].sum().item())
+            for (field, scale), group in country.groupby(["field", "scale"], sort=False)
+        }
+        self.logger.info(f"汇总 {start} ~ {end}: {run_count} 条记录，{len(result['country'])} 个国家，{len(result['postcode'])} 个邮编")
+        return result
+
+    def _pivot(self, partials: pd.DataFrame, dimension: str, key_column: str):
+        """将长表形式的部分和转换为 分组键 + 各统计列 的汇总表（按分组键排序）"""
+        partials = partials[partials["dimension"] == dimension]
+        if partials.empty:
+            return pd.DataFrame(columns=[key_column])
+
+        table = pd.DataFrame({key_column: sorted(partials["group_key"].unique())})
+        for (field, scale), group in partials.groupby(["field", "scale"], sort=False):
+            sums = group.set_index("group_key")["value"].reindex(table[key_column], fill_value=0).to_numpy()
+            table[field] = from_fixed_point(sums, scale) if scale != 1 else sums
+        return table
+
+    def _to_date(self, value):
+        """将date、datetime或"YYYY-MM-DD"字符串转换为date"""
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value))
+
+
+def content_key(data: pd.DataFrame):
+    """
+    数据内容的标识：列名和各行值的SHA-256（与文件名、文件格式无关，内容相同的数据标识相同）
+
+    Args:
+        data: 主数据
+
+    Returns:
+        str: 十六进制哈希值
+    """
+    digest = hashlib.sha256("\x1f".join(map(str, data.columns)).encode("utf-8"))
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def period_range(period: str, reference_date=None):
+    """
+    计算参考日期所在周期的首尾日期
+
+    Args:
+        period: "week"（周一至周日）或"month"（自然月）
+        reference_date (date, optional): 参考日期，默认为当天
+
+    Returns:
+        tuple: (开始日期, 结束日期)
+    """
+    reference_date = reference_date or date.today()
+    if period == "week":
+        start = reference_date - timedelta(days=reference_date.weekday())
+        return start, start + timedelta(days=6)
+    if period == "month":
+        last_day = calendar.monthrange(reference_date.year, reference_date.month)[1]
+        return reference_date.replace(day=1), reference_date.replace(day=last_day)
+    raise ValueError(f"不支持的汇总周期: {period}")
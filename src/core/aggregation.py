@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+多维度汇总引擎
+基于规范化视图中已编号的分组键（国家代码、邮编），按编号一次计算所有声明的分组汇总（整数、定点列按int64精确累加），
+各汇总工作表直接使用计算结果，不再各自复制数据、分组
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.core.normalizer import NormalizedData, to_fixed_point, from_fixed_point, get_normalized_view
+
+# 分组键类型
+KEY_COUNTRY = "country"
+KEY_POSTCODE = "postcode"
+
+# 定点数汇总的列及其比例：重量按整数克（kg × 1000），方数按10⁻⁶立方米（m³ × 1000000）
+FIXED_POINT_SCALES = {
+    "收货实重": 1000,
+    "收货材积重": 1000,
+    "方数": 1000000,
+}
+
+# 合计行中需要求和的列
+TOTAL_FIELDS = ("件数", "收货实重", "收货材积重", "方数")
+
+
+class GroupBySpec:
+    """分组汇总声明"""
+
+    def __init__(self, name: str, key_column: str, key_type: str = KEY_COUNTRY, country_column: str = None, country_code: str = None):
+        """
+        Args:
+            name: 结果名称
+            key_column: 分组列名
+            key_type: 分组键类型，"country"（规范化国家代码）或"postcode"（规范化邮编）
+            country_column: 筛选国家时使用的国家列名
+            country_code: 只汇总该国家的数据，None表示不筛选
+        """
+        self.name = name
+        self.key_column = key_column
+        self.key_type = key_type
+        self.country_column = country_column
+        self.country_code = country_code
+
+
+class AggregationEngine:
+    """按已编号的分组键汇总数值列"""
+
+    def __init__(self, normalized: NormalizedData, value_columns: list, fixed_point_scales: dict = None):
+        """
+        Args:
+            normalized: 规范化视图
+            value_columns: 需要汇总的数值列名列表
+            fixed_point_scales: 以定点整数汇总的列及其比例，默认为FIXED_POINT_SCALES
+        """
+        self.logger = logging.getLogger(__name__)
+        self.normalized = normalized
+        self.value_columns = list(value_columns)
+        self.fixed_point_scales = FIXED_POINT_SCALES if fixed_point_scales is None else fixed_point_scales
+        self.specs = []
+
+    def add_group_by(self, name: str, key_column: str, key_type: str = KEY_COUNTRY, country_column: str = None, country_code: str = None):
+        """声明一个分组汇总"""
+        self.specs.append(GroupBySpec(name, key_column, key_type, country_column, country_code))
+        return self
+
+    def run(self, totals_column: str = None):
+        """
+        计算所有声明的分组汇总
+
+        Args:
+            totals_column: 计算总计时用于过滤无效行的国家列名，None表示对全部行求和
+
+        Returns:
+            dict: 名称 -> 汇总结果DataFrame（按分组键排序，只包含出现过的分组），
+                另含"totals" -> {列名: 总计}
+        """
+        values = {}
+        for col in self.value_columns:
+            scale = self.fixed_point_scales.get(col)
+            values[col] = self.normalized.fixed_point(col, scale) if scale else self.normalized.numeric(col)
+        results = {}
+
+        for spec in self.specs:
+            codes, labels = self._get_key_codes(spec)
+            mask = codes >= 0
+            if spec.country_code is not None:
+                mask &= self.normalized.country_mask(spec.country_column, spec.country_code)
+            results[spec.name] = self._grouped_sums(spec.key_column, codes, labels, mask, values)
+            self.logger.debug(f"分组汇总 '{spec.name}' 完成，共 {len(results[spec.name])} 组")
+
+        if totals_column is not None:
+            total_mask = self.normalized.country_codes(totals_column)[0] >= 0
+        else:
+            total_mask = slice(None)
+        results["totals"] = {col: self._restore_dtype(array[total_mask].sum(), array, self.fixed_point_scales.get(col))
+                             for col, array in values.items()}
+        return results
+
+    def _get_key_codes(self, spec: GroupBySpec):
+        """获取分组键的编号和排序后的键值"""
+        if spec.key_type == KEY_COUNTRY:
+            return self.normalized.country_codes(spec.key_column)
+        if spec.key_type == KEY_POSTCODE:
+            return self.normalized.postcode_codes(spec.key_column)
+        raise ValueError(f"不支持的分组键类型: {spec.key_type}")
+
+    def _grouped_sums(self, key_column: str, codes: np.ndarray, labels: np.ndarray, mask: np.ndarray, values: dict):
+        """计算各分组的合计：整数列（含定点列）用np.add.at按int64精确累加，浮点列用bincount"""
+        group_codes = codes[mask]
+        counts = np.bincount(group_codes, minlength=len(labels))
+        present = counts > 0
+
+        result = pd.DataFrame({key_column: labels[present]})
+        for col, array in values.items():
+            if _is_integer(array):
+                sums = np.zeros(len(labels), dtype=np.int64)
+                np.add.at(sums, group_codes, array[mask].astype(np.int64))
+            else:
+                sums = np.bincount(group_codes, weights=array[mask], minlength=len(labels))
+            result[col] = self._restore_dtype(sums[present], array, self.fixed_point_scales.get(col))
+        return result
+
+    def _restore_dtype(self, sums, source: np.ndarray, scale: int = None):
+        """定点列的合计（int64）换算回原单位，其他列保持求和结果"""
+        if scale and _is_integer(source):
+            return from_fixed_point(sums, scale)
+        return sums
+
+
+def _is_integer(array: np.ndarray):
+    """是否为整数（或布尔）数组"""
+    return np.issubdtype(array.dtype, np.integer) or np.issubdtype(array.dtype, np.bool_)
+
+
+
+def column_total(data: pd.DataFrame, column: str, positions: np.ndarray = None):
+    """
+    计算列合计（定点列按定点整数精确求和）
+
+    Args:
+        data: 数据
+        column: 列名
+        positions: 参与求和的行位置（可重复），None表示全部行
+
+    Returns:
+        int|float: 合计值
+    """
+    normalized = get_normalized_view(data)
+    scale = FIXED_POINT_SCALES.get(column)
+    values = normalized.fixed_point(column, scale) if scale else normalized.numeric(column)
+    if positions is not None:
+        values = values[positions]
+    total = values.sum()
+    if scale:
+        total = from_fixed_point(total, scale)
+    return total.item()
@@ -1,13 +1,29 @@
 import logging
+import numpy as np
 import pandas as pd
 import openpyxl
 from openpyxl import load_workbook, Workbook
 from openpyxl.worksheet.worksheet import Worksheet
 from pathlib import Path
 
+from src.core.aggregation import FIXED_POINT_SCALES, TOTAL_FIELDS, column_total
+from src.core.fill_plan import SheetFillPlan, build_fill_plans
+from src.core.normalizer import canonical_postcode, get_normalized_view
+from src.core.overflow import SheetOverflowWriter
+from src.core.polars_engine import PolarsEngine, DEFAULT_POLARS_ROW_THRESHOLD, use_polars
+from src.core.progress import ProcessingCancelled, ProgressToken
+from src.core.style_registry import TEXT_FORMAT
+from src.core.validation import InputValidator
+from src.core.write_session import SheetWriteSession
+
 class DPDProcessor:
-  def __init__(self):
+  def __init__(self, polars_row_threshold: int = DEFAULT_POLARS_ROW_THRESHOLD):
+    """
+    Args:
+        polars_row_threshold: 数据行数达到该值且安装了Polars时，分类计数和子单号匹配使用Polars引擎，None表示始终使用pandas
+    """
     self.logger = logging.getLogger(__name__)
+    self.polars_row_threshold = polars_row_threshold
 
     # DPD模板工作表映射关系（数据字段 -> 模板字段）
     self.sheet_mappings = {
@@ -44,11 +60,21 @@ class DPDProcessor:
       }
     }
 
+    # 以文本格式（"@"）填充的单号字段
+    self.text_fields = ["子转单号", "转单号", "客户单号"]
+
   def get_template_workbook(self, template_path: str):
     """
     获取模板工作簿
+
+    Args:
+        template_path (str|file-like|Workbook): 模板文件路径、二进制文件对象或已加载的工作簿
     """
     try:
+        if isinstance(template_path, Workbook):
+            return template_path
+        if hasattr(template_path, "read"):
+            return load_workbook(template_path)
         if not Path(template_path).exists():
             self.logger.error(f"模板文件不存在: {template_path}")
             return None
@@ -63,51 +89,177 @@ class DPDProcessor:
         self.logger.error(f"获取模板工作簿时出错: {str(e)}")
         return None
 
-  def process_dpd_data(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame, template_path: str, output_path: str):
+  def process_dpd_data(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame, template_path: str, output_path: str, parallel: str = None, max_workers: int = None, overflow_mode: str = "sheet", shared_strings: bool = False, totals_mode: str = "value", validation: str = None, progress: ProgressToken = None, refresh_view: bool = True):
     """
     处理DPD数据并填充到模板中
 
     Args:
         original_file_data (pd.DataFrame): 原始文件数据
         original_detail_file_data (pd.DataFrame): 原始明细表数据
-        template_path (str): DPD模板路径
-        output_path (str): 输出文件路径
+        template_path (str|file-like): DPD模板路径或二进制文件对象
+        output_path (str|file-like): 输出文件路径或可写的二进制流
+        parallel (str, optional): 并行模式，"thread"或"process"时各工作表的填充数据并发计算，最后统一写入
+        max_workers (int, optional): 并行模式下的最大并发数
+        overflow_mode (str): 数据超过Excel单表行数上限时的分片方式，"sheet"写入续表，"workbook"写入独立工作簿
+        shared_strings (bool): 是否将低基数字符串列（如国家代码）写入共享字符串表，高基数列（如单号）保持内联
+        totals_mode (str): 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+        validation (str): 输入数据检查结果的输出方式，"sheet"写入检查工作表，"json"写入输出文件旁的JSON文件，None表示不检查
+        progress (ProgressToken, optional): 进度令牌，各工作表写入和保存时每check_interval行报告进度并检查取消，取消时删除本次写出的文件
+        refresh_view (bool): 是否重新创建原始数据的规范化视图，多个处理器共享同一份已规范化的数据时为False
 
     Returns:
-        bool: 处理结果
+        bool: 处理结果（取消时为False）
     """
     try:
         self.logger.info("开始处理DPD数据")
 
+        # 规范化视图在本次处理中只计算一次，各统计函数共享
+        get_normalized_view(original_file_data, refresh=refresh_view)
+
+        # 输入数据检查在工作线程中与加载模板同时进行
+        validation_future = InputValidator().validate_async(original_file_data, original_detail_file_data) if validation else None
+
         template_workbook = self.get_template_workbook(template_path)
         if template_workbook is None:
             return False
 
-        original_file_data_count = original_file_data.shape[0]
+        # 1. 定位各工作表及填充位置（操作工作簿，在当前线程执行）
+        sheet_tasks = []
 
-        # 处理运单清单工作表
+        # 运单清单工作表
         list_sheet, first_empty_row, collection_total_row = self.get_template_list_sheet(template_workbook)
         if list_sheet is not None:
-            self.process_list_sheet(template_workbook, list_sheet, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+            header_column_mapping = self.get_header_column_mapping(list_sheet)
+            sheet_tasks.append((list_sheet, collection_total_row, self.build_list_payload, (original_file_data, header_column_mapping, first_empty_row)))
 
-        # 处理子单号工作表
-        sub_order_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_sheet(template_workbook)
-        if sub_order_sheet is not None:
-            self.process_sub_order_sheet(template_workbook, sub_order_sheet, original_detail_file_data, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+        # 子单号工作表（没有单件明细表时保留模板中的空表）
+        if original_detail_file_data is None or original_detail_file_data.empty:
+            self.logger.warning("没有单件明细表数据，跳过子单号工作表")
+        else:
+            sub_order_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_sheet(template_workbook)
+            if sub_order_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(sub_order_sheet)
+                sheet_tasks.append((sub_order_sheet, collection_total_row, self.build_sub_order_payload, (original_detail_file_data, original_file_data, header_column_mapping, first_empty_row)))
 
-        # 处理总结单工作表
+        # 总结单工作表
         summary_sheet = self.get_template_summary_sheet(template_workbook)
         if summary_sheet is not None:
-            self.process_summary_sheet(template_workbook, summary_sheet, original_file_data)
-
-        # 保存文件
-        template_workbook.save(output_path)
+            sheet_tasks.append((summary_sheet, None, self.build_summary_payload, (original_file_data,)))
+
+        # 2. 计算各工作表的填充数据（可并行）
+        if progress is not None:
+            progress.start_stage("计算填充数据")
+        fill_plans = build_fill_plans([(builder, args) for _, _, builder, args in sheet_tasks], parallel, max_workers)
+        if progress is not None:
+            # 剩余工作量：写入各工作表和保存（保存时逐个单元格写出）
+            progress.estimate_remaining(2 * sum(plan.row_count * len(plan.columns) for plan in fill_plans))
+
+        # 3. 统一写入工作簿（数据区行数不够时在合计行之前插入行，超过单表行数上限时自动分片，样式在工作簿内只注册一次）
+        write_session = SheetWriteSession(template_workbook, output_path, overflow_mode, totals_mode, shared_strings, progress)
+        for (worksheet, collection_total_row, _, _), fill_plan in zip(sheet_tasks, fill_plans):
+            write_session.write(worksheet, fill_plan, collection_total_row)
+        write_session.finalize()
+
+        validation_report = validation_future.result() if validation_future is not None else None
+        if validation_report is not None:
+            validation_report.output_to_workbook(validation, template_workbook)
+
+        # 保存文件（写入临时文件，完成后替换输出文件）
+        write_session.save()
+        # 检查结果JSON在输出文件保存之后写入，写入失败不影响输出文件
+        if validation_report is not None:
+            validation_report.output_beside(validation, output_path)
         self.logger.info(f"DPD数据处理完成，输出文件: {output_path}")
         return True
+    except ProcessingCancelled:
+        self.logger.warning("DPD数据处理已取消")
+        progress.discard_outputs()
+        return False
     except Exception as e:
         self.logger.error(f"处理DPD数据时出错: {str(e)}")
         return False
 
+  def append_dpd_data(self, new_file_data: pd.DataFrame, new_detail_file_data: pd.DataFrame, previous_output_path: str, output_path: str = None, shared_strings: bool = False, totals_mode: str = "value"):
+    """
+    将新增数据追加到已生成的DPD输出文件中（增量模式）
+
+    运单清单、子单号工作表从当前最后一个数据行之后追加新行；
+    总结单中的各项件数都是可加的，直接在已有数值上累加新增数据的统计结果。
+    子单号匹配的主单信息只在新增的主数据中查找。运单清单、子单号的合计行在已有合计上累加新增数据的合计
+
+    Args:
+        new_file_data (pd.DataFrame): 新增的主数据
+        new_detail_file_data (pd.DataFrame): 新增的明细表数据
+        previous_output_path (str|file-like): 之前生成的输出文件
+        output_path (str|file-like, optional): 输出位置，默认覆盖previous_output_path
+        shared_strings (bool): 是否将低基数字符串列写入共享字符串表
+        totals_mode (str): 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+
+    Returns:
+        bool: 处理结果
+    """
+    try:
+        self.logger.info("开始追加DPD数据")
+        output_path = output_path if output_path is not None else previous_output_path
+
+        workbook = self.get_template_workbook(previous_output_path)
+        if workbook is None:
+            return False
+
+        has_new_rows = new_file_data is not None and not new_file_data.empty
+        if has_new_rows:
+            get_normalized_view(new_file_data, refresh=True)
+        fill_plans = []
+
+        if has_new_rows:
+            list_sheet, first_empty_row, collection_total_row = self.get_template_list_sheet(workbook)
+            if list_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(list_sheet)
+                fill_plans.append((list_sheet, self.build_list_payload(new_file_data, header_column_mapping, first_empty_row), collection_total_row))
+
+        if new_detail_file_data is not None and not new_detail_file_data.empty:
+            sub_order_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_sheet(workbook)
+            if sub_order_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(sub_order_sheet)
+                fill_plans.append((sub_order_sheet, self.build_sub_order_payload(new_detail_file_data, new_file_data, header_column_mapping, first_empty_row), collection_total_row))
+
+        if has_new_rows:
+            summary_sheet = self.get_template_summary_sheet(workbook)
+            if summary_sheet is not None:
+                fill_plans.append((summary_sheet, self.build_summary_append_payload(summary_sheet, new_file_data), None))
+
+        write_session = SheetWriteSession(workbook, output_path, totals_mode=totals_mode, shared_strings=shared_strings)
+        for worksheet, fill_plan, collection_total_row in fill_plans:
+            write_session.write(worksheet, fill_plan, collection_total_row, accumulate=True)
+        write_session.finalize()
+
+        # 通常覆盖上一次的输出文件：先写入临时文件，完成后再替换，中途出错时原文件不受影响
+        write_session.save()
+        self.logger.info(f"DPD数据追加完成，更新了 {len(fill_plans)} 个工作表，输出文件: {output_path}")
+        return True
+    except Exception as e:
+        self.logger.error(f"追加DPD数据时出错: {str(e)}")
+        return False
+
+  def build_summary_append_payload(self, summary_sheet: Worksheet, new_file_data: pd.DataFrame):
+    """
+    在总结单已有的件数上累加新增数据的统计结果
+
+    Args:
+        summary_sheet: 已填充的总结单工作表
+        new_file_data: 新增的主数据
+
+    Returns:
+        SheetFillPlan: 总结单填充计划
+    """
+    summary_plan = self.build_summary_payload(new_file_data)
+    for (row, col_num), count in summary_plan.cells.items():
+        existing_value = pd.to_numeric(summary_sheet.cell(row=row, column=col_num).value, errors='coerce')
+        if pd.notna(existing_value):
+            summary_plan.set_cell(row, col_num, existing_value + count)
+    self.logger.info(f"总结单累加完成，共更新 {len(summary_plan.cells)} 个单元格")
+    return summary_plan
+
   def get_header_column_mapping(self, worksheet, header_row=1):
     """
     获取模板表头到列号的映射关系
@@ -173,7 +325,8 @@ class DPDProcessor:
         self.logger.info(f"运单清单工作表范围: {max_row}行 x {max_col}列")
 
         first_empty_row = self._find_first_empty_row(list_sheet, max_row, max_col)
-        collection_total_row = self._find_collection_total_row(list_sheet, max_row, max_col, 3)
+        collection_total_row = self._find_collection_total_row(list_sheet, max_row, max_col, total_column=3)
+        first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
         self.logger.info(f"运单清单工作表分析完成:")
         self.logger.info(f"  - 工作表名称: '{list_sheet.title}'")
@@ -206,55 +359,36 @@ class DPDProcessor:
     填充运单清单工作表
     """
     try:
-        # 获取数据字段到模板字段的映射关系
-        field_mappings = self.sheet_mappings["List （运单清单）"]
-
         # 获取模板表头到列号的映射
         header_column_mapping = self.get_header_column_mapping(list_sheet)
+        self.build_list_payload(original_file_data, header_column_mapping, first_empty_row).apply(list_sheet)
 
-        # 检查原始数据的列名和可用数据
-        available_columns = original_file_data.columns.tolist()
-        self.logger.info(f"原始数据可用列: {available_columns}")
-        self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
-
-        # 数据行数
-        data_row_count = len(original_file_data)
-        self.logger.info(f"需要填充 {data_row_count} 行数据")
-
-        # 逐行填充数据
-        for data_row_idx in range(data_row_count):
-            target_row = first_empty_row + data_row_idx
-            row_data = original_file_data.iloc[data_row_idx]
+    except Exception as e:
+        self.logger.error(f"填充运单清单工作表时出错: {str(e)}")
+        raise
 
-            self.logger.debug(f"开始填充第 {data_row_idx + 1} 行数据到模板第 {target_row} 行")
+  def build_list_payload(self, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+    """
+    计算运单清单工作表的填充数据（不操作工作簿，可在线程/进程池中执行）
 
-            # 遍历字段映射关系
-            for data_field, template_field in field_mappings.items():
-                try:
-                    # 检查数据中是否有该字段
-                    if data_field in available_columns:
-                        # 检查模板中是否有对应的表头列
-                        if template_field in header_column_mapping:
-                            col_num = header_column_mapping[template_field]
-                            field_value = row_data[data_field]
-
-                            # 填充数据到指定位置
-                            list_sheet.cell(row=target_row, column=col_num).value = field_value
-                            self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                        else:
-                            self.logger.warning(f"  模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
-                    else:
-                        self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
+    Args:
+        original_file_data: 原始数据
+        header_column_mapping: 模板表头到列号的映射
+        first_empty_row: 数据起始行
 
-                except Exception as e:
-                    self.logger.error(f"  填充字段 '{data_field}' 时出错: {str(e)}")
-                    continue
+    Returns:
+        SheetFillPlan: 运单清单填充计划
+    """
+    # 获取数据字段到模板字段的映射关系
+    field_mappings = self.sheet_mappings["List （运单清单）"]
+    self.logger.info(f"原始数据可用列: {original_file_data.columns.tolist()}")
+    self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
 
-        self.logger.info(f"运单清单数据填充完成，共填充 {data_row_count} 行")
+    fill_plan = SheetFillPlan("List （运单清单）", first_empty_row)
+    fill_plan.add_mapped_columns(original_file_data, field_mappings, header_column_mapping, total_fields=TOTAL_FIELDS)
 
-    except Exception as e:
-        self.logger.error(f"填充运单清单工作表时出错: {str(e)}")
-        raise
+    self.logger.info(f"运单清单数据计算完成，共 {len(original_file_data)} 行")
+    return fill_plan
 
   def get_template_sub_order_sheet(self, template_workbook: Workbook):
     """
@@ -290,6 +424,7 @@ class DPDProcessor:
 
         first_empty_row = self._find_first_empty_row(sub_order_sheet, max_row, max_col)
         collection_total_row = self._find_collection_total_row(sub_order_sheet, max_row, max_col)
+        first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
         self.logger.info(f"子单号工作表分析完成:")
         self.logger.info(f"  - 工作表名称: '{sub_order_sheet.title}'")
@@ -317,27 +452,62 @@ class DPDProcessor:
         self.logger.error(f"处理子单号工作表时出错: {str(e)}")
         raise
 
-  def get_field_value_from_data_source(self, data_source: pd.DataFrame, data_field: str, data_field_value: str):
+  def match_first_rows(self, data_source: pd.DataFrame, data_field: str, lookup_values):
     """
-    从数据源中获取指定列字段值等于指定值的行数据
+    按字段值匹配数据源中的行（构建"字段值 -> 第一行位置"的哈希索引，一次完成所有查找）
+
+    Args:
+        data_source: 被查找的数据源
+        data_field: 匹配字段
+        lookup_values: 需要查找的值序列
+
+    Returns:
+        tuple: (每个查找值对应的行位置数组（未匹配为-1）, 在数据源中重复出现的字段值列表)
     """
-    return data_source[data_source[data_field] == data_field_value]
+    keys = data_source[data_field]
+    if use_polars(len(keys), self.polars_row_threshold):
+        matched = PolarsEngine().match_first_rows(keys, lookup_values)
+        if matched is not None:
+            return matched
+
+    first_occurrence = ~keys.duplicated().to_numpy() & keys.notna().to_numpy()
+    first_positions = np.flatnonzero(first_occurrence)
+    key_index = pd.Index(keys.to_numpy(dtype=object)[first_positions])
+
+    matched = key_index.get_indexer(pd.Index(np.asarray(lookup_values, dtype=object)))
+    row_positions = np.where(matched >= 0, first_positions[np.maximum(matched, 0)], -1)
 
+    duplicated_keys = keys[keys.duplicated() & keys.notna()].unique().tolist()
+    return row_positions, duplicated_keys
 
   def fill_sub_order_sheet(self, sub_order_sheet: Worksheet, original_detail_file_data: pd.DataFrame, original_file_data: pd.DataFrame, first_empty_row: int):
     """
     填充子单号工作表
+    """
+    try:
+        # 获取模板表头到列号的映射
+        header_column_mapping = self.get_header_column_mapping(sub_order_sheet)
+        fill_plan = self.build_sub_order_payload(original_detail_file_data, original_file_data, header_column_mapping, first_empty_row)
+        SheetOverflowWriter().write(sub_order_sheet.parent, sub_order_sheet, fill_plan)
+
+    except Exception as e:
+        self.logger.error(f"填充子单号工作表时出错: {str(e)}")
+        raise
+
+  def build_sub_order_payload(self, original_detail_file_data: pd.DataFrame, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+    """
+    计算子单号工作表的填充数据
     根据字段映射从不同的数据源获取数据：
-    - detail源：original_detail_file_data（明细表数据）
-    - list源：original_file_data（列表数据）
+    - detail源：original_detail_file_data（明细表数据），按行对应
+    - list源：original_file_data（列表数据），按客户单号匹配第一行
+
+    Returns:
+        SheetFillPlan: 子单号填充计划
     """
     try:
         # 获取数据字段到模板字段的映射关系
         field_mappings = self.sheet_mappings["子单号"]
 
-        # 获取模板表头到列号的映射
-        header_column_mapping = self.get_header_column_mapping(sub_order_sheet)
-
         # 准备数据源字典
         data_sources = {
             "detail": original_detail_file_data,
@@ -358,92 +528,87 @@ class DPDProcessor:
         data_row_count = len(original_detail_file_data)
         self.logger.info(f"需要填充 {data_row_count} 行数据")
 
-        # 逐行填充数据
-        for data_row_idx in range(data_row_count):
-            target_row = first_empty_row + data_row_idx
-            self.logger.debug(f"开始填充第 {data_row_idx + 1} 行数据到模板第 {target_row} 行")
+        fill_plan = SheetFillPlan("子单号", first_empty_row)
+
+        # 遍历不同数据源的字段映射关系
+        for source_type, source_mappings in field_mappings.items():
+            # 获取对应的数据源
+            current_data_source = data_sources.get(source_type)
 
-            # 遍历不同数据源的字段映射关系
-            for source_type, source_mappings in field_mappings.items():
-                # 获取对应的数据源
-                current_data_source = data_sources.get(source_type)
+            if current_data_source is None:
+                self.logger.warning(f"数据源 '{source_type}' 为空，跳过")
+                continue
 
-                if current_data_source is None:
-                    self.logger.warning(f"数据源 '{source_type}' 为空，跳过")
+            # 每个明细行在数据源中对应的行位置（-1表示没有对应行）
+            if source_type == "detail":
+                # detail源：直接按行对应
+                row_positions = np.arange(data_row_count)
+
+            elif source_type == "list":
+                # list源：根据客户单号匹配
+                if "客户单号" not in original_detail_file_data.columns:
+                    self.logger.error("明细表中未找到'客户单号'字段，无法进行匹配")
+                    continue
+                if "客户单号" not in current_data_source.columns:
+                    self.logger.error("list数据源中未找到'客户单号'字段，无法进行匹配")
                     continue
 
-                # 获取当前行数据
-                if source_type == "detail":
-                    # detail源：直接按行索引获取
-                    if data_row_idx >= len(current_data_source):
-                        self.logger.warning(f"数据源 '{source_type}' 行数不足，跳过第{data_row_idx + 1}行")
-                        continue
-                    row_data = current_data_source.iloc[data_row_idx]
-                    available_columns = current_data_source.columns.tolist()
+                customer_order_nos = original_detail_file_data["客户单号"]
+                row_positions, duplicated_keys = self.match_first_rows(current_data_source, "客户单号", customer_order_nos)
+
+                # 匹配问题汇总后统一记录
+                unmatched = customer_order_nos[row_positions < 0]
+                if not unmatched.empty:
+                    unmatched_keys = unmatched.unique().tolist()
+                    self.logger.warning(f"在list数据源中未找到 {len(unmatched_keys)} 个客户单号的匹配行（共 {len(unmatched)} 行），跳过: {unmatched_keys[:20]}")
+                if duplicated_keys:
+                    self.logger.warning(f"在list数据源中有 {len(duplicated_keys)} 个客户单号存在多个匹配行，使用第一个: {duplicated_keys[:20]}")
 
-                elif source_type == "list":
-                    # list源：根据客户单号匹配
-                    detail_row_data = original_detail_file_data.iloc[data_row_idx]
+            else:
+                self.logger.warning(f"未知的数据源类型: {source_type}")
+                continue
 
-                    # 检查明细表是否有"客户单号"字段
-                    if "客户单号" not in original_detail_file_data.columns:
-                        self.logger.error("明细表中未找到'客户单号'字段，无法进行匹配")
+            self.logger.debug(f"处理数据源 '{source_type}' 的字段映射")
+            matched = row_positions >= 0
+            available_columns = current_data_source.columns.tolist()
+
+            # 遍历该数据源的字段映射关系，整列取值
+            for data_field, template_field in source_mappings.items():
+                try:
+                    # 检查数据中是否有该字段
+                    if data_field not in available_columns:
+                        self.logger.warning(f"  数据源'{source_type}'中未找到字段 '{data_field}'，跳过")
+                        continue
+                    # 检查模板中是否有对应的表头列
+                    if template_field not in header_column_mapping:
+                        self.logger.warning(f"  模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
                         continue
 
-                    customer_order_no = detail_row_data["客户单号"]
-                    self.logger.debug(f"查找客户单号: {customer_order_no}")
+                    col_num = header_column_mapping[template_field]
+                    source_values = current_data_source[data_field].to_numpy(dtype=object)
 
-                    # 在list数据源中查找匹配的行
-                    matched_rows = self.get_field_value_from_data_source(
-                        current_data_source, "客户单号", customer_order_no
-                    )
+                    # 确保特定字段以文本格式填充
+                    is_text_field = data_field in self.text_fields
+                    if is_text_field:
+                        source_values = source_values.astype(str).astype(object)
 
-                    if matched_rows.empty:
-                        self.logger.warning(f"在list数据源中未找到客户单号'{customer_order_no}'的匹配行，跳过")
-                        continue
-                    elif len(matched_rows) > 1:
-                        self.logger.warning(f"在list数据源中找到多个客户单号'{customer_order_no}'的匹配行，使用第一个")
+                    values = np.full(data_row_count, None, dtype=object)
+                    values[matched] = source_values[row_positions[matched]]
 
-                    # 使用第一个匹配行的数据
-                    row_data = matched_rows.iloc[0]
-                    available_columns = current_data_source.columns.tolist()
+                    fill_plan.add_column(col_num, values, TEXT_FORMAT if is_text_field else None)
+                    if data_field in TOTAL_FIELDS:
+                        fill_plan.set_total(col_num, column_total(current_data_source, data_field, row_positions[matched]), FIXED_POINT_SCALES.get(data_field))
+                    self.logger.debug(f"  填充[{source_type}]: {data_field} -> {template_field}(列{col_num})")
 
-                else:
-                    self.logger.warning(f"未知的数据源类型: {source_type}")
+                except Exception as e:
+                    self.logger.error(f"  填充字段 '{data_field}' 时出错: {str(e)}")
                     continue
 
-                self.logger.debug(f"处理数据源 '{source_type}' 的字段映射")
-
-                # 遍历该数据源的字段映射关系
-                for data_field, template_field in source_mappings.items():
-                    try:
-                        # 检查数据中是否有该字段
-                        if data_field in available_columns:
-                            # 检查模板中是否有对应的表头列
-                            if template_field in header_column_mapping:
-                                col_num = header_column_mapping[template_field]
-                                field_value = row_data[data_field]
-
-                                # 确保特定字段以文本格式填充
-                                if data_field in ["子转单号", "转单号", "客户单号"]:
-                                    field_value = str(field_value)
-
-                                # 填充数据到指定位置
-                                sub_order_sheet.cell(row=target_row, column=col_num).value = field_value
-                                self.logger.debug(f"  填充[{source_type}]: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                            else:
-                                self.logger.warning(f"  模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
-                        else:
-                            self.logger.warning(f"  数据源'{source_type}'中未找到字段 '{data_field}'，跳过")
-
-                    except Exception as e:
-                        self.logger.error(f"  填充字段 '{data_field}' 时出错: {str(e)}")
-                        continue
-
-        self.logger.info(f"子单号数据填充完成，共填充 {data_row_count} 行")
+        self.logger.info(f"子单号数据计算完成，共 {data_row_count} 行")
+        return fill_plan
 
     except Exception as e:
-        self.logger.error(f"填充子单号工作表时出错: {str(e)}")
+        self.logger.error(f"计算子单号填充数据时出错: {str(e)}")
         raise
 
   def _find_first_empty_row(self, worksheet, max_row, max_col):
@@ -483,6 +648,12 @@ class DPDProcessor:
         self.logger.error(f"查找空行时出错: {str(e)}")
         return max_row + 1  # 返回一个安全的行号
 
+  def _clamp_first_empty_row(self, first_empty_row: int, collection_total_row: int):
+    """数据区已填满时第一个空行位于合计行之后，新数据仍从合计行之前开始填充（由合计行处理插入行）"""
+    if collection_total_row is not None and first_empty_row > collection_total_row:
+      return collection_total_row
+    return first_empty_row
+
   def _find_collection_total_row(self, worksheet: Worksheet, max_row: int, max_col: int, search_terms: list = None, total_column: int = 1):
     """
     查找第一列中包含"Collection Total"的行
@@ -524,143 +695,112 @@ class DPDProcessor:
         self.logger.error(f"查找Collection Total行时出错: {str(e)}")
         return None
 
-  def classify_countries_data(self, original_file_data: pd.DataFrame):
+  def get_de_postcodes(self):
     """
-    按国家代码分类数据
-    
-    Args:
-        original_file_data: 原始数据
-        
+    总结单配置的DE指定邮编（每个邮编对应总结单中的一列）
+
     Returns:
-        dict: 按国家代码分类的数据字典
+        list: DE指定邮编列表
+
+    Raises:
+        ValueError: 配置中有重复的邮编（规范化后相同），无法确定件数应计入哪一列
     """
-    try:
-        summary_config = self.sheet_mappings["总结单"]
-        supported_countries = summary_config["supported_countries"]
-        de_postcodes = summary_config["de_postcodes"]
-        
-        # 检查是否有国家二字码字段
-        if "国家二字码" not in original_file_data.columns:
-            self.logger.error("原始数据中未找到'国家二字码'字段")
-            return {}
-        
-        classified_data = {}
-        
-        # 处理DE国家特殊逻辑
-        de_data = original_file_data[original_file_data["国家二字码"] == "DE"]
-        if not de_data.empty:
-            # DE国家中指定邮编的数据
-            if "收件人邮编" in de_data.columns:
-                de_specified_postcodes = de_data[de_data["收件人邮编"].astype(str).isin([str(pc) for pc in de_postcodes])]
-                classified_data["DE"] = de_specified_postcodes
-                self.logger.debug(f"DE指定邮编: {len(de_specified_postcodes)} 条记录")
-                
-                # DE国家中非指定邮编的数据归入other
-                de_other_postcodes = de_data[~de_data["收件人邮编"].astype(str).isin([str(pc) for pc in de_postcodes])]
-                self.logger.debug(f"DE其他邮编: {len(de_other_postcodes)} 条记录")
-            else:
-                # 如果没有邮编字段，所有DE数据都归入other
-                de_other_postcodes = de_data
-                classified_data["DE"] = pd.DataFrame()  # 空的DE数据
-                self.logger.debug(f"DE数据（无邮编字段）: {len(de_other_postcodes)} 条记录")
-        else:
-            de_other_postcodes = pd.DataFrame()
-            classified_data["DE"] = pd.DataFrame()
-        
-        # 分类其他支持的国家（除DE外）
-        other_supported_countries = [c for c in supported_countries if c != "DE"]
-        for country in other_supported_countries:
-            country_data = original_file_data[original_file_data["国家二字码"] == country]
-            classified_data[country] = country_data
-            self.logger.debug(f"国家 {country}: {len(country_data)} 条记录")
-        
-        # 分类其他国家 + DE中非指定邮编的数据
-        other_countries_data = original_file_data[~original_file_data["国家二字码"].isin(supported_countries)]
-        
-        # 合并DE其他邮编数据和其他国家数据
-        if not de_other_postcodes.empty and not other_countries_data.empty:
-            other_data = pd.concat([other_countries_data, de_other_postcodes], ignore_index=True)
-        elif not de_other_postcodes.empty:
-            other_data = de_other_postcodes
-        elif not other_countries_data.empty:
-            other_data = other_countries_data
-        else:
-            other_data = pd.DataFrame()
-            
-        classified_data["other"] = other_data
-        self.logger.debug(f"其他类别: {len(other_data)} 条记录")
-        
-        self.logger.info(f"数据分类完成，共分为 {len(classified_data)} 个类别")
-        return classified_data
-        
-    except Exception as e:
-        self.logger.error(f"分类国家数据时出错: {str(e)}")
-        return {}
+    de_postcodes = self.sheet_mappings["总结单"]["de_postcodes"]
+    seen = set()
+    duplicates = []
+    for postcode in de_postcodes:
+        key = canonical_postcode(postcode)
+        if key in seen:
+            duplicates.append(postcode)
+        seen.add(key)
+    if duplicates:
+        raise ValueError(f"总结单配置中的DE指定邮编重复: {duplicates}")
+    return de_postcodes
 
-  def count_de_postcodes(self, de_data: pd.DataFrame):
+  def partition_countries(self, original_file_data: pd.DataFrame):
     """
-    统计DE国家指定邮编的件数
-    
+    按总结单的统计类别划分数据（一次向量化计算）
+
+    类别依次为：DE各指定邮编、除DE外的各支持国家、other（其他国家、无效国家代码及DE非指定邮编）
+
     Args:
-        de_data: DE国家的数据
-        
+        original_file_data: 原始数据
+
     Returns:
-        dict: 邮编对应的件数字典
-    """
-    try:
-        summary_config = self.sheet_mappings["总结单"]
-        de_postcodes = summary_config["de_postcodes"]
-        
-        # 检查是否有必要字段
-        if "收件人邮编" not in de_data.columns:
-            self.logger.error("DE数据中未找到'收件人邮编'字段")
-            return {}
-            
-        if "件数" not in de_data.columns:
-            self.logger.error("DE数据中未找到'件数'字段")
-            return {}
-        
-        postcode_counts = {}
-        
-        # 统计每个指定邮编的件数
-        for postcode in de_postcodes:
-            # 将邮编转换为字符串进行比较
-            postcode_data = de_data[de_data["收件人邮编"].astype(str) == str(postcode)]
-            total_pieces = postcode_data["件数"].sum() if not postcode_data.empty else 0
-            postcode_counts[postcode] = total_pieces
-            self.logger.debug(f"邮编 {postcode}: {total_pieces} 件")
-        
-        self.logger.info(f"DE邮编统计完成，共统计 {len(de_postcodes)} 个邮编")
-        return postcode_counts
-        
-    except Exception as e:
-        self.logger.error(f"统计DE邮编件数时出错: {str(e)}")
-        return {}
+        tuple: (每行的类别编号数组, 类别名称列表)，类别名称为DE指定邮编或国家代码，最后一个为"other"
+    """
+    summary_config = self.sheet_mappings["总结单"]
+    supported_countries = summary_config["supported_countries"]
+    de_postcodes = self.get_de_postcodes()
+
+    normalized = get_normalized_view(original_file_data)
+
+    def compute():
+        other_countries = [country for country in supported_countries if country != "DE"]
+        categories = list(de_postcodes) + other_countries + ["other"]
+        other_category = len(categories) - 1
+        de_category = -1
+
+        # 国家代码编号 -> 类别编号，末尾一项对应无效国家代码（编号-1）
+        codes, labels = normalized.country_codes("国家二字码")
+        country_categories = np.full(len(labels) + 1, other_category, dtype=np.int64)
+        for index, label in enumerate(labels):
+            if label == "DE":
+                country_categories[index] = de_category
+            elif label in other_countries:
+                country_categories[index] = len(de_postcodes) + other_countries.index(label)
+        row_categories = country_categories[codes]
+
+        # DE按邮编分组索引归入指定邮编，非指定邮编（或缺少邮编列）归入other
+        de_rows = row_categories == de_category
+        if "收件人邮编" in original_file_data.columns:
+            buckets = normalized.postcode_buckets("收件人邮编", de_postcodes)[de_rows]
+            row_categories[de_rows] = np.where(buckets >= 0, buckets, other_category)
+        else:
+            row_categories[de_rows] = other_category
+
+        return row_categories, categories
 
-  def count_country_pieces(self, country_data: pd.DataFrame):
+    return normalized.get_derived(("dpd_summary_categories", tuple(de_postcodes), tuple(supported_countries)), compute)
+
+  def count_category_pieces(self, original_file_data: pd.DataFrame):
     """
-    统计指定国家数据的总件数
-    
+    统计总结单各类别的件数（一次分组汇总）
+
     Args:
-        country_data: 国家数据
-        
+        original_file_data: 原始数据
+
     Returns:
-        int: 总件数
+        tuple: (类别名称 -> 件数, 类别名称 -> 行数)
     """
-    try:
-        if country_data.empty:
-            return 0
-            
-        if "件数" not in country_data.columns:
-            self.logger.error("数据中未找到'件数'字段")
-            return 0
-        
-        total_pieces = country_data["件数"].sum()
-        return int(total_pieces)
-        
-    except Exception as e:
-        self.logger.error(f"统计国家件数时出错: {str(e)}")
-        return 0
+    if use_polars(len(original_file_data), self.polars_row_threshold) and "件数" in original_file_data.columns:
+        summary_config = self.sheet_mappings["总结单"]
+        other_countries = [country for country in summary_config["supported_countries"] if country != "DE"]
+        de_postcodes = self.get_de_postcodes()
+        counts = PolarsEngine().category_counts(get_normalized_view(original_file_data), "国家二字码", "收件人邮编",
+                                                de_postcodes, other_countries, "件数")
+        if counts is not None:
+            categories = list(de_postcodes) + other_countries + ["other"]
+            self.logger.info(f"数据分类完成，共分为 {len(categories)} 个类别")
+            return dict(zip(categories, counts[0])), dict(zip(categories, counts[1]))
+
+    row_categories, categories = self.partition_countries(original_file_data)
+
+    if "件数" in original_file_data.columns:
+        pieces = get_normalized_view(original_file_data).numeric("件数")
+    else:
+        self.logger.error("数据中未找到'件数'字段")
+        pieces = np.zeros(len(row_categories), dtype=np.int64)
+
+    totals = np.bincount(row_categories, weights=pieces, minlength=len(categories))
+    if np.issubdtype(pieces.dtype, np.integer):
+        totals = totals.astype(np.int64)
+    row_counts = np.bincount(row_categories, minlength=len(categories))
+
+    category_pieces = dict(zip(categories, totals))
+    category_rows = dict(zip(categories, row_counts))
+    self.logger.info(f"数据分类完成，共分为 {len(categories)} 个类别")
+    return category_pieces, category_rows
 
   def get_template_summary_sheet(self, template_workbook: Workbook):
     """
@@ -732,66 +872,85 @@ class DPDProcessor:
         summary_sheet: 总结单工作表
         original_file_data: 原始数据
     """
+    try:
+        self.build_summary_payload(original_file_data).apply(summary_sheet)
+    except Exception as e:
+        self.logger.error(f"填充总结单工作表时出错: {str(e)}")
+        raise
+
+  def build_summary_payload(self, original_file_data: pd.DataFrame):
+    """
+    计算总结单工作表的填充数据
+    
+    Args:
+        original_file_data: 原始数据
+
+    Returns:
+        SheetFillPlan: 总结单填充计划（固定位置单元格）
+    """
     try:
         summary_config = self.sheet_mappings["总结单"]
-        data_row = summary_config["data_row"]
+        summary_plan = SheetFillPlan("总结单")
         
-        self.logger.info("开始填充总结单数据")
+        self.logger.info("开始计算总结单数据")
         
-        # 1. 按国家代码分类数据
-        classified_data = self.classify_countries_data(original_file_data)
-        if not classified_data:
+        # 检查是否有国家二字码字段
+        if "国家二字码" not in original_file_data.columns:
+            self.logger.error("原始数据中未找到'国家二字码'字段")
             self.logger.error("数据分类失败，无法继续填充总结单")
-            return
+            return summary_plan
+
+        # 1. 按统计类别划分数据并汇总件数
+        category_pieces, category_rows = self.count_category_pieces(original_file_data)
             
         # 2. 填充DE邮编统计
-        self._fill_de_postcode_stats(summary_sheet, classified_data.get("DE", pd.DataFrame()), summary_config)
+        self._fill_de_postcode_stats(summary_plan, category_pieces, category_rows, summary_config)
         
         # 3. 填充其他国家统计  
-        self._fill_other_countries_stats(summary_sheet, classified_data, summary_config)
+        self._fill_other_countries_stats(summary_plan, category_pieces, summary_config)
         
         # 4. 填充Other类别统计
-        self._fill_other_category_stats(summary_sheet, classified_data.get("other", pd.DataFrame()), summary_config)
+        self._fill_other_category_stats(summary_plan, category_pieces["other"], summary_config)
         
         # 5. 计算并填充总计
-        self._fill_total_stats(summary_sheet, classified_data, summary_config)
+        self._fill_total_stats(summary_plan, category_pieces, summary_config)
         
-        self.logger.info("总结单数据填充完成")
+        self.logger.info("总结单数据计算完成")
+        return summary_plan
         
     except Exception as e:
-        self.logger.error(f"填充总结单工作表时出错: {str(e)}")
+        self.logger.error(f"计算总结单数据时出错: {str(e)}")
         raise
 
-  def _fill_de_postcode_stats(self, summary_sheet: Worksheet, de_data: pd.DataFrame, summary_config: dict):
+  def _fill_de_postcode_stats(self, summary_plan: SheetFillPlan, category_pieces: dict, category_rows: dict, summary_config: dict):
     """
     填充DE邮编统计数据
     """
     try:
-        if de_data.empty:
+        de_postcodes = self.get_de_postcodes()
+        if not sum(category_rows[postcode] for postcode in de_postcodes):
             self.logger.info("没有DE国家数据，跳过DE邮编统计")
             return
             
         self.logger.info("开始填充DE邮编统计")
         
-        # 统计DE邮编件数
-        postcode_counts = self.count_de_postcodes(de_data)
-        
         # 填充到工作表
         data_row = summary_config["data_row"]
         start_col = summary_config["de_start_col"]
         
-        for i, (postcode, count) in enumerate(postcode_counts.items()):
+        for i, postcode in enumerate(de_postcodes):
+            count = category_pieces[postcode]
             col_num = start_col + i
-            summary_sheet.cell(row=data_row, column=col_num).value = count
+            summary_plan.set_cell(data_row, col_num, count)
             self.logger.debug(f"填充DE邮编 {postcode}: {count} 件到列 {col_num}")
             
-        self.logger.info(f"DE邮编统计填充完成，共填充 {len(postcode_counts)} 个邮编")
+        self.logger.info(f"DE邮编统计填充完成，共填充 {len(de_postcodes)} 个邮编")
         
     except Exception as e:
         self.logger.error(f"填充DE邮编统计时出错: {str(e)}")
         raise
 
-  def _fill_other_countries_stats(self, summary_sheet: Worksheet, classified_data: dict, summary_config: dict):
+  def _fill_other_countries_stats(self, summary_plan: SheetFillPlan, category_pieces: dict, summary_config: dict):
     """
     填充其他国家统计数据（FR、IT、ES、NL、PL、CZ、BE）
     """
@@ -803,11 +962,10 @@ class DPDProcessor:
         start_col = summary_config["other_countries_start_col"]
         
         for i, country in enumerate(other_countries):
-            country_data = classified_data.get(country, pd.DataFrame())
-            count = self.count_country_pieces(country_data)
+            count = int(category_pieces.get(country, 0))
             
             col_num = start_col + i
-            summary_sheet.cell(row=data_row, column=col_num).value = count
+            summary_plan.set_cell(data_row, col_num, count)
             self.logger.debug(f"填充国家 {country}: {count} 件到列 {col_num}")
             
         self.logger.info(f"其他国家统计填充完成，共填充 {len(other_countries)} 个国家")
@@ -816,19 +974,19 @@ class DPDProcessor:
         self.logger.error(f"填充其他国家统计时出错: {str(e)}")
         raise
 
-  def _fill_other_category_stats(self, summary_sheet: Worksheet, other_data: pd.DataFrame, summary_config: dict):
+  def _fill_other_category_stats(self, summary_plan: SheetFillPlan, other_pieces, summary_config: dict):
     """
     填充Other类别统计数据
     """
     try:
         self.logger.info("开始填充Other类别统计")
         
-        count = self.count_country_pieces(other_data)
+        count = int(other_pieces)
         
         data_row = summary_config["data_row"]
         other_col = summary_config["other_col"]
         
-        summary_sheet.cell(row=data_row, column=other_col).value = count
+        summary_plan.set_cell(data_row, other_col, count)
         self.logger.debug(f"填充Other类别: {count} 件到列 {other_col}")
         
         self.logger.info(f"Other类别统计填充完成: {count} 件")
@@ -837,29 +995,23 @@ class DPDProcessor:
         self.logger.error(f"填充Other类别统计时出错: {str(e)}")
         raise
 
-  def _fill_total_stats(self, summary_sheet: Worksheet, classified_data: dict, summary_config: dict):
+  def _fill_total_stats(self, summary_plan: SheetFillPlan, category_pieces: dict, summary_config: dict):
     """
-    计算并填充总计统计数据
+    计算并填充总计统计数据（各类别件数之和）
     """
     try:
         self.logger.info("开始计算并填充总计统计")
         
-        total_count = 0
-        
-        # 统计所有分类的件数
-        for category, data in classified_data.items():
-            count = self.count_country_pieces(data)
-            total_count += count
-            self.logger.debug(f"类别 {category}: {count} 件")
+        total_count = int(sum(category_pieces.values()))
             
         data_row = summary_config["data_row"]
         total_col = summary_config["total_col"]
         
-        summary_sheet.cell(row=data_row, column=total_col).value = total_count
+        summary_plan.set_cell(data_row, total_col, total_count)
         self.logger.debug(f"填充总计: {total_count} 件到列 {total_col}")
         
         self.logger.info(f"总计统计填充完成: {total_count} 件")
         
     except Exception as e:
         self.logger.error(f"填充总计统计时出错: {str(e)}")
-        raise
\ No newline at end of file
+        raise
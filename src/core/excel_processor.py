@@ -7,10 +7,15 @@ import pandas as pd
 import logging
 import json
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
 from pathlib import Path
-from datetime import datetime
+from datetime import date, datetime
 from src.core.ups.ups_processor import UPSDataProcessor
 from src.core.dpd.dpd_processor import DPDProcessor
+from src.core.aggregate_store import AggregateStore, content_key, period_range
+from src.core.normalizer import get_normalized_view
+from src.core.progress import ProcessingCancelled, ProgressToken, track_reader
 # 添加项目根目录到Python路径
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
@@ -22,51 +27,405 @@ class ExcelProcessor:
 
     def __init__(self):
         self.logger = logging.getLogger(__name__)
+        # 最近一次处理的主数据行数（用于统计吞吐量）
+        self.last_row_count = 0
 
-    def process_file(self, input_file, template_type, detail_file=None):
+    def process_file(self, input_file, template_type, detail_file=None, output_dir=None, output_path=None, template=None, progress: ProgressToken = None,
+                     data_date=None):
         """
         处理Excel文件
 
         Args:
             input_file (str): 输入文件路径
-            template_type (str): 模板类型 ("UPS" 或 "DPD")
+            template_type (str|list): 模板类型 ("UPS" 或 "DPD")，为列表时只读取一次输入，并发生成各模板的输出（见process_carriers）
             detail_file (str, optional): 单件明细表文件路径
+            output_dir (str, optional): 输出目录，默认输出到桌面
+            output_path (str, optional): 输出文件路径，指定时忽略output_dir（批量处理时避免同一秒内的文件名冲突），
+                template_type为列表时为 {模板类型: 输出文件路径}
+            template (str|Workbook, optional): 模板文件路径或已加载的模板工作簿，默认使用设置中的模板文件，
+                template_type为列表时为 {模板类型: 模板}
+            progress (ProgressToken, optional): 进度令牌，读取、写入、保存时报告进度，其他线程可通过它取消处理（取消时删除写了一半的输出文件）
+            data_date (date|str, optional): 数据所属日期（保存到汇总累计库），默认见get_data_date
 
         Returns:
-            str: 输出文件路径，失败返回None
+            str: 输出文件路径，失败或取消返回None；template_type为列表时返回 {模板类型: 输出文件路径或None}
         """
+        if isinstance(template_type, (list, tuple)):
+            return self.process_carriers(input_file, template_type, detail_file, output_dir, output_path, template, progress, data_date)
+
         try:
-          output_path = self.get_output_path(template_type)
-          template_path = self.get_template_path(template_type)
+          self.last_row_count = 0
+          output_path = str(output_path) if output_path else self.get_output_path(template_type, output_dir)
+          template_path = template if template is not None else self.get_template_path(template_type)
           self.logger.info(f"输出文件路径: {output_path}")
           self.logger.info(f"处理类型: {template_type}")
-          self.logger.info(f"模板文件路径: {template_path}")
-
-          original_file_data = self.get_original_file_data(input_file, 0)
-          original_detail_file_data = self.get_original_file_data(detail_file, 0)
+          self.logger.info(f"模板: {template_path}")
+
+          # 读取主数据时按"读取、写入、保存"三遍估算整个处理的工作量
+          original_file_data = self.get_original_file_data(input_file, 0, progress, "读取主数据", 3)
+          original_detail_file_data = self.get_original_file_data(detail_file, 0, progress, "读取明细数据") if detail_file else None
+          if original_file_data is not None:
+              self.last_row_count = len(original_file_data)
+
+          success = self.fill_template(template_type, original_file_data, original_detail_file_data, template_path, output_path, input_file, progress,
+                                       data_date=data_date)
+          if success is None:
+              return None
+
+          if success and progress is not None:
+              progress.finish()
+          return output_path if success else None
+
+        except ProcessingCancelled:
+            self.logger.warning("处理已取消")
+            progress.discard_outputs()
+            return None
+        except Exception as e:
+            self.logger.error(f"处理Excel文件时出错: {str(e)}")
+            return None
 
-          if template_type == "UPS":
-              ups_processor = UPSDataProcessor()
-              ups_processor.process_ups_data(original_file_data, original_detail_file_data, template_path, output_path)
-          elif template_type == "DPD":
-              dpd_processor = DPDProcessor()
-              dpd_processor.process_dpd_data(original_file_data, original_detail_file_data, template_path, output_path)
+    def process_carriers(self, input_file, template_types, detail_file=None, output_dir=None, output_paths=None, templates=None, progress: ProgressToken = None,
+                         data_date=None):
+        """
+        同一份数据生成多个模板的输出：主数据和明细表只读取、规范化一次，各模板在线程中并发填充，分别写入各自的输出文件
 
-          return output_path
+        Args:
+            input_file (str): 输入文件路径
+            template_types (list): 模板类型列表，如 ["UPS", "DPD"]
+            detail_file (str, optional): 单件明细表文件路径
+            output_dir (str, optional): 输出目录，默认输出到桌面
+            output_paths (dict, optional): {模板类型: 输出文件路径}，未指定的模板类型按output_dir生成
+            templates (dict, optional): {模板类型: 模板文件路径或已加载的模板工作簿}，默认使用设置中的模板文件
+            progress (ProgressToken, optional): 进度令牌，各模板使用其子令牌，取消时删除所有模板写了一半的输出文件
+            data_date (date|str, optional): 数据所属日期（保存到汇总累计库），默认见get_data_date
 
+        Returns:
+            dict: {模板类型: 输出文件路径，失败或取消为None}
+        """
+        template_types = list(dict.fromkeys(template_types))
+        output_paths = output_paths or {}
+        templates = templates or {}
+        results = dict.fromkeys(template_types)
+        try:
+            self.last_row_count = 0
+            unknown = [template_type for template_type in template_types if template_type not in TEMPLATE_TYPES]
+            if unknown:
+                self.logger.error(f"未知的模板类型: {unknown}")
+                return results
+
+            tasks = []
+            for template_type in template_types:
+                output_path = str(output_paths[template_type]) if output_paths.get(template_type) else str(self.get_output_path(template_type, output_dir))
+                template_path = templates.get(template_type)
+                template_path = template_path if template_path is not None else self.get_template_path(template_type)
+                self.logger.info(f"处理类型: {template_type}，模板: {template_path}，输出文件路径: {output_path}")
+                tasks.append((template_type, template_path, output_path))
+
+            # 读取主数据时按"读取，以及每个模板的写入、保存"估算整个处理的工作量
+            original_file_data = self.get_original_file_data(input_file, 0, progress, "读取主数据", 1 + 2 * len(tasks))
+            original_detail_file_data = self.get_original_file_data(detail_file, 0, progress, "读取明细数据") if detail_file else None
+            if original_file_data is None:
+                self.logger.error("读取主数据失败")
+                return results
+            self.last_row_count = len(original_file_data)
+
+            # 规范化视图只创建一次，各模板的处理器共享
+            get_normalized_view(original_file_data, refresh=True)
+
+            child_progress = {}
+            if progress is not None:
+                cells = original_file_data.size
+                progress.estimate_remaining(0)
+                child_progress = {template_type: progress.child(template_type, 2 * cells) for template_type, _, _ in tasks}
+
+            self.logger.info(f"并发生成 {len(tasks)} 个模板的输出: {template_types}")
+            with ThreadPoolExecutor(max_workers=len(tasks), thread_name_prefix="carrier") as executor:
+                futures = {
+                    template_type: executor.submit(self.fill_template, template_type, original_file_data, original_detail_file_data, template_path,
+                                                   output_path, input_file, child_progress.get(template_type), False, data_date)
+                    for template_type, template_path, output_path in tasks
+                }
+                for template_type, template_path, output_path in tasks:
+                    if futures[template_type].result():
+                        results[template_type] = output_path
+
+            # 取消时各模板的处理已停止，删除所有模板本次写出的文件
+            if progress is not None and progress.cancelled and None in results.values():
+                raise ProcessingCancelled("处理已取消")
+            if progress is not None:
+                progress.finish()
+            return results
+
+        except ProcessingCancelled:
+            self.logger.warning("处理已取消")
+            progress.discard_outputs()
+            return dict.fromkeys(template_types)
         except Exception as e:
             self.logger.error(f"处理Excel文件时出错: {str(e)}")
+            return results
+
+    def get_output_options(self):
+        """
+        处理器的输出选项（来自config），作为process_ups_data、process_dpd_data的关键字参数，各调用处共用
+
+        Returns:
+            dict: parallel、max_workers、overflow_mode、shared_strings、totals_mode、validation
+        """
+        return {
+            "parallel": SHEET_PAYLOAD_PARALLEL_MODE,
+            "max_workers": SHEET_PAYLOAD_MAX_WORKERS,
+            "overflow_mode": OVERFLOW_SHARD_MODE,
+            "shared_strings": SHARED_STRINGS_OPTIMIZE,
+            "totals_mode": TOTALS_MODE,
+            "validation": INPUT_VALIDATION,
+        }
+
+    def fill_template(self, template_type, original_file_data, original_detail_file_data, template_path, output_path, input_file=None,
+                      progress: ProgressToken = None, refresh_view: bool = True, data_date=None):
+        """
+        使用已读取的数据填充一个模板并保存（UPS处理成功后保存汇总结果）
+
+        Args:
+            template_type (str): 模板类型 ("UPS" 或 "DPD")
+            original_file_data (pd.DataFrame): 主数据
+            original_detail_file_data (pd.DataFrame): 明细数据
+            template_path (str|Workbook): 模板文件路径或已加载的模板工作簿
+            output_path (str): 输出文件路径
+            input_file (str, optional): 主数据文件路径，作为汇总结果的记录来源
+            progress (ProgressToken, optional): 进度令牌
+            refresh_view (bool): 是否重新创建主数据的规范化视图（多个模板共享已规范化的数据时为False）
+            data_date (date|str, optional): 数据所属日期（保存到汇总累计库），默认见get_data_date
+
+        Returns:
+            bool: 处理结果，未知的模板类型返回None
+        """
+        if template_type == "UPS":
+            ups_processor = UPSDataProcessor(POLARS_ROW_THRESHOLD)
+            success = ups_processor.process_ups_data(original_file_data, original_detail_file_data, template_path, output_path,
+                                                     progress=progress, refresh_view=refresh_view, **self.get_output_options())
+            if success:
+                self.record_aggregates(ups_processor, original_file_data, input_file, data_date)
+            return success
+        if template_type == "DPD":
+            dpd_processor = DPDProcessor(POLARS_ROW_THRESHOLD)
+            return dpd_processor.process_dpd_data(original_file_data, original_detail_file_data, template_path, output_path,
+                                                  progress=progress, refresh_view=refresh_view, **self.get_output_options())
+        self.logger.error(f"未知的模板类型: {template_type}")
+        return None
+
+    def append_file(self, input_file, template_type, previous_output, detail_file=None, output_path=None, data_date=None):
+        """
+        将新增的数据文件追加到已生成的输出文件中
+
+        Args:
+            input_file (str): 新增的主数据文件路径
+            template_type (str): 模板类型 ("UPS" 或 "DPD")
+            previous_output (str): 之前生成的输出文件路径
+            detail_file (str, optional): 新增的单件明细表文件路径
+            output_path (str, optional): 输出文件路径，默认覆盖previous_output
+            data_date (date|str, optional): 新增数据所属日期（保存到汇总累计库），默认见get_data_date
+
+        Returns:
+            str: 输出文件路径，失败返回None
+        """
+        try:
+            output_path = output_path or previous_output
+            self.logger.info(f"追加模式，原输出文件: {previous_output}，输出文件: {output_path}")
+
+            original_file_data = self.get_original_file_data(input_file, 0)
+            original_detail_file_data = self.get_original_file_data(detail_file, 0) if detail_file else None
+
+            if template_type == "UPS":
+                ups_processor = UPSDataProcessor(POLARS_ROW_THRESHOLD)
+                success = ups_processor.append_ups_data(original_file_data, original_detail_file_data, previous_output, output_path,
+                                                         shared_strings=SHARED_STRINGS_OPTIMIZE, totals_mode=TOTALS_MODE)
+                if success:
+                    # 只保存新增数据的汇总结果：之前的数据已按其内容单独保存，两者相加即为追加后的合计
+                    self.record_aggregates(ups_processor, original_file_data, input_file, data_date)
+            elif template_type == "DPD":
+                success = DPDProcessor(POLARS_ROW_THRESHOLD).append_dpd_data(original_file_data, original_detail_file_data, previous_output, output_path,
+                                                                         shared_strings=SHARED_STRINGS_OPTIMIZE, totals_mode=TOTALS_MODE)
+            else:
+                self.logger.error(f"未知的模板类型: {template_type}")
+                return None
+
+            return output_path if success else None
+
+        except Exception as e:
+            self.logger.error(f"追加Excel文件时出错: {str(e)}")
             return None
 
-    def get_original_file_data(self, input_file, sheet_index):
+    def process_to_bytes(self, input_data, template_type, detail_data=None, output_stream=None, template=None):
+        """
+        在内存中处理数据，不经过磁盘输出文件
+
+        Args:
+            input_data (pd.DataFrame|str|bytes|file-like): 主数据，可以是DataFrame、文件路径、字节串或文件对象
+            template_type (str): 模板类型 ("UPS" 或 "DPD")
+            detail_data (pd.DataFrame|str|bytes|file-like, optional): 单件明细表数据
+            output_stream (file-like, optional): 可写的二进制流，提供时结果写入该流
+            template (str|bytes|file-like, optional): 模板，默认使用设置中的模板文件
+
+        Returns:
+            bytes|file-like: 未提供output_stream时返回工作簿字节，否则返回output_stream；失败返回None
+        """
+        try:
+            self.logger.info(f"开始内存处理，处理类型: {template_type}")
+
+            template_source = template if template is not None else self.get_template_path(template_type)
+            if template_source is None:
+                self.logger.error(f"找不到{template_type}模板")
+                return None
+            if isinstance(template_source, (bytes, bytearray)):
+                template_source = BytesIO(template_source)
+
+            original_file_data = self.load_input_data(input_data)
+            original_detail_file_data = self.load_input_data(detail_data)
+            if original_file_data is None:
+                self.logger.error("主数据读取失败")
+                return None
+
+            target = output_stream if output_stream is not None else BytesIO()
+
+            if template_type == "UPS":
+                success = UPSDataProcessor(POLARS_ROW_THRESHOLD).process_ups_data(original_file_data, original_detail_file_data, template_source, target,
+                                                                                  **self.get_output_options())
+            elif template_type == "DPD":
+                success = DPDProcessor(POLARS_ROW_THRESHOLD).process_dpd_data(original_file_data, original_detail_file_data, template_source, target,
+                                                                              **self.get_output_options())
+            else:
+                self.logger.error(f"未知的模板类型: {template_type}")
+                return None
+
+            if not success:
+                return None
+
+            if output_stream is not None:
+                return output_stream
+            return target.getvalue()
+
+        except Exception as e:
+            self.logger.error(f"内存处理时出错: {str(e)}")
+            return None
+
+    def record_aggregates(self, ups_processor, original_file_data, input_file, data_date=None):
+        """
+        将本次处理的按国家、按邮编汇总结果保存到汇总累计库（未配置AGGREGATE_STORE_PATH时不保存）。
+        记录以主数据内容为标识，同一份数据重复处理时替换之前的记录
+
+        Args:
+            ups_processor (UPSDataProcessor): 本次处理使用的处理器（复用已缓存的汇总结果）
+            original_file_data (pd.DataFrame): 主数据
+            input_file (str): 主数据文件路径，作为记录来源
+            data_date (date|str, optional): 数据所属日期，默认见get_data_date
+
+        Returns:
+            bool: 是否保存成功
+        """
+        if not AGGREGATE_STORE_PATH or original_file_data is None or original_file_data.empty:
+            return False
+        try:
+            aggregates = ups_processor.compute_summary_aggregates(original_file_data)
+            store = AggregateStore(AGGREGATE_STORE_PATH)
+            try:
+                store.record(aggregates, content_key(original_file_data), self.get_data_date(input_file, data_date),
+                             str(input_file) if input_file is not None else None)
+            finally:
+                store.close()
+            return True
+        except Exception as e:
+            self.logger.error(f"保存汇总结果到累计库时出错: {str(e)}")
+            return False
+
+    def get_data_date(self, input_file, data_date=None):
+        """
+        数据所属日期：指定时使用指定日期，否则为主数据文件的修改日期（重新处理同一个文件时日期不变），
+        没有文件时为当天
+
+        Args:
+            input_file (str): 主数据文件路径
+            data_date (date|str, optional): 指定的日期
+
+        Returns:
+            date|str: 数据日期
+        """
+        if data_date is not None:
+            return data_date
+        if isinstance(input_file, (str, Path)) and Path(input_file).exists():
+            return date.fromtimestamp(Path(input_file).stat().st_mtime)
+        return date.today()
+
+    def process_rollup(self, period="week", reference_date=None, output_dir=None, start_date=None, end_date=None):
+        """
+        根据汇总累计库生成周、月汇总表（UPS模板的统计、德国邮编工作表）
+
+        Args:
+            period (str): 汇总周期，"week"或"month"，指定start_date、end_date时忽略
+            reference_date (date, optional): 周期内的任意一天，默认为当天
+            output_dir (str, optional): 输出目录，默认输出到桌面
+            start_date (date|str, optional): 自定义开始日期
+            end_date (date|str, optional): 自定义结束日期
+
+        Returns:
+            str: 输出文件路径，失败返回None
+        """
+        try:
+            if not AGGREGATE_STORE_PATH or not Path(AGGREGATE_STORE_PATH).exists():
+                self.logger.error("未配置汇总累计库或累计库不存在")
+                return None
+
+            if start_date is None or end_date is None:
+                start_date, end_date = period_range(period, reference_date)
+
+            store = AggregateStore(AGGREGATE_STORE_PATH)
+            try:
+                aggregates = store.rollup(start_date, end_date)
+            finally:
+                store.close()
+            if not aggregates["runs"]:
+                self.logger.warning(f"{start_date} ~ {end_date} 没有已保存的汇总结果")
+                return None
+
+            output_dir = Path(output_dir) if output_dir else DESKTOP_PATH
+            output_path = output_dir / f"UPS汇总-{start_date}_{end_date}.xlsx"
+            success = UPSDataProcessor(POLARS_ROW_THRESHOLD).process_ups_rollup(aggregates, self.get_template_path("UPS"), output_path, totals_mode=TOTALS_MODE)
+            return str(output_path) if success else None
+
+        except Exception as e:
+            self.logger.error(f"生成汇总表时出错: {str(e)}")
+            return None
+
+    def load_input_data(self, source, sheet_index=0):
+        """
+        将不同形式的输入统一读取为DataFrame
+
+        Args:
+            source (pd.DataFrame|str|Path|bytes|file-like): 输入数据
+            sheet_index (int|str): sheet索引或名称
+
+        Returns:
+            pd.DataFrame: 读取到的数据，失败返回None
+        """
+        if source is None:
+            return None
+        if isinstance(source, pd.DataFrame):
+            return source
+        if isinstance(source, (bytes, bytearray)):
+            source = BytesIO(source)
+        return self.get_original_file_data(source, sheet_index)
+
+    def get_original_file_data(self, input_file, sheet_index, progress: ProgressToken = None, stage: str = "读取数据", expected_passes: int = 1):
         """
         使用pandas获取指定sheet index的数据
 
         Args:
-            input_file (str): Excel文件路径
+            input_file (str|file-like): Excel文件路径或二进制文件对象
             sheet_index (int|str): sheet索引或名称
                 - int: sheet的索引位置 (0为第一个sheet)
                 - str: sheet的名称
+            progress (ProgressToken, optional): 进度令牌，读取时每check_interval行报告进度并检查取消（取消时抛出ProcessingCancelled）
+            stage: 进度中的阶段名称
+            expected_passes: 按该sheet的单元格数的倍数估算整个处理的剩余工作量
 
         Returns:
             pd.DataFrame: 指定sheet的数据，失败返回None
@@ -74,8 +433,8 @@ class ExcelProcessor:
         try:
             self.logger.info(f"开始读取Excel文件: {input_file}")
 
-            # 验证文件是否存在
-            if not Path(input_file).exists():
+            # 验证文件是否存在（文件对象无需检查）
+            if not hasattr(input_file, "read") and not Path(input_file).exists():
                 self.logger.error(f"文件不存在: {input_file}")
                 return None
 
@@ -109,8 +468,11 @@ class ExcelProcessor:
                 self.logger.error(f"不支持的sheet_index类型: {type(sheet_index)}")
                 return None
 
-            # 读取指定sheet的数据
-            df = pd.read_excel(input_file, sheet_name=target_sheet)
+            if progress is not None:
+                track_reader(excel_file, target_sheet, progress, stage, expected_passes)
+
+            # 读取指定sheet的数据（复用已打开的ExcelFile，文件对象无法重复读取）
+            df = excel_file.parse(sheet_name=target_sheet)
 
             # 数据清理：删除完全空白的行和列
             original_shape = df.shape
@@ -135,6 +497,9 @@ class ExcelProcessor:
 
             return df
 
+        except ProcessingCancelled:
+            raise
+
         except FileNotFoundError:
             self.logger.error(f"文件未找到: {input_file}")
             return None
@@ -165,11 +530,16 @@ class ExcelProcessor:
             except:
                 pass
 
-    def get_output_path(self, template_type):
+    def get_output_path(self, template_type, output_dir=None):
         """
         获取输出文件路径
+
+        Args:
+            template_type (str): 模板类型
+            output_dir (str, optional): 输出目录，默认输出到桌面
         """
-        return DESKTOP_PATH / f"{template_type}总结单-{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
+        output_dir = Path(output_dir) if output_dir else DESKTOP_PATH
+        return output_dir / f"{template_type}总结单-{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
 
     def get_template_path(self, template_type):
         """
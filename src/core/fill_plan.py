@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+工作表填充计划
+将"计算填充数据"与"写入工作簿"分离：各工作表的填充数据先在内存中算好（可并发计算），
+最后统一写入工作簿
+"""
+import logging
+from copy import copy
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+import pandas as pd
+from openpyxl.worksheet.worksheet import Worksheet
+
+from src.core.style_registry import StyleRegistry, TEXT_FORMAT
+from src.core.aggregation import FIXED_POINT_SCALES, column_total
+
+# 支持的并行模式
+PARALLEL_MODES = ("thread", "process")
+
+# 估算列基数时的最大采样数量
+CARDINALITY_SAMPLE_SIZE = 10000
+
+
+class SheetFillPlan:
+    """单个工作表的填充计划（按列存储）"""
+
+    def __init__(self, sheet_name: str, start_row: int = None):
+        self.logger = logging.getLogger(__name__)
+        self.sheet_name = sheet_name
+        self.start_row = start_row
+        # 列号 -> 从start_row开始的连续值列表
+        self.columns = {}
+        # (行号, 列号) -> 值，用于固定位置的单元格（如DPD总结单）
+        self.cells = {}
+        # 列号 -> 数字格式（整列设置）
+        self.number_formats = {}
+        # 列号 -> 字符串列的基数估计（不同值数量/采样数量），非字符串列不记录
+        self.cardinality = {}
+        # 列号 -> 列合计，用于更新合计行
+        self.totals = {}
+        # 列号 -> 列合计的定点比例（如重量为1000），累加合计时按定点整数相加
+        self.total_scales = {}
+        self.row_count = 0
+
+    def add_column(self, col_num: int, values, number_format: str = None):
+        """
+        添加一整列数据
+
+        Args:
+            col_num: 目标列号（从1开始）
+            values: 可迭代的值序列，从start_row开始依次填充
+            number_format: 整列的数字格式，如"@"（文本）
+        """
+        values = values.tolist() if isinstance(values, pd.Series) else list(values)
+        self.columns[col_num] = values
+        if number_format:
+            self.number_formats[col_num] = number_format
+        ratio = self.estimate_cardinality(values)
+        if ratio is not None:
+            self.cardinality[col_num] = ratio
+        self.row_count = max(self.row_count, len(values))
+
+    def estimate_cardinality(self, values: list, sample_size: int = CARDINALITY_SAMPLE_SIZE):
+        """
+        估算字符串列的基数比例（等间隔采样）
+
+        Args:
+            values: 列的值列表
+            sample_size: 最大采样数量
+
+        Returns:
+            float: 不同值数量/字符串值数量，字符串值不足一半时返回None
+        """
+        if not values:
+            return None
+        step = max(1, len(values) // sample_size)
+        sample = values[::step]
+        strings = [value for value in sample if isinstance(value, str)]
+        if len(strings) * 2 < len(sample):
+            return None
+        return len(set(strings)) / len(strings)
+
+    def get_low_cardinality_columns(self, max_ratio: float):
+        """返回基数比例不超过max_ratio的字符串列号"""
+        return [col_num for col_num, ratio in self.cardinality.items() if ratio <= max_ratio]
+
+    def add_mapped_columns(self, data: pd.DataFrame, field_mappings: dict, header_column_mapping: dict, text_fields: list = None, total_fields=None):
+        """
+        按"数据字段 -> 模板表头"映射关系添加列
+
+        Args:
+            data: 数据源
+            field_mappings: 数据字段到模板字段的映射
+            header_column_mapping: 模板表头到列号的映射
+            text_fields: 需要以文本格式填充的数据字段（整列转换为字符串并设置"@"格式）
+            total_fields: 需要计算列合计的数据字段
+        """
+        text_fields = text_fields or []
+        total_fields = total_fields or []
+        available_columns = data.columns.tolist()
+        for data_field, template_field in field_mappings.items():
+            if data_field not in available_columns:
+                self.logger.warning(f"  [{self.sheet_name}] 原始数据中未找到字段 '{data_field}'，跳过")
+                continue
+            if template_field not in header_column_mapping:
+                self.logger.warning(f"  [{self.sheet_name}] 模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
+                continue
+            col_num = header_column_mapping[template_field]
+            if data_field in text_fields:
+                self.add_column(col_num, data[data_field].astype(str), TEXT_FORMAT)
+            else:
+                self.add_column(col_num, data[data_field])
+            if data_field in total_fields:
+                self.set_total(col_num, column_total(data, data_field), FIXED_POINT_SCALES.get(data_field))
+            self.logger.debug(f"  [{self.sheet_name}] 填充列: {data_field} -> {template_field}(列{col_num})")
+
+    def iter_shards(self, max_rows: int):
+        """
+        按工作表最大行数将填充计划切分为多个分片（逐个生成，同一时间只额外复制一个分片的数据；本计划的完整数据仍在内存中）
+
+        每个分片的数据都从start_row开始（续表会复制start_row之前的表头行），
+        固定位置单元格只保留在第一个分片中
+
+        Args:
+            max_rows: 单个工作表允许的最大行号
+
+        Yields:
+            SheetFillPlan: 分片填充计划
+        """
+        if self.start_row is None or not self.columns:
+            yield self
+            return
+
+        capacity = max_rows - self.start_row + 1
+        if capacity <= 0:
+            raise ValueError(f"工作表 '{self.sheet_name}' 的数据起始行 {self.start_row} 超出最大行数 {max_rows}")
+
+        if self.row_count <= capacity:
+            yield self
+            return
+
+        for shard_index, offset in enumerate(range(0, self.row_count, capacity), start=1):
+            shard = SheetFillPlan(self.sheet_name if shard_index == 1 else f"{self.sheet_name} ({shard_index})", self.start_row)
+            for col_num, values in self.columns.items():
+                shard.add_column(col_num, values[offset:offset + capacity], self.number_formats.get(col_num))
+            if shard_index == 1:
+                shard.cells = dict(self.cells)
+            yield shard
+
+    def set_cell(self, row: int, col_num: int, value):
+        """设置固定位置单元格的值"""
+        self.cells[(row, col_num)] = value
+
+    def set_total(self, col_num: int, value, scale: int = None):
+        """
+        设置列合计
+
+        Args:
+            col_num: 列号
+            value: 列合计
+            scale: 定点比例（见aggregation.FIXED_POINT_SCALES），None表示按原值累加
+        """
+        self.totals[col_num] = value
+        if scale:
+            self.total_scales[col_num] = scale
+
+    def apply(self, worksheet: Worksheet, style_registry: StyleRegistry = None, progress=None):
+        """
+        将填充计划写入工作表
+
+        Args:
+            worksheet: 目标工作表
+            style_registry: 工作簿样式缓存，未提供时为本次写入新建
+            progress (ProgressToken, optional): 进度令牌，每列每写入check_interval行报告一次进度并检查取消
+        """
+        if self.number_formats:
+            style_registry = style_registry or StyleRegistry(worksheet.parent)
+        check_interval = progress.check_interval if progress is not None else 0
+
+        for col_num, values in self.columns.items():
+            number_format = self.number_formats.get(col_num)
+            column_style = None
+            if number_format:
+                style_registry.apply_column_format(worksheet, col_num, number_format)
+                # 没有原有样式的单元格（通常是插入的数据行）直接引用整列共用的样式ID，
+                # 带有模板样式（边框等）的单元格才按原有样式查找缓存
+                column_style = style_registry.get_style(number_format=number_format)
+
+            row = self.start_row
+            for value in values:
+                cell = worksheet.cell(row=row, column=col_num)
+                cell.value = value
+                if column_style is not None:
+                    if cell.has_style:
+                        cell._style = copy(style_registry.get_style(cell._style, number_format=number_format))
+                    else:
+                        cell._style = copy(column_style)
+                row += 1
+                if check_interval and (row - self.start_row) % check_interval == 0:
+                    progress.advance(check_interval)
+            if check_interval:
+                progress.advance((row - self.start_row) % check_interval)
+
+        for (row, col_num), value in self.cells.items():
+            worksheet.cell(row=row, column=col_num).value = value
+
+        self.logger.info(f"工作表 '{self.sheet_name}' 写入完成: {self.row_count} 行, {len(self.cells)} 个固定单元格")
+
+
+def build_fill_plans(builders: list, parallel: str = None, max_workers: int = None):
+    """
+    执行各工作表的填充计划构建函数
+
+    Args:
+        builders: [(构建函数, 参数元组), ...]，构建函数返回SheetFillPlan
+        parallel: 并行模式，None为顺序执行，"thread"为线程池，"process"为进程池
+        max_workers: 最大并发数，默认为构建函数数量
+
+    Returns:
+        list: 与builders顺序一致的SheetFillPlan列表
+    """
+    logger = logging.getLogger(__name__)
+
+    if not parallel or len(builders) <= 1:
+        return [builder(*args) for builder, args in builders]
+
+    if parallel not in PARALLEL_MODES:
+        raise ValueError(f"不支持的并行模式: {parallel}")
+
+    executor_class = ThreadPoolExecutor if parallel == "thread" else ProcessPoolExecutor
+    max_workers = max_workers or len(builders)
+    logger.info(f"并行计算 {len(builders)} 个工作表的填充数据，模式: {parallel}，并发数: {max_workers}")
+
+    with executor_class(max_workers=max_workers) as executor:
+        futures = [executor.submit(builder, *args) for builder, args in builders]
+        return [future.result() for future in futures]
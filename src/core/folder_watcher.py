@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+文件夹监听
+安装了watchdog时使用系统的文件事件通知（Linux为inotify），否则定时扫描文件夹。
+新文件在大小和修改时间连续stable_seconds秒不变（复制、上传完成）且不为空后才交给回调处理
+"""
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.core.job_runner import INPUT_EXTENSIONS
+
+try:
+    from watchdog.events import FileSystemEventHandler
+    from watchdog.observers import Observer
+except ImportError:
+    FileSystemEventHandler = object
+    Observer = None
+
+# 是否安装了watchdog
+WATCHDOG_AVAILABLE = Observer is not None
+
+
+class _EventHandler(FileSystemEventHandler):
+    """将watchdog的文件事件转交给FolderWatcher"""
+
+    def __init__(self, watcher):
+        super().__init__()
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.touch(event.dest_path)
+
+
+class FolderWatcher:
+    """监听文件夹中的新文件，文件写入完成后回调"""
+
+    def __init__(self, folder, on_ready, extensions=INPUT_EXTENSIONS, stable_seconds: float = 5.0,
+                 poll_interval: float = 1.0, use_events: bool = True, on_idle=None):
+        """
+        Args:
+            folder (str|Path): 监听的文件夹（不含子文件夹）
+            on_ready: 文件写入完成时的回调，参数为文件路径（Path），可以阻塞（如等待队列空位）
+            extensions: 需要的文件扩展名
+            stable_seconds: 文件大小和修改时间保持不变多少秒后视为写入完成
+            poll_interval: 检查文件状态（及扫描模式下扫描文件夹）的间隔（秒）
+            use_events: 安装了watchdog时是否使用文件事件通知，False时始终定时扫描
+            on_idle: 每轮检查结束后的回调（无参数）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.folder = Path(folder).resolve()
+        self.on_ready = on_ready
+        self.extensions = tuple(ext.lower() for ext in extensions)
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        self.use_events = use_events and WATCHDOG_AVAILABLE
+        self.on_idle = on_idle
+
+        self._lock = threading.Lock()
+        # 文件路径 -> ((大小, 修改时间), 最后一次变化的时间)，尚未检查过为None
+        self._candidates = {}
+        # 已交给回调、尚未移出文件夹的文件
+        self._emitted = set()
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._observer = None
+
+    @property
+    def mode(self):
+        """监听方式："events"或"polling" """
+        return "events" if self.use_events else "polling"
+
+    def start(self):
+        """在后台线程中开始监听"""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self._stop_event.clear()
+        self._scan()
+        if self.use_events:
+            self._observer = Observer()
+            self._observer.schedule(_EventHandler(self), str(self.folder), recursive=False)
+            self._observer.start()
+        self._thread = threading.Thread(target=self._run, name="folder-watcher", daemon=True)
+        self._thread.start()
+        self.logger.info(f"开始监听文件夹 {self.folder}（{'文件事件通知' if self.use_events else '定时扫描'}）")
+
+    def stop(self):
+        """停止监听"""
+        self._stop_event.set()
+        if self._observer is not None:
+            self._observer.stop()
+            self._observer.join()
+            self._observer = None
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def touch(self, path):
+        """记录新出现或有变化的文件（文件事件通知和扫描都调用）"""
+        path = Path(path)
+        if path.parent != self.folder or path.suffix.lower() not in self.extensions or path.name.startswith("~$"):
+            return
+        key = str(path)
+        with self._lock:
+            if key not in self._emitted:
+                self._candidates.setdefault(key, None)
+
+    def forget(self, path):
+        """文件已处理并移出文件夹后调用，之后同名的新文件会被重新处理"""
+        with self._lock:
+            self._emitted.discard(str(Path(path)))
+
+    def _scan(self):
+        """扫描文件夹中的所有文件"""
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        self.touch(entry.path)
+        except OSError as e:
+            self.logger.error(f"扫描文件夹时出错: {str(e)}")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            if not self.use_events:
+                self._scan()
+            self._check_candidates()
+            if self.on_idle is not None:
+                self.on_idle()
+            self._stop_event.wait(self.poll_interval)
+
+    def _check_candidates(self):
+        """检查各文件是否已写入完成"""
+        now = time.monotonic()
+        ready = []
+        with self._lock:
+            for key, state in list(self._candidates.items()):
+                try:
+                    stat = os.stat(key)
+                except FileNotFoundError:
+                    del self._candidates[key]
+                    continue
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if state is None or state[0] != signature:
+                    self._candidates[key] = (signature, now)
+                elif signature[0] > 0 and now - state[1] >= self.stable_seconds:
+                    del self._candidates[key]
+                    self._emitted.add(key)
+                    ready.append(Path(key))
+
+        for path in ready:
+            if self._stop_event.is_set():
+                break
+            self.logger.info(f"文件已写入完成: {path.name}")
+            self.on_ready(path)
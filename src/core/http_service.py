@@ -0,0 +1,221 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP任务服务（标准库ThreadingHTTPServer，默认只监听本机）
+    GET  /health               服务状态（队列深度、处理中的任务数、耗时统计）
+    POST /jobs                 提交任务，multipart/form-data：main（主数据文件，必填）、detail（单件明细表）、template（UPS或DPD，也可用查询参数?template=）
+    GET  /jobs                 所有任务的状态
+    GET  /jobs/<任务编号>        任务状态
+    GET  /jobs/<任务编号>/result 下载输出文件（任务成功后）
+"""
+import email.policy
+import json
+import logging
+import queue
+import shutil
+import signal
+import threading
+from email.parser import BytesParser
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+
+from src.core.job_runner import STATUS_SUCCESS
+
+# 输出文件的Content-Type
+XLSX_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+
+def parse_multipart(content_type: str, body: bytes):
+    """
+    使用email.parser解析multipart/form-data请求体
+
+    Args:
+        content_type: 请求的Content-Type（含boundary）
+        body: 请求体
+
+    Returns:
+        tuple: (字段 {名称: 文本}, 文件 {名称: (文件名, 内容)})
+
+    Raises:
+        ValueError: 不是multipart请求
+    """
+    header = f"Content-Type: {content_type}\r\nMIME-Version: 1.0\r\n\r\n".encode("latin-1")
+    message = BytesParser(policy=email.policy.HTTP).parsebytes(header + body)
+    if not message.is_multipart():
+        raise ValueError("请求必须是multipart/form-data")
+
+    fields, files = {}, {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if not name:
+            continue
+        payload = part.get_payload(decode=True) or b""
+        file_name = part.get_filename()
+        if file_name is not None:
+            files[name] = (_decode_header_text(file_name), payload)
+        else:
+            fields[name] = payload.decode(part.get_content_charset() or "utf-8", errors="replace")
+    return fields, files
+
+
+def _decode_header_text(text: str):
+    """浏览器和多数客户端直接以UTF-8发送中文文件名，email.parser按ASCII解码为代理字符，这里还原"""
+    try:
+        return text.encode("ascii", "surrogateescape").decode("utf-8")
+    except UnicodeError:
+        return text
+
+
+class JobRequestHandler(BaseHTTPRequestHandler):
+    """任务服务的请求处理（server为JobHTTPServer）"""
+
+    server_version = "ExcelJobService/1.0"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path.rstrip("/")
+        parts = [part for part in path.split("/") if part]
+        if parts == ["health"]:
+            self._send_json(HTTPStatus.OK, dict(self.server.service.status(), status="ok"))
+        elif parts == ["jobs"]:
+            self._send_json(HTTPStatus.OK, {"jobs": [self._job_dict(job) for job in self.server.service.list_jobs()]})
+        elif len(parts) == 2 and parts[0] == "jobs":
+            job = self.server.service.get(parts[1])
+            if job is None:
+                self._send_error(HTTPStatus.NOT_FOUND, "任务不存在")
+            else:
+                self._send_json(HTTPStatus.OK, self._job_dict(job))
+        elif len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result":
+            self._send_result(parts[1])
+        else:
+            self._send_error(HTTPStatus.NOT_FOUND, "路径不存在")
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        if url.path.rstrip("/") != "/jobs":
+            self._send_error(HTTPStatus.NOT_FOUND, "路径不存在")
+            return
+
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            length = -1
+        if length <= 0:
+            self._send_error(HTTPStatus.LENGTH_REQUIRED, "缺少请求体")
+            return
+        if length > self.server.max_upload_bytes:
+            self._send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"上传文件超过 {self.server.max_upload_bytes // (1024 * 1024)} MB")
+            self.close_connection = True
+            return
+
+        try:
+            fields, files = parse_multipart(self.headers.get("Content-Type", ""), self.rfile.read(length))
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+
+        template_type = (fields.get("template") or parse_qs(url.query).get("template", ["UPS"])[0]).strip().upper()
+        if template_type not in self.server.template_types:
+            self._send_error(HTTPStatus.BAD_REQUEST, f"不支持的模板类型: {template_type}，可选 {list(self.server.template_types)}")
+            return
+        if "main" not in files:
+            self._send_error(HTTPStatus.BAD_REQUEST, "缺少主数据文件（字段main）")
+            return
+
+        detail_name, detail_data = files.get("detail", (None, None))
+        try:
+            job = self.server.service.submit(template_type, *files["main"], detail_name, detail_data)
+        except ValueError as e:
+            self._send_error(HTTPStatus.BAD_REQUEST, str(e))
+            return
+        except queue.Full:
+            self._send_error(HTTPStatus.SERVICE_UNAVAILABLE, "任务队列已满，请稍后重试", {"Retry-After": "10"})
+            return
+        self._send_json(HTTPStatus.ACCEPTED, self._job_dict(job), {"Location": f"/jobs/{job.job_id}"})
+
+    def _send_result(self, job_id: str):
+        job = self.server.service.get(job_id)
+        if job is None:
+            self._send_error(HTTPStatus.NOT_FOUND, "任务不存在")
+            return
+        if not job.finished:
+            self._send_error(HTTPStatus.CONFLICT, f"任务尚未完成（{job.status}）")
+            return
+        if job.status != STATUS_SUCCESS or not job.output_path.exists():
+            self._send_error(HTTPStatus.GONE, f"任务没有输出文件（{job.status}）")
+            return
+
+        with open(job.output_path, "rb") as f:
+            self.send_response(HTTPStatus.OK)
+            self.send_header("Content-Type", XLSX_CONTENT_TYPE)
+            self.send_header("Content-Length", str(job.output_path.stat().st_size))
+            self.send_header("Content-Disposition", f"attachment; filename*=UTF-8''{quote(job.output_path.name)}")
+            self.end_headers()
+            shutil.copyfileobj(f, self.wfile)
+
+    def _job_dict(self, job):
+        data = job.to_dict()
+        data["url"] = f"/jobs/{job.job_id}"
+        data["result_url"] = f"/jobs/{job.job_id}/result" if job.status == STATUS_SUCCESS else None
+        return data
+
+    def _send_json(self, status: HTTPStatus, data: dict, headers: dict = None):
+        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_error(self, status: HTTPStatus, message: str, headers: dict = None):
+        self._send_json(status, {"error": message}, headers)
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).info(f"{self.address_string()} {format % args}")
+
+
+class JobHTTPServer(ThreadingHTTPServer):
+    """每个请求一个线程，任务交给JobService的工作进程处理"""
+
+    daemon_threads = True
+
+    def __init__(self, address, service, template_types, max_upload_bytes: int = 100 * 1024 * 1024):
+        """
+        Args:
+            address: (监听地址, 端口)
+            service (JobService): 任务服务
+            template_types: 可选的模板类型
+            max_upload_bytes: 单个请求的最大字节数
+        """
+        super().__init__(address, JobRequestHandler)
+        self.service = service
+        self.template_types = tuple(template_types)
+        self.max_upload_bytes = max_upload_bytes
+
+
+def serve_forever(server: JobHTTPServer):
+    """
+    启动任务服务和HTTP服务，持续运行直到按下Ctrl+C或收到SIGTERM，停止时等待处理中的任务完成
+
+    Args:
+        server: HTTP服务
+    """
+    logger = logging.getLogger(__name__)
+    stop_event = threading.Event()
+    server.service.start()
+    thread = threading.Thread(target=server.serve_forever, name="http-server", daemon=True)
+    thread.start()
+    host, port = server.server_address[:2]
+    logger.info(f"HTTP任务服务已启动: http://{host}:{port}")
+    if threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        while not stop_event.wait(1.0):
+            pass
+    except KeyboardInterrupt:
+        logger.info("收到停止信号")
+    finally:
+        server.shutdown()
+        server.server_close()
+        server.service.stop()
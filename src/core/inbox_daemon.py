@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+收件箱处理服务
+监听收件箱文件夹，主数据文件（及按命名规则匹配的单件明细表）写入完成后生成任务放入有界队列，
+由固定数量的工作进程处理并输出到发件箱。队列满时监听暂停，直到有空位（反压）。
+处理完成的文件移到收件箱的processed、failed子文件夹，一直没有对应主数据文件的明细表超时后移到failed子文件夹。
+每个工作进程常驻，处理过一次后模板缓存保持预热。
+队列深度和各任务的排队、处理耗时可随时查询，并在每个任务完成后写入发件箱中的状态文件
+"""
+import json
+import logging
+import os
+import queue
+import shutil
+import signal
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from src.core.folder_watcher import FolderWatcher
+from src.core.job_runner import (BatchJob, JobResult, STATUS_SUCCESS, STATUS_FAILED, STATUS_TIMEOUT, WorkerProcess, find_detail_file,
+                                 is_detail_file)
+
+# 处理完成的文件移入的收件箱子文件夹
+ARCHIVE_PROCESSED = "processed"
+ARCHIVE_FAILED = "failed"
+
+# 发件箱中的状态文件
+STATUS_FILE_NAME = "_inbox_status.json"
+
+
+class DaemonMetrics:
+    """队列深度和任务耗时统计（线程安全）"""
+
+    def __init__(self, queue_capacity: int, window: int = 200):
+        """
+        Args:
+            queue_capacity: 队列容量
+            window: 耗时统计保留最近多少个任务
+        """
+        self._lock = threading.Lock()
+        self.queue_capacity = queue_capacity
+        self.started_at = datetime.now().isoformat(timespec="seconds")
+        self.max_queue_depth = 0
+        self.queued = 0
+        self.in_flight = 0
+        self.counts = {STATUS_SUCCESS: 0, STATUS_FAILED: 0, STATUS_TIMEOUT: 0}
+        self.last_job = None
+        # 最近任务的排队耗时、处理耗时、总耗时（秒）
+        self._wait = deque(maxlen=window)
+        self._processing = deque(maxlen=window)
+        self._total = deque(maxlen=window)
+
+    def job_queued(self, queue_depth: int):
+        with self._lock:
+            self.queued += 1
+            self.max_queue_depth = max(self.max_queue_depth, queue_depth)
+
+    def job_started(self):
+        with self._lock:
+            self.in_flight += 1
+
+    def job_finished(self, result: JobResult, wait: float, processing: float):
+        with self._lock:
+            self.in_flight -= 1
+            self.counts[result.status] = self.counts.get(result.status, 0) + 1
+            self._wait.append(wait)
+            self._processing.append(processing)
+            self._total.append(wait + processing)
+            self.last_job = {
+                "file": result.job.name,
+                "status": result.status,
+                "rows": result.rows,
+                "wait": round(wait, 3),
+                "processing": round(processing, 3),
+                "output": result.output_path,
+                "error": result.error,
+                "finished_at": datetime.now().isoformat(timespec="seconds"),
+            }
+
+    def snapshot(self, queue_depth: int):
+        """
+        当前统计
+
+        Args:
+            queue_depth: 当前队列深度
+
+        Returns:
+            dict: 队列深度、容量、历史最大深度、处理中的任务数、各状态任务数，
+                以及最近任务排队、处理、总耗时的平均值、中位数、P95、最大值
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "queue_depth": queue_depth,
+                "queue_capacity": self.queue_capacity,
+                "max_queue_depth": self.max_queue_depth,
+                "in_flight": self.in_flight,
+                "queued": self.queued,
+                "completed": dict(self.counts),
+                "latency": {
+                    "wait": self._latency(self._wait),
+                    "processing": self._latency(self._processing),
+                    "total": self._latency(self._total),
+                },
+                "last_job": self.last_job,
+            }
+
+    def _latency(self, values):
+        if not values:
+            return {"count": 0}
+        ordered = sorted(values)
+        return {
+            "count": len(ordered),
+            "avg": round(sum(ordered) / len(ordered), 3),
+            "p50": round(ordered[len(ordered) // 2], 3),
+            "p95": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+            "max": round(ordered[-1], 3),
+        }
+
+
+class InboxDaemon:
+    """收件箱处理服务"""
+
+    def __init__(self, inbox, outbox, template_type: str = "UPS", workers: int = 2, queue_size: int = 20,
+                 job_timeout: float = None, stable_seconds: float = 5.0, poll_interval: float = 1.0,
+                 detail_suffixes=("_明细",), detail_wait: float = 30.0, orphan_detail_wait: float = 600.0, use_events: bool = True,
+                 log_level: int = logging.INFO, log_format: str = "%(asctime)s - %(levelname)s - %(message)s",
+                 start_method: str = "forkserver"):
+        """
+        Args:
+            inbox (str|Path): 收件箱文件夹
+            outbox (str|Path): 发件箱文件夹（输出文件和状态文件）
+            template_type: 模板类型 ("UPS" 或 "DPD")
+            workers: 工作进程数
+            queue_size: 等待处理的任务队列容量
+            job_timeout: 单个任务的超时时间（秒），None表示不限制
+            stable_seconds: 文件大小保持不变多少秒后视为写入完成
+            poll_interval: 检查文件状态的间隔（秒）
+            detail_suffixes: 单件明细表文件名后缀
+            detail_wait: 主数据文件写入完成后等待对应明细表出现的时间（秒），超时后不带明细表处理
+            orphan_detail_wait: 明细表写入完成后等待对应主数据文件的时间（秒），超时后移到failed子文件夹
+            use_events: 安装了watchdog时是否使用文件事件通知
+            log_level: 工作进程的日志级别
+            log_format: 工作进程的日志格式
+            start_method: 工作进程的启动方式（见job_runner.get_worker_context）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.inbox = Path(inbox).resolve()
+        self.outbox = Path(outbox)
+        self.template_type = template_type
+        self.workers = max(1, workers or 1)
+        self.job_timeout = job_timeout or None
+        self.detail_suffixes = tuple(detail_suffixes)
+        self.detail_wait = detail_wait
+        self.orphan_detail_wait = orphan_detail_wait
+        self.poll_interval = poll_interval
+        self.log_level = log_level
+        self.log_format = log_format
+        self.start_method = start_method
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = DaemonMetrics(queue_size)
+        self.watcher = FolderWatcher(self.inbox, self._on_file_ready, stable_seconds=stable_seconds,
+                                     poll_interval=poll_interval, use_events=use_events, on_idle=self._release_mains)
+
+        self._pair_lock = threading.Lock()
+        # 等待明细表的主数据文件 -> 写入完成的时间
+        self._waiting_mains = {}
+        # 已写入完成的明细表 -> 写入完成的时间
+        self._ready_details = {}
+        self._status_lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """启动工作进程和文件夹监听"""
+        self.outbox.mkdir(parents=True, exist_ok=True)
+        self._stop_event.clear()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"inbox-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.watcher.start()
+        self.logger.info(f"收件箱处理服务已启动: {self.inbox} -> {self.outbox}，{self.workers} 个工作进程，队列容量 {self.queue.maxsize}")
+
+    def stop(self):
+        """停止监听，丢弃尚未开始的任务（文件留在收件箱，下次启动时重新处理），等待处理中的任务完成"""
+        self._stop_event.set()
+        self.watcher.stop()
+        discarded = 0
+        while True:
+            try:
+                self.queue.get_nowait()
+                discarded += 1
+            except queue.Empty:
+                break
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.write_status()
+        self.logger.info(f"收件箱处理服务已停止，{discarded} 个未开始的任务留待下次处理")
+
+    def serve_forever(self, status_interval: float = 60.0):
+        """
+        启动并持续运行，直到按下Ctrl+C或收到SIGTERM
+
+        Args:
+            status_interval: 在日志中输出队列深度和耗时统计的间隔（秒）
+        """
+        self.start()
+        if threading.current_thread() is threading.main_thread():
+            signal.signal(signal.SIGTERM, lambda signum, frame: self._stop_event.set())
+        try:
+            while not self._stop_event.wait(status_interval):
+                status = self.status()
+                total = status["latency"]["total"]
+                self.logger.info(f"队列深度 {status['queue_depth']}/{status['queue_capacity']}，处理中 {status['in_flight']}，"
+                                 f"已完成 {status['completed']}，平均耗时 {total.get('avg', 0)} 秒，P95 {total.get('p95', 0)} 秒")
+        except KeyboardInterrupt:
+            self.logger.info("收到停止信号")
+        finally:
+            self.stop()
+
+    def status(self):
+        """
+        当前状态
+
+        Returns:
+            dict: DaemonMetrics.snapshot的结果，另含监听方式
+        """
+        status = self.metrics.snapshot(self.queue.qsize())
+        status["watch_mode"] = self.watcher.mode
+        return status
+
+    def write_status(self):
+        """将当前状态写入发件箱中的状态文件"""
+        path = self.outbox / STATUS_FILE_NAME
+        with self._status_lock:
+            try:
+                temp_path = path.with_suffix(".tmp")
+                with open(temp_path, "w", encoding="utf-8") as f:
+                    json.dump(self.status(), f, ensure_ascii=False, indent=2)
+                os.replace(temp_path, path)
+            except OSError as e:
+                self.logger.error(f"写入状态文件时出错: {str(e)}")
+
+    def _on_file_ready(self, path: Path):
+        # 与批量处理相同，同目录下存在对应的主数据文件时才是明细表（运单明细.xlsx这样的主数据文件名也以"明细"结尾）；
+        # 主数据文件稍后才出现的明细表先按主数据文件等待，对应的主数据文件出现后再改为明细表
+        with self._pair_lock:
+            if is_detail_file(path, self.detail_suffixes):
+                self._ready_details[str(path)] = time.monotonic()
+            else:
+                self._waiting_mains[str(path)] = time.monotonic()
+        self._release_mains()
+
+    def _release_mains(self):
+        """主数据文件的明细表也写入完成（或等待明细表超时）后生成任务，一直没有主数据文件的明细表移到failed子文件夹"""
+        now = time.monotonic()
+        ready, orphans = [], []
+        with self._pair_lock:
+            for path, since in list(self._waiting_mains.items()):
+                if is_detail_file(path, self.detail_suffixes):
+                    del self._waiting_mains[path]
+                    self._ready_details[path] = since
+
+            for main_file, since in list(self._waiting_mains.items()):
+                detail_file = find_detail_file(main_file, self.detail_suffixes)
+                if detail_file is not None:
+                    if str(detail_file) not in self._ready_details:
+                        continue
+                    del self._ready_details[str(detail_file)]
+                elif now - since < self.detail_wait:
+                    continue
+                else:
+                    self.logger.warning(f"{Path(main_file).name} 等待 {self.detail_wait} 秒后仍没有单件明细表，不带明细表处理")
+                del self._waiting_mains[main_file]
+                ready.append((Path(main_file), detail_file))
+
+            for detail_file, since in list(self._ready_details.items()):
+                if now - since >= self.orphan_detail_wait:
+                    del self._ready_details[detail_file]
+                    orphans.append(Path(detail_file))
+
+        for main_file, detail_file in ready:
+            output_path = self.outbox / f"{self.template_type}总结单-{main_file.stem}.xlsx"
+            self._enqueue(BatchJob(main_file, self.template_type, detail_file, output_path))
+        if orphans:
+            self.logger.warning(f"{len(orphans)} 个明细表等待 {self.orphan_detail_wait} 秒后仍没有对应的主数据文件，移到{ARCHIVE_FAILED}子文件夹: "
+                                f"{[path.name for path in orphans]}")
+            self._archive_files(orphans, False)
+
+    def _enqueue(self, job: BatchJob):
+        """放入队列，队列满时等待空位（此时监听暂停）"""
+        if self.queue.full():
+            self.logger.warning(f"队列已满（{self.queue.maxsize}），{job.name} 等待空位")
+        while not self._stop_event.is_set():
+            try:
+                self.queue.put((job, time.monotonic()), timeout=self.poll_interval)
+            except queue.Full:
+                continue
+            self.metrics.job_queued(self.queue.qsize())
+            self.logger.info(f"{job.name} 已加入队列，队列深度 {self.queue.qsize()}")
+            return
+
+    def _worker_loop(self):
+        # 每个工作线程独占一个常驻的工作进程（模板缓存保持预热），超时时只终止这一个进程
+        worker = WorkerProcess(self.log_level, self.log_format, (self.template_type,), self.start_method)
+        try:
+            while True:
+                item = self.queue.get()
+                if item is None:
+                    break
+                job, queued_at = item
+                started = time.monotonic()
+                self.metrics.job_started()
+                result = worker.run(job, self.job_timeout)
+
+                processing = time.monotonic() - started
+                self._archive(job, result.success)
+                self.metrics.job_finished(result, started - queued_at, processing)
+                self.logger.info(f"{job.name}: {result.status}，排队 {started - queued_at:.1f} 秒，处理 {processing:.1f} 秒，"
+                                 f"队列深度 {self.queue.qsize()}")
+                self.write_status()
+        finally:
+            worker.close()
+
+    def _archive(self, job: BatchJob, success: bool):
+        """将处理完成的主数据文件和明细表移到processed或failed子文件夹"""
+        self._archive_files([job.input_file, job.detail_file], success)
+
+    def _archive_files(self, sources, success: bool):
+        """将文件移到processed或failed子文件夹（同名文件已存在时加上时间戳）"""
+        archive_dir = self.inbox / (ARCHIVE_PROCESSED if success else ARCHIVE_FAILED)
+        archive_dir.mkdir(exist_ok=True)
+        for source in sources:
+            if not source:
+                continue
+            source = Path(source)
+            target = archive_dir / source.name
+            if target.exists():
+                target = archive_dir / f"{source.stem}-{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}{source.suffix}"
+            try:
+                shutil.move(str(source), str(target))
+            except OSError as e:
+                self.logger.error(f"移动文件 {source.name} 时出错: {str(e)}")
+            self.watcher.forget(source)
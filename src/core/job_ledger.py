@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""
+批量任务账本
+批量处理的每个任务（主数据文件、明细表、模板类型、输出路径、文件内容哈希、状态）记录在本地SQLite数据库中。
+中途崩溃或重启后再次执行同一批量命令时，内容未变且输出文件仍在的已完成任务直接跳过，只重新执行未完成和失败的任务。
+任务通过带有效期的租约领取：领取、续约、完成都在数据库事务中按领取者校验，多个批量进程可以共用同一个账本并行处理，
+进程崩溃后它持有的租约过期，任务由其他进程（或下一次执行）重新领取
+"""
+import hashlib
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+
+from src.core.job_runner import STATUS_FAILED, STATUS_SUCCESS, BatchJob
+
+# 任务状态（完成后为job_runner中的STATUS_SUCCESS、STATUS_FAILED、STATUS_TIMEOUT）
+STATE_PENDING = "pending"
+STATE_RUNNING = "running"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id INTEGER PRIMARY KEY AUTOINCREMENT,
+    input_file TEXT NOT NULL,
+    template_type TEXT NOT NULL,
+    detail_file TEXT,
+    output_path TEXT,
+    input_hash TEXT NOT NULL,
+    detail_hash TEXT,
+    state TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    lease_owner TEXT,
+    lease_expires REAL,
+    rows INTEGER NOT NULL DEFAULT 0,
+    elapsed REAL,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (input_file, template_type)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state, lease_expires);
+"""
+
+
+def file_hash(path, chunk_size: int = 1024 * 1024):
+    """
+    计算文件内容的SHA-256
+
+    Args:
+        path (str|Path): 文件路径
+
+    Returns:
+        str: 十六进制哈希值，path为空时返回None
+    """
+    if not path:
+        return None
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def default_owner():
+    """租约领取者名称：主机名:进程号"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class JobLedger:
+    """批量任务账本（线程安全，多个进程可共用同一个数据库文件）"""
+
+    def __init__(self, db_path, lease_seconds: float = 60, max_attempts: int = 3):
+        """
+        Args:
+            db_path (str|Path): SQLite数据库文件路径（不存在时自动创建）
+            lease_seconds: 租约有效期（秒），执行中的任务需在过期前续约
+            max_attempts: 租约过期（执行进程崩溃）的任务最多领取几次，超过后记为失败
+        """
+        self.logger = logging.getLogger(__name__)
+        self.db_path = str(db_path)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max(1, max_attempts)
+        self._lock = threading.Lock()
+        if self.db_path != ":memory:":
+            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+        # 自行管理事务：领取任务使用BEGIN IMMEDIATE，在读取前就取得写锁，多个进程不会领取到同一个任务
+        self._connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._connection.execute("PRAGMA journal_mode = WAL")
+        self._connection.executescript(SCHEMA)
+
+    def close(self):
+        """关闭数据库连接"""
+        self._connection.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._connection
+            except BaseException:
+                self._connection.execute("ROLLBACK")
+                raise
+            self._connection.execute("COMMIT")
+
+    def register(self, jobs: list):
+        """
+        登记任务：新任务和内容有变化的任务记为待处理，失败、超时或未完成的任务重新记为待处理，
+        内容未变且输出文件仍在的已完成任务保持完成（不再执行），其他进程正在执行（租约未过期）的任务保持不变
+
+        Args:
+            jobs: BatchJob列表
+
+        Returns:
+            tuple: (与jobs顺序一致的任务编号列表, 已完成而跳过的BatchJob列表)
+        """
+        hashes = [(file_hash(job.input_file), file_hash(job.detail_file)) for job in jobs]
+        job_ids, completed = [], []
+        now = time.time()
+        timestamp = self._timestamp()
+        with self._transaction() as connection:
+            for job, (input_hash, detail_hash) in zip(jobs, hashes):
+                row = connection.execute(
+                    "SELECT job_id, detail_file, output_path, input_hash, detail_hash, state, lease_expires FROM jobs "
+                    "WHERE input_file = ? AND template_type = ?",
+                    (job.input_file, job.template_type),
+                ).fetchone()
+                if row is None:
+                    cursor = connection.execute(
+                        "INSERT INTO jobs (input_file, template_type, detail_file, output_path, input_hash, detail_hash, state, "
+                        "created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (job.input_file, job.template_type, job.detail_file, job.output_path, input_hash, detail_hash,
+                         STATE_PENDING, timestamp, timestamp),
+                    )
+                    job_ids.append(cursor.lastrowid)
+                    continue
+
+                job_id, detail_file, output_path, old_input_hash, old_detail_hash, state, lease_expires = row
+                job_ids.append(job_id)
+                unchanged = (detail_file, old_input_hash, old_detail_hash) == (job.detail_file, input_hash, detail_hash)
+                if state == STATE_RUNNING and lease_expires is not None and lease_expires > now:
+                    continue
+                if (state == STATUS_SUCCESS and unchanged and output_path == job.output_path
+                        and output_path and Path(output_path).exists()):
+                    completed.append(job)
+                    continue
+                if not unchanged:
+                    self.logger.info(f"{job.name} 内容有变化，重新处理")
+                connection.execute(
+                    "UPDATE jobs SET detail_file = ?, output_path = ?, input_hash = ?, detail_hash = ?, state = ?, "
+                    "attempts = CASE WHEN ? THEN attempts ELSE 0 END, lease_owner = NULL, lease_expires = NULL, "
+                    "error = NULL, updated_at = ? WHERE job_id = ?",
+                    (job.detail_file, job.output_path, input_hash, detail_hash, STATE_PENDING, unchanged, timestamp, job_id),
+                )
+        return job_ids, completed
+
+    def claim(self, owner: str, job_ids: list):
+        """
+        领取一个待处理或租约已过期的任务
+
+        Args:
+            owner: 领取者（见default_owner）
+            job_ids: 可领取的任务编号（register的返回值）
+
+        Returns:
+            tuple: (任务编号, BatchJob)，没有可领取的任务时返回None
+        """
+        if not job_ids:
+            return None
+        now = time.time()
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._transaction() as connection:
+            # 多次领取后仍未完成（执行进程反复崩溃）的任务不再领取
+            connection.execute(
+                f"UPDATE jobs SET state = ?, error = ?, lease_owner = NULL, lease_expires = NULL, updated_at = ? "
+                f"WHERE job_id IN ({placeholders}) AND state = ? AND lease_expires < ? AND attempts >= ?",
+                (STATUS_FAILED, f"执行 {self.max_attempts} 次均未完成", self._timestamp(), *job_ids, STATE_RUNNING, now,
+                 self.max_attempts),
+            )
+            row = connection.execute(
+                f"SELECT job_id, input_file, template_type, detail_file, output_path, state FROM jobs "
+                f"WHERE job_id IN ({placeholders}) AND (state = ? OR (state = ? AND lease_expires < ?)) "
+                f"ORDER BY job_id LIMIT 1",
+                (*job_ids, STATE_PENDING, STATE_RUNNING, now),
+            ).fetchone()
+            if row is None:
+                return None
+            job_id, input_file, template_type, detail_file, output_path, state = row
+            connection.execute(
+                "UPDATE jobs SET state = ?, lease_owner = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE job_id = ?",
+                (STATE_RUNNING, owner, now + self.lease_seconds, self._timestamp(), job_id),
+            )
+        job = BatchJob(input_file, template_type, detail_file, output_path)
+        if state == STATE_RUNNING:
+            self.logger.warning(f"{job.name} 的租约已过期，重新领取")
+        return job_id, job
+
+    def renew(self, job_ids: list, owner: str):
+        """
+        为执行中的任务续约
+
+        Args:
+            job_ids: 任务编号列表
+            owner: 领取者
+
+        Returns:
+            int: 续约成功的任务数（租约已被其他进程领取的任务不计）
+        """
+        if not job_ids:
+            return 0
+        placeholders = ", ".join("?" * len(job_ids))
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET lease_expires = ? WHERE job_id IN ({placeholders}) AND state = ? AND lease_owner = ?",
+                (time.time() + self.lease_seconds, *job_ids, STATE_RUNNING, owner),
+            )
+        return cursor.rowcount
+
+    def complete(self, job_id: int, owner: str, result):
+        """
+        记录任务的执行结果并释放租约
+
+        Args:
+            job_id: 任务编号
+            owner: 领取者
+            result (JobResult): 执行结果
+
+        Returns:
+            bool: 是否记录成功，租约已失效（被其他进程重新领取）时返回False
+        """
+        with self._transaction() as connection:
+            cursor = connection.execute(
+                "UPDATE jobs SET state = ?, output_path = COALESCE(?, output_path), rows = ?, elapsed = ?, error = ?, "
+                "lease_owner = NULL, lease_expires = NULL, updated_at = ? WHERE job_id = ? AND state = ? AND lease_owner = ?",
+                (result.status, result.output_path, result.rows, result.elapsed, result.error, self._timestamp(),
+                 job_id, STATE_RUNNING, owner),
+            )
+        if cursor.rowcount == 0:
+            self.logger.warning(f"{result.job.name} 的租约已失效，执行结果未记录")
+            return False
+        return True
+
+    def release(self, job_id: int, owner: str):
+        """
+        放弃领取的任务（任务未执行完就被终止，不计入领取次数），任务恢复为待处理
+
+        Args:
+            job_id: 任务编号
+            owner: 领取者
+        """
+        with self._transaction() as connection:
+            connection.execute(
+                "UPDATE jobs SET state = ?, attempts = MAX(attempts - 1, 0), lease_owner = NULL, lease_expires = NULL, "
+                "updated_at = ? WHERE job_id = ? AND state = ? AND lease_owner = ?",
+                (STATE_PENDING, self._timestamp(), job_id, STATE_RUNNING, owner),
+            )
+
+    def counts(self, job_ids: list = None):
+        """
+        Args:
+            job_ids: 任务编号列表，默认为所有任务
+
+        Returns:
+            dict: 状态 -> 任务数
+        """
+        query, params = "SELECT state, COUNT(*) FROM jobs", ()
+        if job_ids is not None:
+            if not job_ids:
+                return {}
+            query += f" WHERE job_id IN ({', '.join('?' * len(job_ids))})"
+            params = tuple(job_ids)
+        with self._lock:
+            rows = self._connection.execute(query + " GROUP BY state", params).fetchall()
+        return dict(rows)
+
+    @staticmethod
+    def _timestamp():
+        return datetime.now().isoformat(timespec="seconds")
@@ -0,0 +1,747 @@
+# -*- coding: utf-8 -*-
+"""
+批量处理任务
+将输入的文件、通配符、目录展开为主数据文件，按命名规则匹配单件明细表，
+并在进程池中并行执行ExcelProcessor.process_file。
+每个任务有独立的超时时间：超时后终止进程池（进程无法单独中断），
+同时被终止的其他任务在新的进程池中重新执行
+"""
+import glob
+import itertools
+import logging
+import logging.handlers
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import queue
+import signal
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+from src.core.excel_processor import ExcelProcessor
+from src.core.progress import DEFAULT_CHECK_INTERVAL, ProgressToken
+from src.core.template_cache import get_template_cache
+
+# 支持的输入文件扩展名
+INPUT_EXTENSIONS = (".xlsx", ".xls")
+
+# forkserver服务进程预先导入的模块（导入处理模块并载入模板，见worker_preload）
+FORKSERVER_PRELOAD = ["src.core.worker_preload"]
+
+# 项目根目录（forkserver服务进程据此导入预加载模块）
+PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
+
+# 任务状态
+STATUS_SUCCESS = "success"
+STATUS_FAILED = "failed"
+STATUS_TIMEOUT = "timeout"
+
+
+class BatchJob:
+    """单个处理任务"""
+
+    def __init__(self, input_file, template_type: str, detail_file=None, output_path=None):
+        """
+        Args:
+            input_file (str|Path): 主数据文件路径
+            template_type: 模板类型 ("UPS" 或 "DPD")
+            detail_file (str|Path, optional): 单件明细表文件路径
+            output_path (str|Path, optional): 输出文件路径，默认由ExcelProcessor按时间生成
+        """
+        self.input_file = str(input_file)
+        self.template_type = template_type
+        self.detail_file = str(detail_file) if detail_file else None
+        self.output_path = str(output_path) if output_path else None
+
+    @property
+    def name(self):
+        """主数据文件名"""
+        return Path(self.input_file).name
+
+
+class JobResult:
+    """单个任务的执行结果"""
+
+    def __init__(self, job: BatchJob, status: str, output_path: str = None, rows: int = 0, elapsed: float = 0.0, error: str = None):
+        """
+        Args:
+            job: 任务
+            status: STATUS_SUCCESS、STATUS_FAILED 或 STATUS_TIMEOUT
+            output_path: 输出文件路径
+            rows: 主数据行数
+            elapsed: 执行耗时（秒）
+            error: 失败原因
+        """
+        self.job = job
+        self.status = status
+        self.output_path = output_path
+        self.rows = rows
+        self.elapsed = elapsed
+        self.error = error
+
+    @property
+    def success(self):
+        return self.status == STATUS_SUCCESS
+
+
+def expand_inputs(inputs, extensions=INPUT_EXTENSIONS):
+    """
+    将文件、通配符、目录展开为文件列表
+
+    Args:
+        inputs: 文件路径、通配符（如 data/*.xlsx、data/**/*.xlsx）或目录（取目录下的Excel文件，不递归）
+        extensions: 目录中需要的文件扩展名
+
+    Returns:
+        list: 去重并排序后的文件路径（Path），不含Excel的临时锁文件（~$开头）
+    """
+    logger = logging.getLogger(__name__)
+    files = set()
+    for item in inputs:
+        path = Path(item)
+        if path.is_dir():
+            matches = [p for p in path.iterdir() if p.suffix.lower() in extensions]
+        elif glob.has_magic(str(item)):
+            matches = [Path(p) for p in glob.glob(str(item), recursive=True)]
+        elif path.is_file():
+            matches = [path]
+        else:
+            logger.warning(f"输入不存在: {item}")
+            continue
+
+        matches = [p for p in matches if p.is_file() and not p.name.startswith("~$")]
+        if not matches:
+            logger.warning(f"没有匹配的文件: {item}")
+        files.update(p.resolve() for p in matches)
+    return sorted(files)
+
+
+def find_detail_file(main_file, detail_suffixes, extensions=INPUT_EXTENSIONS):
+    """
+    按命名规则查找主数据文件对应的单件明细表（与主数据文件在同一目录）
+
+    Args:
+        main_file (Path): 主数据文件路径
+        detail_suffixes: 明细表文件名后缀，如 ("_明细",)，manifest.xlsx -> manifest_明细.xlsx
+        extensions: 明细表可用的扩展名（优先与主数据文件相同）
+
+    Returns:
+        Path: 明细表路径，找不到返回None
+    """
+    main_file = Path(main_file)
+    candidates = [main_file.suffix] + [ext for ext in extensions if ext != main_file.suffix.lower()]
+    for suffix in detail_suffixes:
+        for ext in candidates:
+            detail_file = main_file.with_name(f"{main_file.stem}{suffix}{ext}")
+            if detail_file.is_file():
+                return detail_file
+    return None
+
+
+def is_detail_file(path, detail_suffixes, extensions=INPUT_EXTENSIONS):
+    """文件名带明细表后缀，且同目录下存在对应的主数据文件时为明细表"""
+    path = Path(path)
+    for suffix in detail_suffixes:
+        if path.stem.endswith(suffix) and len(path.stem) > len(suffix):
+            main_stem = path.stem[:-len(suffix)]
+            if any(path.with_name(f"{main_stem}{ext}").is_file() for ext in extensions):
+                return True
+    return False
+
+
+def build_jobs(inputs, template_type: str, output_dir, detail_suffixes):
+    """
+    展开输入并生成任务：明细表不作为主数据处理，每个主数据文件匹配各自的明细表
+
+    Args:
+        inputs: 文件路径、通配符或目录列表
+        template_type: 模板类型
+        output_dir (str|Path): 输出目录，输出文件名为"{模板类型}总结单-{主数据文件名}.xlsx"
+        detail_suffixes: 明细表文件名后缀
+
+    Returns:
+        list: BatchJob列表
+    """
+    logger = logging.getLogger(__name__)
+    output_dir = Path(output_dir)
+    jobs = []
+    for path in expand_inputs(inputs):
+        if is_detail_file(path, detail_suffixes):
+            continue
+        detail_file = find_detail_file(path, detail_suffixes)
+        if detail_file is None:
+            logger.warning(f"{path.name} 没有对应的单件明细表")
+        output_path = output_dir / f"{template_type}总结单-{path.stem}.xlsx"
+        jobs.append(BatchJob(path, template_type, detail_file, output_path))
+    return jobs
+
+
+def execute_job(job: BatchJob):
+    """
+    执行单个任务（在工作进程中调用，模板从进程内的模板缓存获取，同一进程处理后续任务时无需重新解析模板）
+
+    Args:
+        job: 任务
+
+    Returns:
+        JobResult: 执行结果
+    """
+    start = time.perf_counter()
+    processor = ExcelProcessor()
+    try:
+        template = get_template_cache().get(processor.get_template_path(job.template_type))
+        output_path = processor.process_file(job.input_file, job.template_type, job.detail_file, output_path=job.output_path, template=template)
+    except Exception as e:
+        return JobResult(job, STATUS_FAILED, rows=processor.last_row_count, elapsed=time.perf_counter() - start, error=str(e))
+
+    elapsed = time.perf_counter() - start
+    if output_path is None:
+        return JobResult(job, STATUS_FAILED, rows=processor.last_row_count, elapsed=elapsed, error="处理失败，详见日志")
+    return JobResult(job, STATUS_SUCCESS, str(output_path), processor.last_row_count, elapsed)
+
+
+def init_worker(log_level: int, log_format: str, warm_templates=()):
+    """
+    工作进程初始化：Ctrl+C只由主进程处理（由主进程终止进程池），恢复SIGTERM的默认处理（主进程可能设置了停止服务的处理函数）；
+    spawn方式启动的进程没有继承日志配置。指定warm_templates时在处理任务之前将模板载入模板缓存（见warm_worker）
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    if not logging.getLogger().handlers:
+        logging.basicConfig(level=log_level, format=log_format)
+    if warm_templates:
+        try:
+            warm_worker(warm_templates)
+        except Exception as e:
+            # 预热失败不影响处理，任务执行时自行载入模板
+            logging.getLogger(__name__).warning(f"预热模板失败: {str(e)}")
+
+
+# 临时修改PYTHONPATH启动forkserver服务进程时使用的锁
+_forkserver_lock = threading.Lock()
+
+
+@contextmanager
+def _project_on_python_path():
+    """在with块内将项目根目录加入PYTHONPATH，退出时恢复原值"""
+    original = os.environ.get("PYTHONPATH")
+    python_path = [path for path in (original or "").split(os.pathsep) if path]
+    if str(PROJECT_ROOT) not in python_path:
+        os.environ["PYTHONPATH"] = os.pathsep.join([str(PROJECT_ROOT)] + python_path)
+    try:
+        yield
+    finally:
+        if original is None:
+            os.environ.pop("PYTHONPATH", None)
+        else:
+            os.environ["PYTHONPATH"] = original
+
+
+def get_worker_context(start_method: str = "forkserver"):
+    """
+    工作进程的multiprocessing上下文。
+    forkserver：服务进程启动时导入pandas、numpy、openpyxl和处理模块并载入设置中的模板（只在第一次创建工作进程时进行一次），
+    之后的工作进程由服务进程fork产生，继承已导入的模块和模板缓存，几毫秒即可开始处理；
+    服务进程是单线程的，不会像直接fork调用方进程那样复制其他线程持有的锁。
+    Windows（包括打包后的程序）没有forkserver，使用spawn：预加载不起作用，每个工作进程重新导入模块，
+    只能由进程池的初始化函数（init_worker的warm_templates）在处理任务之前载入模板
+
+    Args:
+        start_method: "forkserver" 或 "spawn"
+
+    Returns:
+        multiprocessing的上下文
+    """
+    if start_method == "forkserver" and "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        context.set_forkserver_preload(FORKSERVER_PRELOAD)
+        ensure_forkserver(context)
+        return context
+    return multiprocessing.get_context("spawn")
+
+
+def ensure_forkserver(context):
+    """
+    确保forkserver服务进程已启动（已启动时不做任何事）。
+    服务进程以"python -c"启动，只继承环境变量和当前目录，不继承调用方的sys.path（项目根目录由main.py加入），
+    启动时临时将项目根目录加入PYTHONPATH，使其能导入预加载模块（导入失败时multiprocessing会静默忽略，工作进程退化为自行导入），
+    启动后恢复，不影响本进程启动的其他子进程
+    """
+    if context.get_start_method() != "forkserver":
+        return
+    with _forkserver_lock, _project_on_python_path():
+        multiprocessing.forkserver.ensure_running()
+
+
+def create_worker_pool(context, processes: int, log_level: int, log_format: str, warm_templates=(), **kwargs):
+    """
+    创建工作进程池（批量处理、常驻工作进程、隔离处理共用）
+
+    Args:
+        context: get_worker_context的返回值
+        processes: 进程数
+        log_level: 工作进程的日志级别
+        log_format: 工作进程的日志格式
+        warm_templates: 每个工作进程启动后、处理任务之前载入模板缓存的模板类型
+        **kwargs: 传给Pool的其他参数（如maxtasksperchild）；initializer默认为init_worker
+
+    Returns:
+        multiprocessing.pool.Pool: 进程池
+    """
+    ensure_forkserver(context)
+    initializer = kwargs.pop("initializer", init_worker)
+    initargs = kwargs.pop("initargs", (log_level, log_format, tuple(warm_templates)))
+    return context.Pool(processes, initializer=initializer, initargs=initargs, **kwargs)
+
+
+def warm_worker(template_types):
+    """
+    预热工作进程：处理模块已在启动时导入，这里将各模板类型的模板载入进程内的模板缓存（在工作进程中调用）
+
+    Args:
+        template_types: 模板类型列表
+
+    Returns:
+        int: 工作进程的进程号
+    """
+    logger = logging.getLogger(__name__)
+    processor = ExcelProcessor()
+    for template_type in template_types:
+        template_path = processor.get_template_path(template_type)
+        if template_path and get_template_cache().get(template_path) is None:
+            logger.warning(f"预热{template_type}模板失败: {template_path}")
+    return os.getpid()
+
+
+class WorkerProcess:
+    """
+    常驻的单个工作进程：进程处理过的模板保持在模板缓存中，任务超时时只终止并重建这一个进程。
+    进程以forkserver或spawn方式启动（见get_worker_context）：调用方通常有其他线程在运行（如监听、HTTP线程），
+    直接fork可能复制其他线程持有的锁（如日志锁）导致子进程卡死
+    """
+
+    def __init__(self, log_level: int = logging.INFO, log_format: str = "%(asctime)s - %(levelname)s - %(message)s",
+                 warm_templates=(), start_method: str = "forkserver"):
+        """
+        Args:
+            log_level: 工作进程的日志级别
+            log_format: 工作进程的日志格式
+            warm_templates: 进程启动后预先载入模板缓存的模板类型
+            start_method: 工作进程的启动方式（见get_worker_context）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.log_level = log_level
+        self.log_format = log_format
+        self.warm_templates = tuple(warm_templates)
+        self._context = get_worker_context(start_method)
+        self._pool = self._create_pool()
+
+    def run(self, job: BatchJob, timeout: float = None):
+        """
+        在工作进程中执行任务（阻塞直到完成或超时）
+
+        Args:
+            job: 任务
+            timeout: 超时时间（秒），None表示不限制，超时时删除写了一半的输出文件并重建进程
+
+        Returns:
+            JobResult: 执行结果
+        """
+        started, started_at = time.monotonic(), time.time()
+        try:
+            return self._pool.apply_async(execute_job, (job,)).get(timeout)
+        except multiprocessing.TimeoutError:
+            self.logger.error(f"{job.name} 超过 {timeout} 秒，已终止")
+            self.restart()
+            discard_partial_output(job, started_at)
+            return JobResult(job, STATUS_TIMEOUT, elapsed=time.monotonic() - started, error=f"超过{timeout}秒")
+        except Exception as e:
+            return JobResult(job, STATUS_FAILED, elapsed=time.monotonic() - started, error=str(e))
+
+    def restart(self):
+        """终止并重建工作进程"""
+        self.close()
+        self._pool = self._create_pool()
+
+    def close(self):
+        """终止工作进程"""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def _create_pool(self):
+        return create_worker_pool(self._context, 1, self.log_level, self.log_format, self.warm_templates)
+
+
+# 隔离处理的子进程中的进度事件队列和取消事件（由init_isolated_worker设置）
+_isolated_events = None
+_isolated_cancel = None
+
+
+def init_isolated_worker(log_level: int, log_format: str, events, cancel_event, log_queue=None, warm_templates=()):
+    """
+    隔离处理的子进程初始化：除init_worker外，保存主进程传入的进度事件队列和取消事件，
+    指定log_queue时日志记录发回主进程，由主进程的日志处理器输出（如写入app.log）
+    """
+    global _isolated_events, _isolated_cancel
+    if log_queue is not None:
+        root_logger = logging.getLogger()
+        root_logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+        root_logger.setLevel(log_level)
+    init_worker(log_level, log_format, warm_templates)
+    _isolated_events, _isolated_cancel = events, cancel_event
+
+
+def execute_isolated(job_id: int, input_file: str, template_type, detail_file: str = None, check_interval: int = DEFAULT_CHECK_INTERVAL):
+    """
+    在子进程中处理文件（见IsolatedProcessor），进度通过事件队列发回主进程，
+    处理产生的DataFrame、工作簿等对象都留在子进程中，只返回输出文件路径和统计
+
+    Args:
+        job_id: 任务编号（主进程据此丢弃之前任务的迟到事件）
+        input_file: 主数据文件路径
+        template_type (str|list): 模板类型，列表时同一次读取生成各模板的输出
+        detail_file: 单件明细表文件路径
+        check_interval: 每处理多少行报告一次进度并检查取消
+
+    Returns:
+        dict: output（输出文件路径，列表时为 {模板类型: 输出文件路径}）、rows（主数据行数）、elapsed（耗时）、pid（子进程号）
+    """
+    start = time.perf_counter()
+    processor = ExcelProcessor()
+    progress = ProgressToken(lambda info: _isolated_events.put((job_id, info)), check_interval, cancel_event=_isolated_cancel)
+    # 模板从子进程的模板缓存获取，同一子进程处理后续任务时无需重新解析模板
+    if isinstance(template_type, (list, tuple)):
+        template = {t: get_template_cache().get(processor.get_template_path(t)) for t in template_type}
+    else:
+        template = get_template_cache().get(processor.get_template_path(template_type))
+    output = processor.process_file(input_file, template_type, detail_file, template=template, progress=progress)
+    return {"output": output, "rows": processor.last_row_count, "elapsed": time.perf_counter() - start, "pid": os.getpid()}
+
+
+class IsolatedProcessor:
+    """
+    在子进程中执行处理，接口与ExcelProcessor.process_file相同（供界面的JobWorker使用）。
+    长时间运行的界面进程只接收输出文件路径和统计，处理中创建的pandas、openpyxl对象及其内存碎片随子进程一起释放；
+    子进程处理max_jobs个任务后退出并由新进程替换，界面进程的内存占用不随处理次数增长。
+    进度经multiprocessing队列转发给任务的ProgressToken，取消通过共享的Event通知子进程，子进程的日志由主进程的日志处理器输出
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, max_jobs: int = 20, log_level: int = logging.INFO, log_format: str = "%(asctime)s - %(levelname)s - %(message)s",
+                 check_interval: int = DEFAULT_CHECK_INTERVAL, poll_interval: float = 0.1, cancel_grace: float = 10.0,
+                 warm_templates=(), start_method: str = "forkserver"):
+        """
+        Args:
+            max_jobs: 每个子进程最多处理的任务数，之后替换为新进程
+            log_level: 子进程的日志级别
+            log_format: 子进程的日志格式
+            check_interval: 每处理多少行报告一次进度并检查取消
+            poll_interval: 转发进度和检查取消的间隔（秒）
+            cancel_grace: 请求取消后等待子进程停止的时间（秒），超时则终止并重建子进程
+            warm_templates: 子进程启动后预先载入模板缓存的模板类型（forkserver方式已由服务进程载入，这里只检查模板是否有更新）
+            start_method: 子进程的启动方式（见get_worker_context）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_jobs = max(1, max_jobs or 1)
+        self.log_level = log_level
+        self.log_format = log_format
+        self.check_interval = check_interval
+        self.poll_interval = poll_interval
+        self.cancel_grace = cancel_grace
+        self.warm_templates = tuple(warm_templates)
+        # 最近一次处理的主数据行数和统计（与ExcelProcessor.last_row_count一致）
+        self.last_row_count = 0
+        self.last_metrics = None
+
+        # 界面进程有处理线程和界面线程，子进程以forkserver或spawn方式启动（见WorkerProcess）
+        self._context = get_worker_context(start_method)
+        self._events = self._context.Queue()
+        self._cancel = self._context.Event()
+        self._log_queue = self._context.Queue()
+        self._log_listener = logging.handlers.QueueListener(self._log_queue, *logging.getLogger().handlers, respect_handler_level=True)
+        self._log_listener.start()
+        # 子进程在后台线程中创建（forkserver服务进程启动时要导入处理模块、载入模板），不阻塞界面启动
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        threading.Thread(target=self._get_pool, name="isolated-pool", daemon=True).start()
+
+    def process_file(self, input_file, template_type, detail_file=None, progress: ProgressToken = None):
+        """
+        在子进程中处理文件（阻塞直到完成，在JobWorker的处理线程中调用）
+
+        Args:
+            input_file: 主数据文件路径
+            template_type (str|list): 模板类型，列表时同一次读取生成各模板的输出
+            detail_file: 单件明细表文件路径
+            progress: 任务的进度令牌，子进程的进度转发给它，通过它取消时通知子进程
+
+        Returns:
+            str: 输出文件路径，失败或取消返回None；template_type为列表时返回 {模板类型: 输出文件路径或None}
+        """
+        job_id = next(self._ids)
+        self.last_row_count = 0
+        self._cancel.clear()
+        async_result = self._get_pool().apply_async(execute_isolated, (job_id, input_file, template_type, detail_file, self.check_interval))
+
+        cancelled_at = None
+        while not async_result.ready():
+            async_result.wait(self.poll_interval)
+            self._relay_events(job_id, progress)
+            if progress is None or not progress.cancelled:
+                continue
+            if cancelled_at is None:
+                cancelled_at = time.monotonic()
+                self._cancel.set()
+            elif time.monotonic() - cancelled_at > self.cancel_grace:
+                self.logger.warning(f"子进程在 {self.cancel_grace} 秒内没有停止，已终止")
+                self.restart()
+                return {t: None for t in template_type} if isinstance(template_type, (list, tuple)) else None
+        self._relay_events(job_id, progress)
+
+        result = async_result.get()
+        self.last_row_count = result["rows"]
+        self.last_metrics = result
+        self.logger.info(f"子进程 {result['pid']} 处理完成: {result['rows']} 行，{result['elapsed']:.1f} 秒")
+        return result["output"]
+
+    def restart(self):
+        """终止并重建子进程"""
+        self._terminate_pool()
+        self._get_pool()
+
+    def close(self):
+        """终止子进程，停止转发日志"""
+        self._terminate_pool()
+        if self._log_listener is not None:
+            self._log_listener.stop()
+            self._log_listener = None
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = self._create_pool()
+            return self._pool
+
+    def _terminate_pool(self):
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            self._cancel.set()
+            pool.terminate()
+            pool.join()
+
+    def _relay_events(self, job_id: int, progress: ProgressToken):
+        while True:
+            try:
+                event_job_id, info = self._events.get_nowait()
+            except queue.Empty:
+                return
+            if event_job_id == job_id and progress is not None:
+                progress.relay(info)
+
+    def _create_pool(self):
+        return create_worker_pool(self._context, 1, self.log_level, self.log_format, initializer=init_isolated_worker,
+                                  initargs=(self.log_level, self.log_format, self._events, self._cancel, self._log_queue, self.warm_templates),
+                                  maxtasksperchild=self.max_jobs)
+
+
+class JobRunner:
+    """在进程池中执行批量任务"""
+
+    def __init__(self, max_workers: int = None, timeout: float = None, log_level: int = logging.INFO,
+                 log_format: str = "%(asctime)s - %(levelname)s - %(message)s", poll_interval: float = 0.1,
+                 warm_templates=(), start_method: str = "forkserver"):
+        """
+        Args:
+            max_workers: 进程数，默认为CPU核数
+            timeout: 单个任务的超时时间（秒），None表示不限制
+            log_level: 工作进程的日志级别
+            log_format: 工作进程的日志格式
+            poll_interval: 检查任务状态的间隔（秒）
+            warm_templates: 每个工作进程启动后预先载入模板缓存的模板类型
+            start_method: 工作进程的启动方式（见get_worker_context）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.timeout = timeout or None
+        self.log_level = log_level
+        self.log_format = log_format
+        self.poll_interval = poll_interval
+        self.warm_templates = tuple(warm_templates)
+        self._context = get_worker_context(start_method)
+
+    def run(self, jobs: list, on_result=None):
+        """
+        执行任务，同时执行的任务数不超过进程数（提交即开始执行，超时从提交时计算）
+
+        Args:
+            jobs: BatchJob列表
+            on_result: 每个任务完成时的回调，参数为JobResult
+
+        Returns:
+            list: 与jobs顺序一致的JobResult列表
+        """
+        results = [None] * len(jobs)
+        pending = deque(enumerate(jobs))
+
+        def complete(index, result):
+            results[index] = result
+            if on_result is not None:
+                on_result(result)
+
+        self._execute(lambda: pending.popleft() if pending else None, complete, pending.appendleft)
+        return results
+
+    def run_ledger(self, ledger, job_ids: list, owner: str, on_result=None):
+        """
+        从任务账本领取任务执行，直到没有可领取的任务；执行中的任务定期续约，
+        随超时任务一起被终止的任务放回账本（可能由其他进程领取）
+
+        Args:
+            ledger (JobLedger): 任务账本
+            job_ids: 可领取的任务编号（JobLedger.register的返回值）
+            owner: 领取者
+            on_result: 每个任务完成时的回调，参数为JobResult
+
+        Returns:
+            list: 本进程执行的任务的JobResult列表（按完成顺序）
+        """
+        results = []
+        renew_interval = ledger.lease_seconds / 3
+        last_renew = time.monotonic()
+
+        def complete(job_id, result):
+            ledger.complete(job_id, owner, result)
+            results.append(result)
+            if on_result is not None:
+                on_result(result)
+
+        def renew(running_ids):
+            nonlocal last_renew
+            if running_ids and time.monotonic() - last_renew >= renew_interval:
+                ledger.renew(running_ids, owner)
+                last_renew = time.monotonic()
+
+        self._execute(lambda: ledger.claim(owner, job_ids), complete, lambda item: ledger.release(item[0], owner), renew)
+        return results
+
+    def _execute(self, next_job, complete, requeue, on_tick=None):
+        """
+        执行任务的主循环
+
+        Args:
+            next_job: 取下一个任务，返回 (任务键, BatchJob)，没有任务时返回None
+            complete: 任务完成时调用，参数为 (任务键, JobResult)
+            requeue: 任务随超时任务一起被终止时调用，参数为 (任务键, BatchJob)
+            on_tick: 每次检查任务状态时调用，参数为执行中的任务键列表
+        """
+        running = {}  # 任务键 -> (BatchJob, AsyncResult, 开始时间, 开始时的系统时间)
+        exhausted = False
+
+        pool = self._create_pool()
+        try:
+            while True:
+                while not exhausted and len(running) < self.max_workers:
+                    item = next_job()
+                    if item is None:
+                        exhausted = True
+                        break
+                    key, job = item
+                    running[key] = (job, pool.apply_async(execute_job, (job,)), time.monotonic(), time.time())
+                if not running:
+                    break
+
+                timed_out = []
+                now = time.monotonic()
+                for key, (job, async_result, started, _) in list(running.items()):
+                    if async_result.ready():
+                        del running[key]
+                        try:
+                            result = async_result.get()
+                        except Exception as e:
+                            result = JobResult(job, STATUS_FAILED, elapsed=now - started, error=str(e))
+                        complete(key, result)
+                        # 有空闲进程，再取任务
+                        exhausted = False
+                    elif self.timeout is not None and now - started > self.timeout:
+                        timed_out.append(key)
+                if on_tick is not None:
+                    on_tick(list(running))
+
+                if not timed_out:
+                    time.sleep(self.poll_interval)
+                    continue
+
+                pool.terminate()
+                pool.join()
+                for key in timed_out:
+                    job, _, started, started_at = running.pop(key)
+                    self.logger.error(f"{job.name} 超过 {self.timeout} 秒，已终止")
+                    discard_partial_output(job, started_at)
+                    complete(key, JobResult(job, STATUS_TIMEOUT, elapsed=now - started, error=f"超过{self.timeout}秒"))
+                for key in sorted(running, reverse=True):
+                    job = running[key][0]
+                    self.logger.warning(f"{job.name} 随超时任务一起被终止，重新执行")
+                    requeue((key, job))
+                running.clear()
+                exhausted = False
+                pool = self._create_pool()
+
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _create_pool(self):
+        return create_worker_pool(self._context, self.max_workers, self.log_level, self.log_format, self.warm_templates)
+
+
+def discard_partial_output(job: BatchJob, started_at: float):
+    """
+    删除被终止的任务在本次执行中写了一半的输出文件（之前生成的同名文件保留）
+
+    Args:
+        job: 任务
+        started_at: 任务开始时的系统时间（time.time()）
+    """
+    logger = logging.getLogger(__name__)
+    if not job.output_path:
+        return
+    output_path = Path(job.output_path)
+    try:
+        if output_path.exists() and output_path.stat().st_mtime >= started_at:
+            output_path.unlink()
+            logger.info(f"已删除未完成的输出文件: {output_path}")
+    except OSError as e:
+        logger.error(f"删除未完成的输出文件时出错: {str(e)}")
+
+
+def summarize(results: list, elapsed: float):
+    """
+    统计批量处理的吞吐量（按成功的任务计算）
+
+    Args:
+        results: JobResult列表
+        elapsed: 总耗时（秒）
+
+    Returns:
+        dict: 文件数、成功/失败/超时数、行数、耗时、文件/秒、行/秒
+    """
+    succeeded = [result for result in results if result.success]
+    rows = sum(result.rows for result in succeeded)
+    return {
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "failed": sum(1 for result in results if result.status == STATUS_FAILED),
+        "timed_out": sum(1 for result in results if result.status == STATUS_TIMEOUT),
+        "rows": rows,
+        "elapsed": elapsed,
+        "files_per_second": len(succeeded) / elapsed if elapsed > 0 else 0.0,
+        "rows_per_second": rows / elapsed if elapsed > 0 else 0.0,
+    }
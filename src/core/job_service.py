@@ -0,0 +1,267 @@
+# -*- coding: utf-8 -*-
+"""
+任务服务
+接收上传的主数据文件和单件明细表，保存到任务目录后放入有界队列，由常驻的工作进程处理。
+工作进程启动时即预热模板缓存，之后的任务无需重新解析模板；任务状态可随时查询，
+完成的任务在保留时间过后连同上传和输出文件一起删除
+"""
+import logging
+import queue
+import shutil
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+
+from src.core.inbox_daemon import DaemonMetrics
+from src.core.job_runner import INPUT_EXTENSIONS, STATUS_FAILED, STATUS_SUCCESS, BatchJob, WorkerProcess
+
+# 任务状态（完成后为job_runner中的STATUS_SUCCESS、STATUS_FAILED、STATUS_TIMEOUT）
+STATUS_QUEUED = "queued"
+STATUS_RUNNING = "running"
+
+
+class ServiceJob:
+    """服务中的一个任务"""
+
+    def __init__(self, job_id: str, template_type: str, job_dir: Path, input_file: Path, detail_file: Path = None):
+        """
+        Args:
+            job_id: 任务编号
+            template_type: 模板类型 ("UPS" 或 "DPD")
+            job_dir: 任务目录（上传文件和输出文件）
+            input_file: 主数据文件路径
+            detail_file: 单件明细表文件路径
+        """
+        self.job_id = job_id
+        self.template_type = template_type
+        self.job_dir = job_dir
+        self.input_file = input_file
+        self.detail_file = detail_file
+        self.output_path = job_dir / f"{template_type}总结单-{input_file.stem}.xlsx"
+        self.status = STATUS_QUEUED
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.rows = 0
+        self.error = None
+
+    @property
+    def finished(self):
+        return self.status not in (STATUS_QUEUED, STATUS_RUNNING)
+
+    def to_batch_job(self):
+        return BatchJob(self.input_file, self.template_type, self.detail_file, self.output_path)
+
+    def to_dict(self):
+        """转换为可序列化的字典（不含服务器上的文件路径）"""
+        return {
+            "id": self.job_id,
+            "template": self.template_type,
+            "status": self.status,
+            "input": self.input_file.name,
+            "detail": self.detail_file.name if self.detail_file else None,
+            "output": self.output_path.name if self.status == STATUS_SUCCESS else None,
+            "rows": self.rows,
+            "error": self.error,
+            "created_at": _isoformat(self.created_at),
+            "started_at": _isoformat(self.started_at),
+            "finished_at": _isoformat(self.finished_at),
+        }
+
+
+def _isoformat(timestamp):
+    return datetime.fromtimestamp(timestamp).isoformat(timespec="seconds") if timestamp else None
+
+
+def safe_file_name(file_name: str, extensions=INPUT_EXTENSIONS):
+    """
+    上传文件名只保留文件名部分，并检查扩展名
+
+    Returns:
+        str: 文件名，不是Excel文件时返回None
+    """
+    name = Path(str(file_name).replace("\\", "/")).name.strip()
+    if not name or name.startswith(".") or Path(name).suffix.lower() not in extensions:
+        return None
+    return name
+
+
+class JobService:
+    """上传文件的处理服务（线程安全，供HTTP服务等调用）"""
+
+    def __init__(self, work_dir, workers: int = 2, queue_size: int = 20, job_timeout: float = None, job_ttl: float = 3600,
+                 warm_templates=(), log_level: int = logging.INFO, log_format: str = "%(asctime)s - %(levelname)s - %(message)s",
+                 start_method: str = "forkserver"):
+        """
+        Args:
+            work_dir (str|Path): 任务目录的上级目录
+            workers: 工作进程数
+            queue_size: 等待处理的任务队列容量，队列满时拒绝新任务
+            job_timeout: 单个任务的超时时间（秒），None表示不限制
+            job_ttl: 完成的任务保留多少秒（之后删除任务及其文件），None表示一直保留
+            warm_templates: 工作进程启动时预先载入模板缓存的模板类型
+            log_level: 工作进程的日志级别
+            log_format: 工作进程的日志格式
+            start_method: 工作进程的启动方式（见job_runner.get_worker_context）
+        """
+        self.logger = logging.getLogger(__name__)
+        self.work_dir = Path(work_dir)
+        self.workers = max(1, workers or 1)
+        self.job_timeout = job_timeout or None
+        self.job_ttl = job_ttl
+        self.warm_templates = tuple(warm_templates)
+        self.log_level = log_level
+        self.log_format = log_format
+        self.start_method = start_method
+
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.metrics = DaemonMetrics(queue_size)
+        self._lock = threading.Lock()
+        # 任务编号 -> ServiceJob
+        self._jobs = {}
+        self._threads = []
+
+    def start(self):
+        """启动工作进程（启动后立即预热模板缓存）"""
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._worker_loop, name=f"service-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f"任务服务已启动，{self.workers} 个工作进程，队列容量 {self.queue.maxsize}，任务目录 {self.work_dir}")
+
+    def stop(self):
+        """丢弃尚未开始的任务，等待处理中的任务完成后停止工作进程"""
+        while True:
+            try:
+                item = self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                self._finish(item, STATUS_FAILED, error="服务已停止")
+        for _ in self._threads:
+            self.queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.logger.info("任务服务已停止")
+
+    def submit(self, template_type: str, input_name: str, input_data: bytes, detail_name: str = None, detail_data: bytes = None):
+        """
+        保存上传的文件并提交任务
+
+        Args:
+            template_type: 模板类型
+            input_name: 主数据文件名
+            input_data: 主数据文件内容
+            detail_name: 单件明细表文件名
+            detail_data: 单件明细表文件内容
+
+        Returns:
+            ServiceJob: 任务
+
+        Raises:
+            ValueError: 文件名不是Excel文件
+            queue.Full: 队列已满
+        """
+        self.purge_expired()
+        input_name = safe_file_name(input_name)
+        if input_name is None:
+            raise ValueError("主数据文件必须是Excel文件（.xlsx/.xls）")
+        if detail_data is not None:
+            detail_name = safe_file_name(detail_name)
+            if detail_name is None:
+                raise ValueError("单件明细表必须是Excel文件（.xlsx/.xls）")
+            if detail_name == input_name:
+                detail_name = f"明细-{detail_name}"
+
+        job_id = uuid.uuid4().hex
+        job_dir = self.work_dir / job_id
+        job_dir.mkdir(parents=True)
+        (job_dir / input_name).write_bytes(input_data)
+        if detail_data is not None:
+            (job_dir / detail_name).write_bytes(detail_data)
+
+        job = ServiceJob(job_id, template_type, job_dir, job_dir / input_name, job_dir / detail_name if detail_data is not None else None)
+        with self._lock:
+            self._jobs[job_id] = job
+        try:
+            self.queue.put_nowait(job)
+        except queue.Full:
+            with self._lock:
+                del self._jobs[job_id]
+            shutil.rmtree(job_dir, ignore_errors=True)
+            raise
+        self.metrics.job_queued(self.queue.qsize())
+        self.logger.info(f"任务 {job_id} 已加入队列: {input_name}（{template_type}），队列深度 {self.queue.qsize()}")
+        return job
+
+    def get(self, job_id: str):
+        """
+        Returns:
+            ServiceJob: 任务，不存在时返回None
+        """
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list_jobs(self):
+        """
+        Returns:
+            list: 所有任务（按提交时间排序）
+        """
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def status(self):
+        """
+        Returns:
+            dict: 队列深度、处理中的任务数、各状态任务数和耗时统计（见DaemonMetrics.snapshot）
+        """
+        status = self.metrics.snapshot(self.queue.qsize())
+        status["workers"] = self.workers
+        with self._lock:
+            status["jobs"] = len(self._jobs)
+        return status
+
+    def purge_expired(self):
+        """删除超过保留时间的已完成任务及其文件"""
+        if not self.job_ttl:
+            return
+        deadline = time.time() - self.job_ttl
+        with self._lock:
+            expired = [job for job in self._jobs.values() if job.finished and job.finished_at < deadline]
+            for job in expired:
+                del self._jobs[job.job_id]
+        for job in expired:
+            shutil.rmtree(job.job_dir, ignore_errors=True)
+        if expired:
+            self.logger.info(f"已删除 {len(expired)} 个过期任务")
+
+    def _finish(self, job: ServiceJob, status: str, rows: int = 0, error: str = None):
+        with self._lock:
+            job.status = status
+            job.rows = rows
+            job.error = error
+            job.finished_at = time.time()
+
+    def _worker_loop(self):
+        # 每个工作线程独占一个常驻的工作进程，进程启动后先预热模板缓存
+        worker = WorkerProcess(self.log_level, self.log_format, self.warm_templates, self.start_method)
+        try:
+            while True:
+                job = self.queue.get()
+                if job is None:
+                    break
+                with self._lock:
+                    job.status = STATUS_RUNNING
+                    job.started_at = time.time()
+                started = time.monotonic()
+                self.metrics.job_started()
+                result = worker.run(job.to_batch_job(), self.job_timeout)
+                self._finish(job, result.status, result.rows, result.error)
+                self.metrics.job_finished(result, job.started_at - job.created_at, time.monotonic() - started)
+                self.logger.info(f"任务 {job.job_id}（{job.input_file.name}）: {result.status}，处理 {time.monotonic() - started:.1f} 秒")
+        finally:
+            worker.close()
@@ -0,0 +1,312 @@
+# -*- coding: utf-8 -*-
+"""
+原始数据规范化
+国家二字码、收件人邮编、数值列的清洗在每个输入上只计算一次，
+各处理器和统计函数共享同一个规范化视图。
+国家代码去除首尾空格并转为大写后再比较：" de"、"de"与"DE"计为同一个国家（UPS统计、德国邮编工作表
+以前只精确匹配"DE"，这类值会被单独列出或不计入德国邮编）
+"""
+import logging
+import math
+import threading
+import weakref
+
+import numpy as np
+import pandas as pd
+
+# 规范化后视为无效的国家代码
+INVALID_COUNTRY_CODES = ("", "NAN", "NONE")
+
+# 规范化后视为无效的邮编
+INVALID_POSTCODES = ("", "NAN", "NONE")
+
+# DataFrame.attrs中保存规范化视图的键
+VIEW_ATTR = "_normalized_view"
+
+_views_lock = threading.RLock()
+
+
+class _ViewSlot:
+    """
+    保存在DataFrame.attrs中的视图容器：pandas在派生DataFrame（筛选、复制、concat等）时深复制attrs，
+    进程池传递DataFrame时序列化attrs，两种情况都得到空容器，派生数据不会沿用原数据的视图
+    """
+
+    def __init__(self, view=None):
+        self.view = view
+
+    def __copy__(self):
+        return _ViewSlot()
+
+    def __deepcopy__(self, memo):
+        return _ViewSlot()
+
+    def __reduce__(self):
+        return _ViewSlot, ()
+
+
+class NormalizedData:
+    """单个DataFrame的规范化视图，各列在首次访问时计算并缓存"""
+
+    def __init__(self, data: pd.DataFrame):
+        self.logger = logging.getLogger(__name__)
+        # 只持有弱引用，视图缓存不会延长原始数据的生命周期
+        self._data_ref = weakref.ref(data)
+        self._lock = threading.RLock()
+        # 列名 -> (国家代码编号数组, 排序后的国家代码数组)
+        self._countries = {}
+        # 列名 -> 规范化邮编Series
+        self._postcodes = {}
+        # 列名 -> 数值数组
+        self._numerics = {}
+        # 列名 -> (有效邮编编号数组, 排序后的邮编数组)
+        self._postcode_codes = {}
+        # 基于本视图计算的派生结果（如汇总结果）
+        self._derived = {}
+
+    @property
+    def data(self):
+        """原始数据"""
+        data = self._data_ref()
+        if data is None:
+            raise ReferenceError("原始数据已被释放")
+        return data
+
+    def country_codes(self, column: str):
+        """
+        国家代码编号（去空格、转大写后按字母顺序编号）
+
+        Args:
+            column: 国家列名
+
+        Returns:
+            tuple: (编号数组, 国家代码数组)，无效国家代码（空值、"NAN"、"NONE"）的编号为-1，
+                国家代码数组按字母顺序排列，编号即其下标
+        """
+        with self._lock:
+            if column not in self._countries:
+                countries = self.data[column].astype(str).str.strip().str.upper()
+                countries = countries.where(~countries.isin(INVALID_COUNTRY_CODES))
+                codes, labels = pd.factorize(countries, sort=True)
+                self._countries[column] = (codes, np.asarray(labels, dtype=object))
+                self.logger.debug(f"规范化国家列 '{column}': {len(labels)} 个国家，{int((codes < 0).sum())} 个无效值")
+            return self._countries[column]
+
+    def countries(self, column: str):
+        """
+        规范化后的国家代码Series（与原始数据索引对齐，无效值为NaN）
+
+        Args:
+            column: 国家列名
+
+        Returns:
+            pd.Series: 国家代码
+        """
+        codes, labels = self.country_codes(column)
+        values = np.empty(len(codes), dtype=object)
+        values[:] = np.nan
+        valid = codes >= 0
+        values[valid] = labels[codes[valid]]
+        return pd.Series(values, index=self.data.index, name=column)
+
+    def country_mask(self, column: str, country_code: str):
+        """指定国家的行掩码"""
+        codes, labels = self.country_codes(column)
+        position = np.searchsorted(labels, country_code.upper()) if len(labels) else 0
+        if position >= len(labels) or labels[position] != country_code.upper():
+            return np.zeros(len(codes), dtype=bool)
+        return codes == position
+
+    def postcodes(self, column: str):
+        """
+        规范化后的邮编Series（与原始数据索引对齐）
+
+        整数形式的浮点数（如读取含空值的列得到的36251.0）转换为"36251"，字符串去除首尾空格，
+        空值转换为空字符串
+
+        Args:
+            column: 邮编列名
+
+        Returns:
+            pd.Series: 邮编字符串
+        """
+        with self._lock:
+            if column not in self._postcodes:
+                codes, uniques = pd.factorize(self.data[column])
+                canonical = np.array([canonical_postcode(value) for value in uniques] + [""], dtype=object)
+                self._postcodes[column] = pd.Series(canonical[codes], index=self.data.index, name=column)
+            return self._postcodes[column]
+
+    def postcode_codes(self, column: str):
+        """
+        邮编编号（按规范化后的邮编字符串排序编号）
+
+        Args:
+            column: 邮编列名
+
+        Returns:
+            tuple: (编号数组, 邮编数组)，无效邮编的编号为-1
+        """
+        with self._lock:
+            if column not in self._postcode_codes:
+                postcodes = self.postcodes(column)
+                codes, labels = pd.factorize(postcodes.where(self.postcode_valid_mask(column)), sort=True)
+                self._postcode_codes[column] = (codes, np.asarray(labels, dtype=object))
+            return self._postcode_codes[column]
+
+    def postcode_buckets(self, column: str, buckets: list):
+        """
+        邮编分组索引：一次计算每行邮编属于哪个指定邮编
+
+        Args:
+            column: 邮编列名
+            buckets: 指定邮编列表
+
+        Returns:
+            np.ndarray: 每行对应的指定邮编下标，不属于任何指定邮编（other）为-1；
+                指定邮编重复（规范化后相同）时对应第一次出现的下标
+        """
+        bucket_keys = tuple(canonical_postcode(bucket) for bucket in buckets)
+
+        def compute():
+            # 去重后查找，再换算为第一次出现的下标（Index中有重复值时无法get_indexer）
+            first_positions = {}
+            for position, key in enumerate(bucket_keys):
+                first_positions.setdefault(key, position)
+            unique_keys = list(first_positions)
+            if len(unique_keys) < len(bucket_keys):
+                duplicates = sorted(key for key in unique_keys if bucket_keys.count(key) > 1)
+                self.logger.warning(f"指定邮编中有重复值，按第一次出现的位置分组: {duplicates}")
+            indexer = pd.Index(unique_keys).get_indexer(self.postcodes(column))
+            positions = np.append(np.asarray(list(first_positions.values()), dtype=np.intp), -1)
+            return positions[indexer]
+
+        return self.get_derived(("postcode_buckets", column, bucket_keys), compute)
+
+    def postcode_valid_mask(self, column: str):
+        """有效邮编的行掩码"""
+        return ~self.postcodes(column).isin(INVALID_POSTCODES).to_numpy()
+
+    def numeric(self, column: str):
+        """
+        数值列（无法转换为数字的值按0处理）
+
+        Args:
+            column: 列名
+
+        Returns:
+            np.ndarray: 数值数组
+        """
+        with self._lock:
+            if column not in self._numerics:
+                try:
+                    values = pd.to_numeric(self.data[column], errors='coerce')
+                    null_count = int(values.isnull().sum())
+                    if null_count > 0:
+                        self.logger.warning(f"列 '{column}' 中有 {null_count} 个值无法转换为数字，将用0填充")
+                        values = values.fillna(0)
+                    self._numerics[column] = values.to_numpy()
+                except Exception as e:
+                    self.logger.error(f"转换列 '{column}' 为数值类型时出错: {str(e)}")
+                    self._numerics[column] = np.zeros(len(self.data), dtype=np.int64)
+            return self._numerics[column]
+
+    def fixed_point(self, column: str, scale: int):
+        """
+        定点整数形式的数值列（如重量按整数克），用于精确汇总
+
+        Args:
+            column: 列名
+            scale: 比例（如1000表示kg转换为克）
+
+        Returns:
+            np.ndarray: int64数组
+        """
+        def compute():
+            return to_fixed_point(self.numeric(column), scale)
+
+        return self.get_derived(("fixed_point", column, scale), compute)
+
+    def get_derived(self, key, factory):
+        """
+        获取基于本视图计算的派生结果，首次访问时调用factory计算并缓存
+
+        Args:
+            key: 缓存键
+            factory: 无参数的计算函数
+
+        Returns:
+            factory的返回值
+        """
+        with self._lock:
+            if key not in self._derived:
+                self._derived[key] = factory()
+            return self._derived[key]
+
+
+def canonical_postcode(value):
+    """
+    邮编规范化
+
+    Args:
+        value: 原始邮编值
+
+    Returns:
+        str: 规范化后的邮编，空值返回空字符串
+    """
+    if value is None:
+        return ""
+    if isinstance(value, (float, np.floating)):
+        if math.isnan(value):
+            return ""
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def to_fixed_point(values, scale: int):
+    """
+    将数值转换为定点整数（如kg转换为整数克）
+
+    Args:
+        values: 数值数组或Series
+        scale: 比例
+
+    Returns:
+        np.ndarray: int64定点整数数组
+
+    精度超过比例的数值（如按克汇总时的0.1克）会被舍入到最近的定点整数，此时记录警告
+    """
+    scaled = np.asarray(values, dtype=np.float64) * scale
+    fixed = np.rint(scaled)
+    lost = ~np.isclose(scaled, fixed, rtol=1e-9, atol=1e-6)
+    if lost.any():
+        example = scaled[lost][0] / scale
+        logging.getLogger(__name__).warning(f"{int(lost.sum())} 个数值的精度超过定点比例 1/{scale}，已舍入（如 {example!r}）")
+    return fixed.astype(np.int64)
+
+
+def from_fixed_point(values, scale: int):
+    """将定点整数换算回原单位（汇总完成后、写入前调用）"""
+    return np.asarray(values, dtype=np.int64) / scale
+
+
+def get_normalized_view(data: pd.DataFrame, refresh: bool = False):
+    """
+    获取DataFrame的规范化视图（同一个DataFrame对象只创建一次，视图保存在data.attrs中，随DataFrame一起释放）
+
+    Args:
+        data: 原始数据
+        refresh: 是否丢弃已缓存的视图重新创建（数据可能被原地修改时，在每次处理开始时使用）
+
+    Returns:
+        NormalizedData: 规范化视图
+    """
+    with _views_lock:
+        slot = data.attrs.get(VIEW_ATTR)
+        if not isinstance(slot, _ViewSlot):
+            slot = data.attrs[VIEW_ATTR] = _ViewSlot()
+        # attrs被整体赋值给另一个DataFrame时，视图的原始数据不是当前数据
+        if slot.view is None or slot.view._data_ref() is not data or refresh:
+            slot.view = NormalizedData(data)
+        return slot.view
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+超大数据分片写入
+数据行数超过Excel单表上限（1,048,576行）时，将超出部分写入续表（如"子单号 (2)"）
+或独立的工作簿文件，续表/续簿从模板工作表复制表头和样式。
+分片是对已算好的填充计划按行切分，不是从数据源流式读取：填充计划（及其数据源）始终完整地保存在内存中
+"""
+import logging
+from copy import copy
+from pathlib import Path
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.worksheet import Worksheet
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.style_registry import StyleRegistry
+
+# Excel单个工作表的最大行数
+EXCEL_MAX_ROWS = 1048576
+
+# 支持的分片模式：sheet（同一工作簿内的续表）、workbook（独立工作簿文件）
+OVERFLOW_MODES = ("sheet", "workbook")
+
+
+class SheetOverflowWriter:
+    """将填充计划写入工作表，超出最大行数时自动分片"""
+
+    def __init__(self, mode: str = "sheet", max_rows: int = EXCEL_MAX_ROWS, style_registry: StyleRegistry = None, progress=None):
+        """
+        Args:
+            mode: 分片模式，"sheet"写入同一工作簿的续表，"workbook"写入独立工作簿
+                （续簿逐个以只写模式写出并释放，不会加入主工作簿；填充计划本身仍持有全部数据，
+                内存占用随整个数据量增长，分片只避免主工作簿中保留续表的单元格对象）
+            max_rows: 单个工作表允许的最大行号
+            style_registry: 目标工作簿的样式缓存
+            progress (ProgressToken, optional): 进度令牌，写入时报告进度并检查取消，写出的续簿登记为本次的输出文件
+        """
+        self.logger = logging.getLogger(__name__)
+        if mode not in OVERFLOW_MODES:
+            raise ValueError(f"不支持的分片模式: {mode}")
+        self.mode = mode
+        self.max_rows = max_rows
+        self.style_registry = style_registry
+        self.progress = progress
+
+    def write(self, workbook: Workbook, worksheet: Worksheet, fill_plan: SheetFillPlan, output_path=None):
+        """
+        写入填充计划
+
+        Args:
+            workbook: 目标工作簿
+            worksheet: 模板中的目标工作表（第一个分片直接写入该表）
+            fill_plan: 填充计划
+            output_path: 主输出文件路径，workbook模式下用于生成续簿文件名
+
+        Returns:
+            list: 各分片写入的位置（工作表名称或续簿文件路径）
+        """
+        mode = self.mode
+        if mode == "workbook" and not isinstance(output_path, (str, Path)):
+            self.logger.warning("输出目标不是文件路径，无法写入独立工作簿，改为续表模式")
+            mode = "sheet"
+
+        header_rows = (fill_plan.start_row or 1) - 1
+        locations = []
+        if self.progress is not None:
+            self.progress.start_stage(f"写入 {worksheet.title}", fill_plan.row_count, fill_plan.row_count * len(fill_plan.columns))
+        previous_sheet = worksheet
+
+        for shard_index, shard in enumerate(fill_plan.iter_shards(self.max_rows), start=1):
+            if shard_index == 1:
+                shard.apply(worksheet, self.style_registry, self.progress)
+                locations.append(worksheet.title)
+                continue
+
+            if shard_index == 2:
+                self.logger.warning(f"工作表 '{worksheet.title}' 数据共 {fill_plan.row_count} 行，超过单表上限，开始分片写入")
+
+            if mode == "workbook":
+                shard_path = self.get_shard_workbook_path(output_path, worksheet.title, shard_index)
+                self.write_shard_workbook(worksheet, shard, header_rows, shard_path)
+                locations.append(str(shard_path))
+            else:
+                shard_sheet = self.create_overflow_sheet(workbook, worksheet, previous_sheet, shard_index, header_rows)
+                shard.apply(shard_sheet, self.style_registry, self.progress)
+                locations.append(shard_sheet.title)
+                previous_sheet = shard_sheet
+
+        if len(locations) > 1:
+            self.logger.info(f"工作表 '{worksheet.title}' 分片写入完成，共 {len(locations)} 个分片: {locations}")
+        return locations
+
+    def create_overflow_sheet(self, workbook: Workbook, template_sheet: Worksheet, previous_sheet: Worksheet, shard_index: int, header_rows: int):
+        """
+        在工作簿中创建续表，复制模板工作表的表头行、列宽和样式
+
+        Args:
+            workbook: 工作簿
+            template_sheet: 模板工作表
+            previous_sheet: 上一个分片所在的工作表，续表插入在其后
+            shard_index: 分片序号（从2开始）
+            header_rows: 表头行数
+
+        Returns:
+            Worksheet: 续表
+        """
+        index = workbook.sheetnames.index(previous_sheet.title) + 1
+        shard_sheet = workbook.create_sheet(f"{template_sheet.title} ({shard_index})", index)
+
+        for row in template_sheet.iter_rows(min_row=1, max_row=header_rows):
+            for cell in row:
+                target = shard_sheet.cell(row=cell.row, column=cell.column, value=cell.value)
+                if cell.has_style:
+                    target._style = copy(cell._style)
+            row_dimension = template_sheet.row_dimensions.get(row[0].row) if row else None
+            if row_dimension is not None and row_dimension.height:
+                shard_sheet.row_dimensions[row[0].row].height = row_dimension.height
+
+        for key, dimension in template_sheet.column_dimensions.items():
+            shard_sheet.column_dimensions[key].width = dimension.width
+            shard_sheet.column_dimensions[key].hidden = dimension.hidden
+            if dimension.has_style:
+                shard_sheet.column_dimensions[key]._style = copy(dimension._style)
+
+        for merged_range in template_sheet.merged_cells.ranges:
+            if merged_range.max_row <= header_rows:
+                shard_sheet.merge_cells(str(merged_range))
+
+        shard_sheet.freeze_panes = template_sheet.freeze_panes
+        self.logger.info(f"创建续表: '{shard_sheet.title}'")
+        return shard_sheet
+
+    def write_shard_workbook(self, template_sheet: Worksheet, shard: SheetFillPlan, header_rows: int, shard_path):
+        """
+        将分片流式写入独立工作簿（只写模式，写完即释放）
+
+        Args:
+            template_sheet: 模板工作表，用于复制表头和样式
+            shard: 分片填充计划
+            header_rows: 表头行数
+            shard_path: 续簿文件路径
+        """
+        shard_workbook = Workbook(write_only=True)
+        shard_sheet = shard_workbook.create_sheet(template_sheet.title)
+
+        max_col = max([template_sheet.max_column] + list(shard.columns.keys()))
+        for col in range(1, max_col + 1):
+            dimension = template_sheet.column_dimensions.get(get_column_letter(col))
+            if dimension is not None and dimension.width:
+                shard_sheet.column_dimensions[get_column_letter(col)].width = dimension.width
+
+        for row in template_sheet.iter_rows(min_row=1, max_row=header_rows, max_col=max_col):
+            shard_sheet.append([self._copy_write_only_cell(shard_sheet, cell) for cell in row])
+
+        column_values = [shard.columns.get(col) for col in range(1, max_col + 1)]
+        column_formats = [shard.number_formats.get(col) for col in range(1, max_col + 1)]
+        check_interval = self.progress.check_interval if self.progress is not None else 0
+        if self.progress is not None:
+            self.progress.track_output(shard_path)
+        for offset in range(shard.row_count):
+            row_values = []
+            for values, number_format in zip(column_values, column_formats):
+                value = values[offset] if values is not None and offset < len(values) else None
+                if number_format:
+                    value = WriteOnlyCell(shard_sheet, value=value)
+                    value.number_format = number_format
+                row_values.append(value)
+            shard_sheet.append(row_values)
+            if check_interval and (offset + 1) % check_interval == 0:
+                self.progress.advance(check_interval * len(shard.columns))
+        if check_interval:
+            self.progress.advance(shard.row_count % check_interval * len(shard.columns))
+
+        shard_workbook.save(shard_path)
+        self.logger.info(f"续簿写入完成: {shard_path}（{shard.row_count} 行）")
+
+    def get_shard_workbook_path(self, output_path, sheet_title: str, shard_index: int):
+        """生成续簿文件路径，如 UPS总结单-xxx_子单号_2.xlsx"""
+        output_path = Path(output_path)
+        return output_path.with_name(f"{output_path.stem}_{sheet_title}_{shard_index}{output_path.suffix}")
+
+    def _copy_write_only_cell(self, shard_sheet, cell):
+        """复制单元格的值和样式到只写模式单元格"""
+        target = WriteOnlyCell(shard_sheet, value=cell.value)
+        if cell.has_style:
+            target.font = copy(cell.font)
+            target.border = copy(cell.border)
+            target.fill = copy(cell.fill)
+            target.number_format = cell.number_format
+            target.protection = copy(cell.protection)
+            target.alignment = copy(cell.alignment)
+        return target
@@ -0,0 +1,237 @@
+# -*- coding: utf-8 -*-
+"""
+Polars惰性查询引擎（可选）
+安装了Polars且数据行数达到阈值时，汇总统计、总结单分类计数和子单号匹配改为一个惰性查询计划执行：
+过滤条件和所需列下推到扫描阶段，多个查询共享一次扫描，由Polars多线程执行。
+
+结果与pandas路径完全一致：国家代码、邮编、数值列使用同一个规范化视图的结果，
+求和只处理整数列和定点列（整数求和与顺序无关）；遇到无法保证一致的输入（如非整数的普通数值列、
+混合类型的匹配字段）时返回None，由调用方回退到pandas路径
+"""
+import importlib.util
+import logging
+
+import numpy as np
+import pandas as pd
+
+from src.core.aggregation import FIXED_POINT_SCALES
+from src.core.normalizer import NormalizedData, INVALID_COUNTRY_CODES, INVALID_POSTCODES, canonical_postcode, from_fixed_point
+
+# 是否安装了Polars（只查找模块，不导入：导入Polars会启动其原生线程池，
+# 而forkserver服务进程预加载本模块时需保持单线程，见job_runner.get_worker_context）
+POLARS_AVAILABLE = importlib.util.find_spec("polars") is not None
+
+# Polars模块，第一次创建PolarsEngine时导入
+pl = None
+
+# 数据行数达到该值时使用Polars引擎
+DEFAULT_POLARS_ROW_THRESHOLD = 200000
+
+
+def use_polars(row_count: int, row_threshold: int = DEFAULT_POLARS_ROW_THRESHOLD):
+    """
+    判断是否使用Polars引擎
+
+    Args:
+        row_count: 数据行数
+        row_threshold: 行数阈值，None表示不使用
+
+    Returns:
+        bool: 安装了Polars且行数达到阈值时为True
+    """
+    return POLARS_AVAILABLE and row_threshold is not None and row_count >= row_threshold
+
+
+def import_polars():
+    """导入Polars（只在真正使用Polars引擎时调用）"""
+    global pl
+    if pl is None:
+        import polars
+        pl = polars
+    return pl
+
+
+class PolarsEngine:
+    """以Polars惰性查询执行汇总、分类计数和匹配"""
+
+    def __init__(self, fixed_point_scales: dict = None):
+        """
+        Args:
+            fixed_point_scales: 以定点整数汇总的列及其比例，默认为FIXED_POINT_SCALES
+        """
+        if not POLARS_AVAILABLE:
+            raise ImportError("未安装Polars")
+        import_polars()
+        self.logger = logging.getLogger(__name__)
+        self.fixed_point_scales = FIXED_POINT_SCALES if fixed_point_scales is None else fixed_point_scales
+
+    def summary_aggregates(self, normalized: NormalizedData, country_column: str, zipcode_column: str, country_code: str, count_columns: list):
+        """
+        按国家、指定国家按邮编汇总（与AggregationEngine.run的结果一致）
+
+        Args:
+            normalized: 规范化视图
+            country_column: 国家列名
+            zipcode_column: 邮编列名
+            country_code: 按邮编汇总的国家代码
+            count_columns: 需要汇总的数值列名列表
+
+        Returns:
+            dict: "country"、"postcode"（缺少邮编列时不包含）、"totals"，无法保证结果一致时返回None
+        """
+        data = normalized.data
+        values = self._integer_columns(normalized, count_columns)
+        if values is None:
+            return None
+
+        columns = {"__country": pl.Series(self._object_list(data[country_column].astype(str)), dtype=pl.String)}
+        has_postcode = zipcode_column in data.columns
+        if has_postcode:
+            columns["__postcode"] = pl.Series(normalized.postcodes(zipcode_column).tolist(), dtype=pl.String)
+        for index, col in enumerate(count_columns):
+            columns[f"__value{index}"] = pl.Series(values[col])
+
+        value_names = [f"__value{index}" for index in range(len(count_columns))]
+        sums = [pl.col(name).sum() for name in value_names]
+        valid = (
+            pl.DataFrame(columns).lazy()
+            .with_columns(pl.col("__country").str.strip_chars().str.to_uppercase())
+            .filter(~pl.col("__country").is_in(list(INVALID_COUNTRY_CODES)))
+        )
+
+        queries = [
+            valid.group_by("__country").agg(sums).sort("__country"),
+            valid.select(sums),
+        ]
+        if has_postcode:
+            queries.append(
+                valid.filter((pl.col("__country") == country_code.upper()) & ~pl.col("__postcode").is_in(list(INVALID_POSTCODES)))
+                .group_by("__postcode").agg(sums).sort("__postcode")
+            )
+        frames = pl.collect_all(queries)
+
+        result = {"country": self._to_pandas(frames[0], "__country", country_column, value_names, count_columns)}
+        if has_postcode:
+            result["postcode"] = self._to_pandas(frames[2], "__postcode", zipcode_column, value_names, count_columns)
+        totals_row = frames[1].row(0) if frames[1].height else [0] * len(value_names)
+        result["totals"] = {col: self._restore(np.int64(total or 0), col) for col, total in zip(count_columns, totals_row)}
+        self.logger.debug(f"Polars汇总完成: {len(result['country'])} 个国家")
+        return result
+
+    def category_counts(self, normalized: NormalizedData, country_column: str, zipcode_column: str, de_postcodes: list, other_countries: list, pieces_column: str):
+        """
+        总结单分类计数：DE指定邮编、其他支持国家、other（与DPDProcessor.count_category_pieces的结果一致）
+
+        Args:
+            normalized: 规范化视图
+            country_column: 国家列名
+            zipcode_column: 邮编列名
+            de_postcodes: DE指定邮编列表
+            other_countries: 除DE外的支持国家列表
+            pieces_column: 件数列名
+
+        Returns:
+            tuple: (类别编号 -> 件数数组, 类别编号 -> 行数数组)，按类别编号排列，无法保证结果一致时返回None
+        """
+        data = normalized.data
+        values = self._integer_columns(normalized, [pieces_column])
+        if values is None:
+            return None
+
+        category_count = len(de_postcodes) + len(other_countries) + 1
+        other_category = category_count - 1
+        bucket_keys = [canonical_postcode(postcode) for postcode in de_postcodes]
+        columns = {
+            "__country": pl.Series(self._object_list(data[country_column].astype(str)), dtype=pl.String),
+            "__pieces": pl.Series(values[pieces_column]),
+        }
+        if zipcode_column in data.columns:
+            columns["__postcode"] = pl.Series(normalized.postcodes(zipcode_column).tolist(), dtype=pl.String)
+            de_category = pl.col("__postcode").replace_strict(bucket_keys, list(range(len(bucket_keys))), default=other_category, return_dtype=pl.Int64)
+        else:
+            de_category = pl.lit(other_category, dtype=pl.Int64)
+
+        country = pl.col("__country").str.strip_chars().str.to_uppercase()
+        category = (
+            pl.when(country == "DE").then(de_category)
+            .otherwise(country.replace_strict(other_countries, list(range(len(de_postcodes), other_category)), default=other_category, return_dtype=pl.Int64))
+            .fill_null(other_category)
+        )
+        counts = (
+            pl.DataFrame(columns).lazy()
+            .select(category.alias("__category"), pl.col("__pieces"))
+            .group_by("__category").agg(pl.col("__pieces").sum(), pl.len().alias("__rows"))
+            .collect()
+        )
+
+        pieces = np.zeros(category_count, dtype=np.int64)
+        rows = np.zeros(category_count, dtype=np.int64)
+        categories = counts["__category"].to_numpy()
+        pieces[categories] = counts["__pieces"].to_numpy()
+        rows[categories] = counts["__rows"].to_numpy()
+        return pieces, rows
+
+    def match_first_rows(self, keys: pd.Series, lookup_values):
+        """
+        按字段值匹配第一行（与DPDProcessor.match_first_rows的结果一致）
+
+        Args:
+            keys: 被查找的字段
+            lookup_values: 需要查找的值序列
+
+        Returns:
+            tuple: (行位置数组（未匹配为-1）, 重复出现的字段值列表)，字段类型不一致时返回None
+        """
+        try:
+            source_keys = pl.Series(self._object_list(keys), strict=True)
+            lookup_keys = pl.Series(self._object_list(lookup_values), strict=True)
+        except (TypeError, ValueError, pl.exceptions.PolarsError):
+            return None
+        if source_keys.dtype != lookup_keys.dtype and lookup_keys.dtype != pl.Null and source_keys.dtype != pl.Null:
+            return None
+        if source_keys.dtype == pl.Null or lookup_keys.dtype == pl.Null:
+            return np.full(len(lookup_keys), -1, dtype=np.int64), []
+
+        source = (
+            pl.DataFrame({"__key": source_keys}).lazy()
+            .with_row_index("__position")
+            .filter(pl.col("__key").is_not_null())
+            .with_columns(pl.int_range(pl.len()).over("__key").alias("__occurrence"))
+        )
+        first_rows = source.filter(pl.col("__occurrence") == 0).select("__key", "__position")
+        lookup = pl.DataFrame({"__key": lookup_keys}).lazy().with_row_index("__order")
+        matched, duplicated = pl.collect_all([
+            lookup.join(first_rows, on="__key", how="left").sort("__order").select(pl.col("__position").cast(pl.Int64).fill_null(-1)),
+            source.filter(pl.col("__occurrence") == 1).sort("__position").select("__key"),
+        ])
+        return matched["__position"].to_numpy(), duplicated["__key"].to_list()
+
+    def _object_list(self, values):
+        """转换为Python对象列表，空值统一为None"""
+        values = np.asarray(values, dtype=object).copy()
+        values[pd.isna(values)] = None
+        return values.tolist()
+
+    def _integer_columns(self, normalized: NormalizedData, count_columns: list):
+        """取各数值列的整数数组（定点列取定点整数），存在非整数的普通数值列时返回None"""
+        values = {}
+        for col in count_columns:
+            scale = self.fixed_point_scales.get(col)
+            array = normalized.fixed_point(col, scale) if scale else normalized.numeric(col)
+            if not np.issubdtype(array.dtype, np.integer):
+                self.logger.debug(f"列 '{col}' 不是整数列，使用pandas路径")
+                return None
+            values[col] = array
+        return values
+
+    def _to_pandas(self, frame, key_name: str, key_column: str, value_names: list, count_columns: list):
+        """将Polars汇总结果转换为与pandas路径相同的DataFrame（键为object数组，定点列换算回原单位）"""
+        result = pd.DataFrame({key_column: np.asarray(frame[key_name].to_list(), dtype=object)})
+        for name, col in zip(value_names, count_columns):
+            result[col] = self._restore(frame[name].to_numpy().astype(np.int64), col)
+        return result
+
+    def _restore(self, sums, col: str):
+        """定点列的合计换算回原单位"""
+        scale = self.fixed_point_scales.get(col)
+        return from_fixed_point(sums, scale) if scale else sums
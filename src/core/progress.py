@@ -0,0 +1,419 @@
+# -*- coding: utf-8 -*-
+"""
+处理进度与取消
+ProgressToken在读取、各工作表写入、保存三个阶段中每N行检查一次：报告当前阶段、已处理行数和预计剩余时间，
+并在其他线程请求取消时抛出ProcessingCancelled，处理函数随后删除本次写了一半的输出文件。
+进度按单元格数计算（不同工作表的列数不同），报告时换算为当前阶段的行数
+"""
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+# 默认每处理多少行检查一次取消和报告进度
+DEFAULT_CHECK_INTERVAL = 1000
+# 保存进度的估算：平均每个单元格压缩后约占的字节数
+SAVE_BYTES_PER_CELL = 5
+
+
+class ProcessingCancelled(Exception):
+    """处理被取消"""
+
+
+class ProgressInfo:
+    """一次进度报告"""
+
+    def __init__(self, stage: str, rows_done: int, rows_total: int, fraction: float, elapsed: float, eta: float = None):
+        """
+        Args:
+            stage: 当前阶段，如"读取主数据"、"写入 子单号"、"保存"
+            rows_done: 当前阶段已处理的行数
+            rows_total: 当前阶段的总行数（未知时为0）
+            fraction: 整个处理的完成比例（0~1，总工作量为估算值）
+            elapsed: 已用时间（秒）
+            eta: 预计剩余时间（秒），无法估算时为None
+        """
+        self.stage = stage
+        self.rows_done = rows_done
+        self.rows_total = rows_total
+        self.fraction = fraction
+        self.elapsed = elapsed
+        self.eta = eta
+
+    def __str__(self):
+        if self.rows_total:
+            text = f"{self.stage}: {self.rows_done}/{self.rows_total} 行"
+        else:
+            text = f"{self.stage}: {self.rows_done} 行" if self.rows_done else self.stage
+        if self.eta is not None:
+            text += f"，预计剩余 {format_seconds(self.eta)}"
+        return text
+
+
+class ProgressToken:
+    """进度与取消令牌：处理线程调用start_stage/advance，其他线程（如界面）调用cancel"""
+
+    def __init__(self, callback=None, check_interval: int = DEFAULT_CHECK_INTERVAL, report_interval: float = 0.2, cancel_event=None):
+        """
+        Args:
+            callback: 进度回调，参数为ProgressInfo，在处理线程中调用
+            check_interval: 每处理多少行检查一次取消和报告进度
+            report_interval: 两次进度回调的最小间隔（秒），阶段开始和结束时总会回调
+            cancel_event: 取消事件，默认新建threading.Event；在子进程中处理时传入multiprocessing的Event，由主进程取消
+        """
+        self.logger = logging.getLogger(__name__)
+        self.callback = callback
+        self.check_interval = max(1, int(check_interval))
+        self.report_interval = report_interval
+
+        self._cancel_event = cancel_event if cancel_event is not None else threading.Event()
+        self._start = time.monotonic()
+        self._last_report = 0.0
+        self._lock = threading.RLock()
+        # 子令牌的上级令牌和名称（阶段名称的前缀），见child
+        self._parent = None
+        self._name = ""
+        # 整个处理的已完成/估算总工作量（单元格数）
+        self._done = 0
+        self._total = 0
+        # 当前阶段
+        self._stage = ""
+        self._stage_rows = 0
+        self._stage_units = 0
+        self._stage_done = 0
+        # 本次处理写出的文件，取消时删除
+        self._outputs = []
+
+    def child(self, name: str, expected: int = 0):
+        """
+        创建子令牌：多个处理并发执行时各用一个子令牌，进度（工作量）汇总到本令牌，
+        取消任一令牌时全部取消，输出文件登记在本令牌中
+
+        Args:
+            name: 子令牌名称，作为阶段名称的前缀，如"UPS"
+            expected: 子处理的剩余工作量估算（单元格数）
+
+        Returns:
+            ProgressToken: 子令牌
+        """
+        token = ProgressToken(self.callback, self.check_interval, self.report_interval)
+        token._parent = self
+        token._name = f"{self._name} {name}".strip()
+        token._cancel_event = self._cancel_event
+        token._start = self._start
+        token.estimate_remaining(expected)
+        return token
+
+    def _root(self):
+        token = self
+        while token._parent is not None:
+            token = token._parent
+        return token
+
+    def _update(self, done: int = 0, total: int = 0):
+        """累加已完成和估算的总工作量，并同步到上级令牌"""
+        with self._lock:
+            self._done += done
+            self._total = max(self._total + total, self._done)
+        if self._parent is not None:
+            self._parent._update(done, total)
+
+    def cancel(self):
+        """请求取消（任意线程调用，处理线程在下一次检查时停止）"""
+        if not self._cancel_event.is_set():
+            self.logger.info("已请求取消处理")
+        self._cancel_event.set()
+
+    @property
+    def cancelled(self):
+        """是否已请求取消"""
+        return self._cancel_event.is_set()
+
+    def check(self):
+        """已请求取消时抛出ProcessingCancelled"""
+        if self._cancel_event.is_set():
+            raise ProcessingCancelled("处理已取消")
+
+    def estimate_remaining(self, units: int):
+        """按剩余工作量（单元格数）修正整个处理的估算总工作量，如填充数据计算完成后"""
+        with self._lock:
+            delta = self._done + max(0, int(units)) - self._total
+        self._update(total=delta)
+
+    def start_stage(self, stage: str, rows: int = 0, units: int = None, expected: int = None):
+        """
+        开始一个阶段
+
+        Args:
+            stage: 阶段名称
+            rows: 阶段的总行数（未知时为0）
+            units: 阶段的工作量（单元格数），默认等于行数
+            expected: 包括本阶段在内的剩余工作量估算（如读取主数据时估算后续写入和保存），默认为本阶段的工作量
+        """
+        self.check()
+        with self._lock:
+            self._stage = stage
+            self._stage_rows = max(0, int(rows or 0))
+            self._stage_units = max(0, int(self._stage_rows if units is None else units))
+            self._stage_done = 0
+            delta = max(0, self._done + max(self._stage_units, int(expected or 0)) - self._total)
+        self._update(total=delta)
+        self.report(force=True)
+
+    def advance(self, units: int = 1):
+        """记录完成的工作量（单元格数），检查取消，到达报告间隔时回调进度"""
+        if units:
+            with self._lock:
+                self._stage_done += units
+            self._update(done=units)
+        self.check()
+        if self.callback is not None:
+            self.report()
+
+    def finish(self, stage: str = "完成"):
+        """整个处理完成"""
+        with self._lock:
+            self._stage = stage
+            self._stage_rows = self._stage_units = self._stage_done = 0
+            delta = self._done - self._total
+        self._update(total=delta)
+        self.report(force=True)
+
+    def snapshot(self):
+        """
+        当前进度（子令牌的阶段为本令牌的阶段，完成比例和预计剩余时间为整个处理的）
+
+        Returns:
+            ProgressInfo: 进度信息
+        """
+        root = self._root()
+        elapsed = time.monotonic() - root._start
+        with self._lock:
+            stage = f"{self._name} {self._stage}".strip()
+            stage_rows, stage_units, stage_done = self._stage_rows, self._stage_units, self._stage_done
+        with root._lock:
+            done, total = root._done, root._total
+        if stage_units:
+            rows_done = min(stage_rows, round(stage_done * stage_rows / stage_units))
+        else:
+            rows_done = stage_done if not stage_rows else 0
+        fraction = min(1.0, done / total) if total else 0.0
+        eta = elapsed * (total - done) / done if done and total else None
+        return ProgressInfo(stage, rows_done, stage_rows, fraction, elapsed, eta)
+
+    def report(self, force: bool = False):
+        """回调当前进度（force为False时受report_interval限制，子令牌与上级令牌共用间隔）"""
+        if self.callback is None:
+            return
+        root = self._root()
+        now = time.monotonic()
+        with root._lock:
+            if not force and now - root._last_report < self.report_interval:
+                return
+            root._last_report = now
+        try:
+            self.callback(self.snapshot())
+        except Exception as e:
+            self.logger.error(f"进度回调出错: {str(e)}")
+
+    def relay(self, info: ProgressInfo):
+        """转发其他进程报告的进度（如子进程中处理时），直接回调"""
+        if self.callback is None:
+            return
+        try:
+            self.callback(info)
+        except Exception as e:
+            self.logger.error(f"进度回调出错: {str(e)}")
+
+    def track_output(self, path):
+        """登记本次处理写出的文件（文件路径），取消时由discard_outputs删除"""
+        root = self._root()
+        with root._lock:
+            if isinstance(path, (str, Path)) and str(path) not in root._outputs:
+                root._outputs.append(str(path))
+
+    def discard_outputs(self):
+        """
+        删除已登记的输出文件（取消后调用）
+
+        Returns:
+            list: 已删除的文件路径
+        """
+        root = self._root()
+        with root._lock:
+            outputs, root._outputs = root._outputs, []
+        removed = []
+        for path in outputs:
+            try:
+                if Path(path).exists():
+                    Path(path).unlink()
+                    removed.append(path)
+                    self.logger.info(f"已删除未完成的输出文件: {path}")
+            except OSError as e:
+                self.logger.error(f"删除未完成的输出文件时出错: {str(e)}")
+        return removed
+
+
+def format_seconds(seconds: float):
+    """将秒数格式化为"1分05秒"、"12秒" """
+    seconds = int(round(seconds))
+    if seconds >= 60:
+        return f"{seconds // 60}分{seconds % 60:02d}秒"
+    return f"{seconds}秒"
+
+
+def track_reader(excel_file, sheet_name, progress: ProgressToken, stage: str = "读取数据", expected_passes: int = 1):
+    """
+    在pandas读取工作表时报告进度：pandas的openpyxl引擎逐行遍历只读工作表，
+    这里替换该工作表实例的iter_rows，每check_interval行调用一次progress.advance（xls等其他引擎不支持逐行报告）
+
+    Args:
+        excel_file (pd.ExcelFile): 已打开的Excel文件
+        sheet_name: 要读取的工作表名称
+        progress: 进度令牌
+        stage: 阶段名称
+        expected_passes: 按该工作表单元格数的倍数估算剩余工作量（读取主数据时包括后续的写入和保存）
+
+    Returns:
+        int: 估算的单元格数（未知时为0）
+    """
+    book = getattr(excel_file, "book", None)
+    sheet = book[sheet_name] if book is not None and hasattr(book, "sheetnames") else None
+    if sheet is None or not hasattr(sheet, "iter_rows"):
+        progress.start_stage(stage)
+        return 0
+
+    rows = sheet.max_row or 0
+    columns = sheet.max_column or 0
+    progress.start_stage(stage, rows, rows * columns, rows * columns * expected_passes)
+
+    iter_rows = sheet.iter_rows
+    interval = progress.check_interval
+
+    def iter_rows_with_progress(*args, **kwargs):
+        count = 0
+        cells = 0
+        for row in iter_rows(*args, **kwargs):
+            yield row
+            count += 1
+            cells += len(row)
+            if count % interval == 0:
+                progress.advance(cells)
+                cells = 0
+        progress.advance(cells)
+
+    sheet.iter_rows = iter_rows_with_progress
+    return rows * columns
+
+
+class _ProgressStream:
+    """
+    包装保存工作簿时写入的二进制流：openpyxl通过公开的Workbook.save将压缩后的数据逐块写入该流，
+    每写入一块检查取消，并按估算的每个单元格压缩后的字节数换算为已保存的单元格数报告进度
+    """
+
+    def __init__(self, stream, progress: ProgressToken, units: int):
+        self._stream = stream
+        self.progress = progress
+        self._units = units
+        self._done = 0
+        self._bytes = 0
+
+    def write(self, data):
+        if self._stream is None:
+            return len(data)
+        written = self._stream.write(data)
+        self._bytes += len(data)
+        units = min(self._units, self._bytes // SAVE_BYTES_PER_CELL) - self._done
+        self._done += units
+        self.progress.advance(units)
+        return written
+
+    def discard(self):
+        """保存中途出错或被取消后调用：openpyxl未关闭的压缩包被回收时不再写入已关闭的文件"""
+        self._stream = None
+
+    def seek(self, *args):
+        return self._stream.seek(*args) if self._stream is not None else 0
+
+    def tell(self):
+        return self._stream.tell() if self._stream is not None else 0
+
+    def flush(self):
+        if self._stream is not None:
+            self._stream.flush()
+
+    def finish(self):
+        """保存完成，报告估算时尚未计入的单元格数"""
+        self.progress.advance(self._units - self._done)
+        self._done = self._units
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+def save_workbook(workbook, output_path, progress: ProgressToken = None, stage: str = "保存"):
+    """
+    保存工作簿，提供进度令牌时报告进度并检查取消（取消时关闭并删除写了一半的文件）。
+    只使用公开的Workbook.save（写入包装后的文件流），不依赖openpyxl内部的写出类
+
+    Args:
+        workbook: 要保存的工作簿
+        output_path (str|file-like): 输出文件路径或可写的二进制流
+        progress: 进度令牌，None时等同于workbook.save
+        stage: 阶段名称
+    """
+    if progress is None:
+        workbook.save(output_path)
+        return
+
+    worksheets = workbook.worksheets
+    units = sum(len(getattr(ws, "_cells", ())) for ws in worksheets)
+    progress.start_stage(stage, sum(ws.max_row for ws in worksheets), units)
+    if isinstance(output_path, (str, Path)):
+        progress.track_output(output_path)
+        with open(output_path, "wb") as file:
+            _save_with_progress(workbook, _ProgressStream(file, progress, units))
+    else:
+        _save_with_progress(workbook, _ProgressStream(output_path, progress, units))
+
+
+def _save_with_progress(workbook, stream: _ProgressStream):
+    try:
+        workbook.save(stream)
+    except BaseException:
+        stream.discard()
+        raise
+    stream.finish()
+
+
+@contextmanager
+def replace_when_done(output_path):
+    """
+    在输出文件同目录的临时文件中写入，全部写完后用os.replace替换输出文件（同一文件系统内的替换是原子的），
+    写入中途出错或进程被终止时原有的输出文件保持不变（如追加模式覆盖上一次的输出文件）
+
+    Args:
+        output_path (str|Path|file-like): 输出文件路径，为二进制流时直接写入该流
+
+    Yields:
+        str|file-like: 实际写入的临时文件路径（或传入的流）
+    """
+    if not isinstance(output_path, (str, Path)):
+        yield output_path
+        return
+    output_path = Path(output_path)
+    # 由写入方创建临时文件（权限与直接写入输出文件时相同）
+    temp_path = str(output_path.with_name(f".{output_path.stem}-{uuid.uuid4().hex[:8]}.tmp{output_path.suffix}"))
+    try:
+        yield temp_path
+        os.replace(temp_path, output_path)
+    except BaseException:
+        try:
+            os.unlink(temp_path)
+        except OSError:
+            pass
+        raise
@@ -0,0 +1,181 @@
+# -*- coding: utf-8 -*-
+"""
+共享字符串表优化
+openpyxl保存时所有字符串均以内联字符串（inlineStr）写出。对于国家代码、渠道等重复度高的列，
+改为写入共享字符串表（sharedStrings.xml）可以显著减小文件体积；而运单号、客户单号等
+几乎每行唯一的列保持内联，避免共享字符串表膨胀。
+列的取舍依据填充计划构建时估算的基数（见SheetFillPlan.cardinality）
+"""
+import logging
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import xml.etree.ElementTree as ET
+from pathlib import Path
+from posixpath import join as posix_join, normpath as posix_normpath
+
+from openpyxl.utils import get_column_letter
+
+from src.core.fill_plan import SheetFillPlan
+
+# 基数比例（不同值数量/值数量）不超过该值的字符串列写入共享字符串表
+DEFAULT_MAX_CARDINALITY_RATIO = 0.05
+
+SHEET_MAIN_NS = "http://schemas.openxmlformats.org/spreadsheetml/2006/main"
+RELATIONSHIP_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+PACKAGE_RELATIONSHIP_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+SHARED_STRINGS_PART = "xl/sharedStrings.xml"
+SHARED_STRINGS_CONTENT_TYPE = "application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml"
+SHARED_STRINGS_RELATIONSHIP_TYPE = RELATIONSHIP_NS + "/sharedStrings"
+
+# openpyxl写出的内联字符串单元格，如 <c r="F2" s="3" t="inlineStr"><is><t>DE</t></is></c>
+INLINE_STRING_CELL = re.compile(
+    r'<c r="([A-Z]+)(\d+)"((?: s="\d+")?) t="inlineStr"><is>(<t[^>]*/>|<t[^>]*>[^<]*</t>)</is></c>'
+)
+
+
+class SharedStringsOptimizer:
+    """将低基数字符串列从内联字符串改写到共享字符串表"""
+
+    def __init__(self, max_ratio: float = DEFAULT_MAX_CARDINALITY_RATIO):
+        """
+        Args:
+            max_ratio: 基数比例阈值，不超过该值的字符串列写入共享字符串表
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_ratio = max_ratio
+        # 工作表名称 -> 写入共享字符串表的列字母集合
+        self.sheet_columns = {}
+
+    def register(self, workbook, locations: list, fill_plan: SheetFillPlan):
+        """
+        登记填充计划中的低基数列
+
+        Args:
+            workbook: 目标工作簿
+            locations: SheetOverflowWriter.write返回的分片位置（只处理同一工作簿内的工作表）
+            fill_plan: 填充计划
+        """
+        columns = {get_column_letter(col_num) for col_num in fill_plan.get_low_cardinality_columns(self.max_ratio)}
+        if not columns:
+            return
+        for location in locations:
+            if location in workbook.sheetnames:
+                self.sheet_columns.setdefault(location, set()).update(columns)
+                self.logger.debug(f"工作表 '{location}' 写入共享字符串表的列: {sorted(columns)}")
+
+    def optimize(self, output_path):
+        """
+        改写已保存的工作簿，将登记列的内联字符串移入共享字符串表
+
+        Args:
+            output_path (str|file-like): 已保存的工作簿路径或可读写的二进制流
+
+        Returns:
+            bool: 是否进行了改写
+        """
+        try:
+            if not self.sheet_columns:
+                return False
+
+            is_stream = not isinstance(output_path, (str, Path))
+            if is_stream:
+                output_path.seek(0)
+
+            with zipfile.ZipFile(output_path) as source:
+                if SHARED_STRINGS_PART in source.namelist():
+                    self.logger.warning("工作簿已包含共享字符串表，跳过共享字符串优化")
+                    return False
+
+                sheet_parts = self._get_sheet_parts(source)
+                strings = {}
+                reference_count = 0
+
+                fd, temp_path = tempfile.mkstemp(suffix=".xlsx")
+                os.close(fd)
+                try:
+                    with zipfile.ZipFile(temp_path, "w", zipfile.ZIP_DEFLATED) as target:
+                        for item in source.infolist():
+                            data = source.read(item.filename)
+                            sheet_title = sheet_parts.get(item.filename)
+                            if sheet_title in self.sheet_columns:
+                                data, count = self._rewrite_sheet(data.decode("utf-8"), self.sheet_columns[sheet_title], strings)
+                                data = data.encode("utf-8")
+                                reference_count += count
+                            elif item.filename == "[Content_Types].xml":
+                                data = self._add_content_type(data.decode("utf-8")).encode("utf-8")
+                            elif item.filename == "xl/_rels/workbook.xml.rels":
+                                data = self._add_relationship(data.decode("utf-8")).encode("utf-8")
+                            target.writestr(item, data)
+                        target.writestr(SHARED_STRINGS_PART, self._build_shared_strings(strings, reference_count))
+
+                    if is_stream:
+                        output_path.seek(0)
+                        output_path.truncate()
+                        with open(temp_path, "rb") as f:
+                            shutil.copyfileobj(f, output_path)
+                    else:
+                        shutil.move(temp_path, output_path)
+                finally:
+                    if os.path.exists(temp_path):
+                        os.remove(temp_path)
+
+            self.logger.info(f"共享字符串优化完成: {len(strings)} 个不同字符串，{reference_count} 个单元格引用")
+            return True
+        except Exception as e:
+            self.logger.error(f"共享字符串优化时出错: {str(e)}")
+            return False
+
+    def _get_sheet_parts(self, source: zipfile.ZipFile):
+        """读取工作簿结构，返回 工作表XML路径 -> 工作表名称"""
+        workbook_xml = ET.fromstring(source.read("xl/workbook.xml"))
+        rels_xml = ET.fromstring(source.read("xl/_rels/workbook.xml.rels"))
+        targets = {rel.get("Id"): rel.get("Target") for rel in rels_xml.iter(f"{{{PACKAGE_RELATIONSHIP_NS}}}Relationship")}
+
+        sheet_parts = {}
+        for sheet in workbook_xml.iter(f"{{{SHEET_MAIN_NS}}}sheet"):
+            target = targets.get(sheet.get(f"{{{RELATIONSHIP_NS}}}id"))
+            if target is None:
+                continue
+            part = target.lstrip("/") if target.startswith("/") else posix_normpath(posix_join("xl", target))
+            sheet_parts[part] = sheet.get("name")
+        return sheet_parts
+
+    def _rewrite_sheet(self, sheet_xml: str, columns: set, strings: dict):
+        """将指定列的内联字符串单元格改写为共享字符串引用"""
+        count = 0
+
+        def replace(match):
+            nonlocal count
+            column, row, style, text = match.groups()
+            if column not in columns:
+                return match.group(0)
+            index = strings.setdefault(text, len(strings))
+            count += 1
+            return f'<c r="{column}{row}"{style} t="s"><v>{index}</v></c>'
+
+        return INLINE_STRING_CELL.sub(replace, sheet_xml), count
+
+    def _build_shared_strings(self, strings: dict, reference_count: int):
+        """生成sharedStrings.xml（字符串保持写出时的转义形式）"""
+        items = "".join(f"<si>{text}</si>" for text in strings)
+        return (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+            f'<sst xmlns="{SHEET_MAIN_NS}" count="{reference_count}" uniqueCount="{len(strings)}">{items}</sst>'
+        )
+
+    def _add_content_type(self, content_types_xml: str):
+        """在[Content_Types].xml中登记共享字符串表"""
+        override = f'<Override PartName="/{SHARED_STRINGS_PART}" ContentType="{SHARED_STRINGS_CONTENT_TYPE}"/>'
+        return content_types_xml.replace("</Types>", f"{override}</Types>")
+
+    def _add_relationship(self, rels_xml: str):
+        """在workbook.xml.rels中添加共享字符串表的关系"""
+        existing_ids = set(re.findall(r'Id="([^"]+)"', rels_xml))
+        index = len(existing_ids) + 1
+        while f"rId{index}" in existing_ids:
+            index += 1
+        relationship = f'<Relationship Id="rId{index}" Type="{SHARED_STRINGS_RELATIONSHIP_TYPE}" Target="sharedStrings.xml"/>'
+        return rels_xml.replace("</Relationships>", f"{relationship}</Relationships>")
@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+"""
+工作簿样式缓存
+样式（字体、对齐、数字格式）在每个工作簿中只注册一次，写入单元格时直接引用缓存的样式ID，
+避免为每个单元格创建新的样式对象
+"""
+import logging
+from copy import copy
+
+from openpyxl.cell import Cell
+from openpyxl.utils import get_column_letter
+from openpyxl.workbook import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+# 文本格式
+TEXT_FORMAT = "@"
+
+
+class StyleRegistry:
+    """工作簿级别的样式缓存"""
+
+    def __init__(self, workbook: Workbook):
+        self.logger = logging.getLogger(__name__)
+        self.workbook = workbook
+        # (基础样式ID元组, 字体, 对齐, 数字格式) -> StyleArray
+        self._styles = {}
+        self._prototype_sheet = None
+
+    def get_style(self, base_style=None, font=None, alignment=None, number_format=None):
+        """
+        获取在基础样式上叠加字体/对齐/数字格式后的样式ID数组（每种组合只注册一次）
+
+        Args:
+            base_style: 单元格原有的StyleArray，None表示默认样式
+            font: openpyxl Font
+            alignment: openpyxl Alignment
+            number_format: 数字格式字符串，如"@"
+
+        Returns:
+            StyleArray: 缓存的样式ID数组（只读，赋值给单元格时需复制）
+        """
+        key = (tuple(base_style) if base_style is not None else None, font, alignment, number_format)
+        style = self._styles.get(key)
+        if style is None:
+            prototype = Cell(self._get_prototype_sheet())
+            if base_style is not None:
+                prototype._style = copy(base_style)
+            if font is not None:
+                prototype.font = font
+            if alignment is not None:
+                prototype.alignment = alignment
+            if number_format is not None:
+                prototype.number_format = number_format
+            style = prototype._style
+            self._styles[key] = style
+            self.logger.debug(f"注册样式: {key} -> {list(style)}")
+        return style
+
+    def apply_style(self, cell, font=None, alignment=None, number_format=None):
+        """
+        为单元格应用缓存的样式，保留单元格原有的边框、填充等样式
+
+        Args:
+            cell: 目标单元格
+            font: openpyxl Font
+            alignment: openpyxl Alignment
+            number_format: 数字格式字符串
+        """
+        base_style = cell._style if cell.has_style else None
+        cell._style = copy(self.get_style(base_style, font, alignment, number_format))
+
+    def apply_column_format(self, worksheet: Worksheet, col_num: int, number_format: str):
+        """
+        设置整列的数字格式（列级样式，Excel中新输入的单元格也会沿用）
+
+        Args:
+            worksheet: 工作表
+            col_num: 列号（从1开始）
+            number_format: 数字格式字符串
+        """
+        dimension = worksheet.column_dimensions[get_column_letter(col_num)]
+        dimension._style = copy(self.get_style(dimension._style if dimension.has_style else None, number_format=number_format))
+
+    def _get_prototype_sheet(self):
+        """用于构造原型单元格的工作表（原型单元格不会加入工作表）"""
+        if self._prototype_sheet is None:
+            self._prototype_sheet = self.workbook.worksheets[0] if self.workbook.worksheets else Worksheet(self.workbook)
+        return self._prototype_sheet
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+模板工作簿缓存
+常驻进程（如收件箱监听的工作进程）反复使用同一个模板时，首次加载后保存工作簿的序列化快照，
+之后每次反序列化得到一份独立的副本，比重新解压、解析xlsx快得多；模板文件修改后自动重新加载
+"""
+import logging
+import pickle
+import threading
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+
+class TemplateCache:
+    """按模板文件路径缓存工作簿快照"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        # 模板路径 -> (文件修改时间, 文件大小, 工作簿快照)，无法序列化的工作簿快照为None
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, template_path):
+        """
+        获取模板工作簿的独立副本（调用方可以任意修改）
+
+        Args:
+            template_path (str|Path): 模板文件路径
+
+        Returns:
+            Workbook: 工作簿，模板不存在或加载失败返回None
+        """
+        if not template_path:
+            return None
+        try:
+            path = Path(template_path)
+            stat = path.stat()
+            key = str(path.resolve())
+            signature = (stat.st_mtime_ns, stat.st_size)
+
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None and entry[:2] == signature and entry[2] is not None:
+                    self.hits += 1
+                    return self._restore(pickle.loads(entry[2]))
+                self.misses += 1
+
+            workbook = load_workbook(path)
+            try:
+                snapshot = pickle.dumps(workbook, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception as e:
+                self.logger.warning(f"模板 {path.name} 无法缓存，每次重新加载: {str(e)}")
+                snapshot = None
+            with self._lock:
+                self._entries[key] = signature + (snapshot,)
+            self.logger.info(f"模板已加载并缓存: {path}")
+            return workbook
+
+        except FileNotFoundError:
+            self.logger.error(f"模板文件不存在: {template_path}")
+            return None
+        except Exception as e:
+            self.logger.error(f"加载模板时出错: {str(e)}")
+            return None
+
+    def _restore(self, workbook):
+        """反序列化不会恢复行、列尺寸字典（DimensionHolder）的default_factory，需要重新绑定到各自的工作表"""
+        for worksheet in workbook.worksheets:
+            if hasattr(worksheet, "_add_row"):
+                worksheet.row_dimensions.default_factory = worksheet._add_row
+                worksheet.column_dimensions.default_factory = worksheet._add_column
+        return workbook
+
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._entries.clear()
+
+
+# 进程内共享的模板缓存
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_template_cache():
+    """获取进程内共享的模板缓存（每个工作进程各有一份，处理过一次后保持预热）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = TemplateCache()
+        return _cache
@@ -19,6 +19,7 @@ sys.path.insert(0, str(project_root))
 
 from config import *
 from src.core.ups_processor import UPSDataProcessor
+from src.core.style_registry import StyleRegistry
 
 class TemplateFiller:
     """模板数据填充器"""
@@ -276,13 +277,17 @@ class TemplateFiller:
             # 获取数据列名
             columns = list(data_records[0].keys()) if data_records else []
             
+            # 表头样式在工作簿中只注册一次
+            style_registry = StyleRegistry(worksheet.parent)
+            header_font = Font(bold=True)
+            header_alignment = Alignment(horizontal='center')
+
             # 填充表头（如果需要）
             for col_idx, column_name in enumerate(columns, 1):
                 cell = worksheet.cell(row=start_row-1, column=col_idx)
                 if not cell.value:  # 只在空单元格填充表头
                     cell.value = column_name
-                    cell.font = Font(bold=True)
-                    cell.alignment = Alignment(horizontal='center')
+                    style_registry.apply_style(cell, font=header_font, alignment=header_alignment)
                     
             # 填充数据
             for row_idx, record in enumerate(data_records, start_row):
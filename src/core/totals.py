@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+合计行处理
+模板中的合计行（如"Collection Total"）通常是对数据区的SUM公式。数据行数超过模板预留的行数时，
+在合计行之前插入行，并按填充计划中由汇总数组算出的列合计更新合计行：
+- "value"模式：直接写入合计值，工作簿中不再有公式时关闭打开时的全量重算
+- "formula"模式：保留公式，将SUM的区域改写为实际的数据区
+"""
+import logging
+import re
+from copy import copy
+
+from openpyxl import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.normalizer import from_fixed_point, to_fixed_point
+from src.core.overflow import EXCEL_MAX_ROWS
+
+# 支持的合计行模式
+TOTALS_MODES = ("value", "formula")
+
+# 合计行中的SUM区域，如 =SUM(B6:B52)、=SUM($C$6:$C$52)
+SUM_RANGE = re.compile(r"(SUM\(\s*\$?[A-Z]{1,3}\$?)(\d+)(\s*:\s*\$?[A-Z]{1,3}\$?)(\d+)(\s*\))", re.IGNORECASE)
+
+
+class TotalsWriter:
+    """为数据区预留行，并更新合计行"""
+
+    def __init__(self, mode: str = "value", max_rows: int = EXCEL_MAX_ROWS):
+        """
+        Args:
+            mode: 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+            max_rows: 单个工作表允许的最大行号
+        """
+        self.logger = logging.getLogger(__name__)
+        if mode is not None and mode not in TOTALS_MODES:
+            raise ValueError(f"不支持的合计行模式: {mode}")
+        self.mode = mode
+        self.max_rows = max_rows
+
+    def reserve_rows(self, worksheet: Worksheet, start_row: int, row_count: int, total_row: int):
+        """
+        数据区行数不够时，在合计行之前插入行（沿用数据区最后一行的样式）
+
+        Args:
+            worksheet: 目标工作表
+            start_row: 数据起始行
+            row_count: 数据行数
+            total_row: 合计行行号，None表示没有合计行
+
+        Returns:
+            int: 插入行之后的合计行行号，没有合计行或数据超过单表上限时返回None
+        """
+        if total_row is None or start_row is None or total_row < start_row:
+            return None
+
+        extra_rows = start_row + row_count - total_row
+        if extra_rows <= 0:
+            return total_row
+
+        if worksheet.max_row + extra_rows > self.max_rows:
+            self.logger.warning(f"工作表 '{worksheet.title}' 数据超过单表上限，合计行不再更新")
+            return None
+
+        worksheet.insert_rows(total_row, extra_rows)
+        self._shift_rows_below(worksheet, total_row, extra_rows)
+        if total_row > start_row:
+            self._copy_row_style(worksheet, total_row - 1, total_row, extra_rows)
+        self.logger.info(f"工作表 '{worksheet.title}' 在第{total_row}行之前插入 {extra_rows} 行，合计行移至第{total_row + extra_rows}行")
+        return total_row + extra_rows
+
+    def write_totals(self, worksheet: Worksheet, fill_plan: SheetFillPlan, total_row: int, accumulate: bool = False):
+        """
+        更新合计行
+
+        Args:
+            worksheet: 目标工作表
+            fill_plan: 已写入的填充计划（totals中为各列合计）
+            total_row: reserve_rows返回的合计行行号
+            accumulate: 填充计划只包含追加的数据时为True，合计值累加到合计行已有的数值上（按定点整数相加）；
+                为False时填充计划包含整张表的数据，合计值覆盖合计行已有的内容
+        """
+        if self.mode is None or total_row is None:
+            return
+
+        written = rewritten = 0
+        for cell in worksheet[total_row]:
+            value = cell.value
+            is_formula = isinstance(value, str) and value.startswith("=")
+            total = fill_plan.totals.get(cell.column)
+
+            if self.mode == "value" and total is not None:
+                if not accumulate or value is None:
+                    cell.value = total
+                    written += 1
+                    continue
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    cell.value = self.add_totals(value, total, fill_plan.total_scales.get(cell.column))
+                    written += 1
+                    continue
+
+            if is_formula and SUM_RANGE.search(value):
+                cell.value = self.rewrite_sum_ranges(value, total_row)
+                rewritten += 1
+
+        self.logger.info(f"工作表 '{worksheet.title}' 合计行（第{total_row}行）更新完成: 写入 {written} 个合计值，改写 {rewritten} 个公式")
+
+    @staticmethod
+    def add_totals(value, total, scale: int = None):
+        """
+        累加合计值，有定点比例时按定点整数相加，避免浮点误差（如 774.7099999999999）
+
+        Args:
+            value: 合计行已有的数值
+            total: 追加数据的合计
+            scale: 定点比例，None表示直接相加
+
+        Returns:
+            int|float: 累加后的合计
+        """
+        if not scale:
+            return value + total
+        return from_fixed_point(to_fixed_point([value, total], scale).sum(), scale).item()
+
+    def rewrite_sum_ranges(self, formula: str, total_row: int):
+        """将公式中SUM区域的结束行改为合计行的上一行（起始行保持模板中的位置）"""
+        def replace(match):
+            start_row = int(match.group(2))
+            if start_row >= total_row:
+                return match.group(0)
+            return f"{match.group(1)}{start_row}{match.group(3)}{total_row - 1}{match.group(5)}"
+
+        return SUM_RANGE.sub(replace, formula)
+
+    def finalize(self, workbook: Workbook):
+        """
+        "value"模式下工作簿中不再有公式时，关闭打开时的全量重算
+
+        Args:
+            workbook: 目标工作簿
+        """
+        if self.mode != "value":
+            return
+        if any(cell.data_type == "f" for worksheet in workbook.worksheets for cell in worksheet._cells.values()):
+            self.logger.debug("工作簿中仍有公式，保留打开时的全量重算")
+            return
+        workbook.calculation.fullCalcOnLoad = False
+        self.logger.debug("工作簿中没有公式，关闭打开时的全量重算")
+
+    def _shift_rows_below(self, worksheet: Worksheet, row: int, amount: int):
+        """insert_rows只移动单元格，合并单元格区域和行高需要一起下移"""
+        for merged_range in worksheet.merged_cells.ranges:
+            if merged_range.min_row >= row:
+                merged_range.shift(row_shift=amount)
+            elif merged_range.max_row >= row:
+                merged_range.expand(down=amount)
+
+        heights = {index: dimension.height for index, dimension in worksheet.row_dimensions.items()
+                   if index >= row and dimension.height}
+        for index in sorted(heights, reverse=True):
+            worksheet.row_dimensions[index].height = None
+        for index, height in heights.items():
+            worksheet.row_dimensions[index + amount].height = height
+
+    def _copy_row_style(self, worksheet: Worksheet, source_row: int, first_row: int, count: int):
+        """将数据区最后一行的样式复制到插入的行"""
+        styles = {cell.column: cell._style for cell in worksheet[source_row] if cell.has_style}
+        if not styles:
+            return
+        for row in range(first_row, first_row + count):
+            for col_num, style in styles.items():
+                worksheet.cell(row=row, column=col_num)._style = copy(style)
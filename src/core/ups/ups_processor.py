@@ -16,11 +16,26 @@ from collections import defaultdict
 project_root = Path(__file__).parent.parent.parent
 sys.path.insert(0, str(project_root))
 
+from src.core.aggregation import AggregationEngine, KEY_COUNTRY, KEY_POSTCODE, FIXED_POINT_SCALES, TOTAL_FIELDS, to_fixed_point, from_fixed_point
+from src.core.fill_plan import SheetFillPlan, build_fill_plans
+from src.core.normalizer import get_normalized_view
+from src.core.overflow import SheetOverflowWriter
+from src.core.polars_engine import PolarsEngine, DEFAULT_POLARS_ROW_THRESHOLD, use_polars
+from src.core.progress import ProcessingCancelled, ProgressToken
+from src.core.totals import TotalsWriter
+from src.core.validation import InputValidator
+from src.core.write_session import SheetWriteSession
+
 class UPSDataProcessor:
     """UPS数据处理器"""
 
-    def __init__(self):
+    def __init__(self, polars_row_threshold: int = DEFAULT_POLARS_ROW_THRESHOLD):
+        """
+        Args:
+            polars_row_threshold: 数据行数达到该值且安装了Polars时，汇总统计使用Polars引擎，None表示始终使用pandas
+        """
         self.logger = logging.getLogger(__name__)
+        self.polars_row_threshold = polars_row_threshold
 
         # UPS模板工作表映射关系（数据字段 -> 模板字段）
         self.sheet_mappings = {
@@ -63,8 +78,15 @@ class UPSDataProcessor:
     def get_template_workbook(self, template_path: str):
         """
         获取模板工作簿
+
+        Args:
+            template_path (str|file-like|Workbook): 模板文件路径、二进制文件对象，或已加载的工作簿（如TemplateCache提供的副本，直接使用）
         """
         try:
+            if isinstance(template_path, Workbook):
+                return template_path
+            if hasattr(template_path, "read"):
+                return load_workbook(template_path)
             if not Path(template_path).exists():
                 self.logger.error(f"模板文件不存在: {template_path}")
                 return None
@@ -79,54 +101,361 @@ class UPSDataProcessor:
             self.logger.error(f"获取模板工作簿时出错: {str(e)}")
             return None
 
-    def process_ups_data(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame, template_path: str, output_path: str):
+    def process_ups_data(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame, template_path: str, output_path: str, parallel: str = None, max_workers: int = None, overflow_mode: str = "sheet", shared_strings: bool = False, totals_mode: str = "value", validation: str = None, progress: ProgressToken = None, refresh_view: bool = True):
         """
         处理UPS数据并填充到模板中
 
         Args:
             original_file_data (pd.DataFrame): 原始文件数据
             original_detail_file_data (pd.DataFrame): 原始明细表数据
-            template_path (str): UPS模板路径
-            output_path (str): 输出文件路径
+            template_path (str|file-like): UPS模板路径或二进制文件对象
+            output_path (str|file-like): 输出文件路径或可写的二进制流
+            parallel (str, optional): 并行模式，"thread"或"process"时各工作表的填充数据并发计算，最后统一写入
+            max_workers (int, optional): 并行模式下的最大并发数
+            overflow_mode (str): 数据超过Excel单表行数上限时的分片方式，"sheet"写入续表，"workbook"写入独立工作簿
+            shared_strings (bool): 是否将低基数字符串列（如国家代码）写入共享字符串表，高基数列（如单号）保持内联
+            totals_mode (str): 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+            validation (str): 输入数据检查结果的输出方式，"sheet"写入检查工作表，"json"写入输出文件旁的JSON文件，None表示不检查
+            progress (ProgressToken, optional): 进度令牌，各工作表写入和保存时每check_interval行报告进度并检查取消，取消时删除本次写出的文件
+            refresh_view (bool): 是否重新创建原始数据的规范化视图，多个处理器共享同一份已规范化的数据时为False
 
         Returns:
-            bool: 处理结果
+            bool: 处理结果（取消时为False）
         """
         try:
             self.logger.info("开始处理UPS数据")
 
+            # 规范化视图在本次处理中只计算一次，各统计函数共享
+            get_normalized_view(original_file_data, refresh=refresh_view)
+
+            # 输入数据检查在工作线程中与加载模板同时进行
+            validation_future = InputValidator().validate_async(original_file_data, original_detail_file_data) if validation else None
+
             template_workbook = self.get_template_workbook(template_path)
+            if template_workbook is None:
+                return False
 
-            original_file_data_count = original_file_data.shape[0]
+            # 1. 定位各工作表及填充位置（操作工作簿，在当前线程执行）
+            sheet_tasks = []
 
-            # 处理总结单工作表
+            # 总结单工作表（表头位于第一个空行的上一行）
             summary_sheet, first_empty_row, collection_total_row = self.get_template_summary_sheet(template_workbook)
-            self.process_summary_sheet(template_workbook, summary_sheet, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+            if summary_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(summary_sheet, first_empty_row - 1)
+                sheet_tasks.append((summary_sheet, collection_total_row, self.build_summary_payload, (original_file_data, header_column_mapping, first_empty_row)))
 
-            # 处理运单信息工作表
+            # 运单信息工作表
             waybill_sheet, first_empty_row, collection_total_row = self.get_template_waybill_sheet(template_workbook)
-            self.process_waybill_sheet(template_workbook, waybill_sheet, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+            if waybill_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(waybill_sheet)
+                sheet_tasks.append((waybill_sheet, collection_total_row, self.build_waybill_payload, (original_file_data, header_column_mapping, first_empty_row)))
 
-            # 处理统计工作表
+            # 统计工作表
             static_sheet, first_empty_row, collection_total_row = self.get_template_static_sheet(template_workbook)
-            self.process_static_sheet(template_workbook, static_sheet, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+            if static_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(static_sheet)
+                sheet_tasks.append((static_sheet, collection_total_row, self.build_static_payload, (original_file_data, header_column_mapping, first_empty_row)))
 
-            # 处理德国邮编工作表
+            # 德国邮编工作表
             german_zipcode_sheet, first_empty_row, collection_total_row = self.get_template_german_zipcode_sheet(template_workbook)
-            self.process_german_zipcode_sheet(template_workbook, german_zipcode_sheet, original_file_data, first_empty_row, collection_total_row, original_file_data_count)
+            if german_zipcode_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(german_zipcode_sheet)
+                sheet_tasks.append((german_zipcode_sheet, collection_total_row, self.build_german_zipcode_payload, (original_file_data, header_column_mapping, first_empty_row)))
 
-            # 处理子单号工作表
-            sub_order_number_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_number_sheet(template_workbook)
-            self.process_sub_order_number_sheet(template_workbook, sub_order_number_sheet, original_detail_file_data, first_empty_row, collection_total_row, original_file_data_count)
-
-            # 使用workbook对象保存文件
-            template_workbook.save(output_path)
+            # 子单号工作表（没有单件明细表时保留模板中的空表）
+            if original_detail_file_data is None or original_detail_file_data.empty:
+                self.logger.warning("没有单件明细表数据，跳过子单号工作表")
+            else:
+                sub_order_number_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_number_sheet(template_workbook)
+                if sub_order_number_sheet is not None:
+                    header_column_mapping = self.get_header_column_mapping(sub_order_number_sheet)
+                    sheet_tasks.append((sub_order_number_sheet, collection_total_row, self.build_sub_order_number_payload, (original_detail_file_data, header_column_mapping, first_empty_row)))
+
+            # 2. 计算各工作表的填充数据（可并行）
+            if progress is not None:
+                progress.start_stage("计算填充数据")
+            fill_plans = build_fill_plans([(builder, args) for _, _, builder, args in sheet_tasks], parallel, max_workers)
+            if progress is not None:
+                # 剩余工作量：写入各工作表和保存（保存时逐个单元格写出）
+                progress.estimate_remaining(2 * sum(plan.row_count * len(plan.columns) for plan in fill_plans))
+
+            # 3. 统一写入工作簿（数据区行数不够时在合计行之前插入行，超过单表行数上限时自动分片，样式在工作簿内只注册一次）
+            write_session = SheetWriteSession(template_workbook, output_path, overflow_mode, totals_mode, shared_strings, progress)
+            for (worksheet, collection_total_row, _, _), fill_plan in zip(sheet_tasks, fill_plans):
+                write_session.write(worksheet, fill_plan, collection_total_row)
+            write_session.finalize()
+
+            validation_report = validation_future.result() if validation_future is not None else None
+            if validation_report is not None:
+                validation_report.output_to_workbook(validation, template_workbook)
+
+            # 保存文件（写入临时文件，完成后替换输出文件）
+            write_session.save()
+            # 检查结果JSON在输出文件保存之后写入，写入失败不影响输出文件
+            if validation_report is not None:
+                validation_report.output_beside(validation, output_path)
             self.logger.info(f"UPS数据处理完成，输出文件: {output_path}")
             return True
+        except ProcessingCancelled:
+            self.logger.warning("UPS数据处理已取消")
+            progress.discard_outputs()
+            return False
         except Exception as e:
             self.logger.error(f"处理UPS数据时出错: {str(e)}")
             return False
 
+    def append_ups_data(self, new_file_data: pd.DataFrame, new_detail_file_data: pd.DataFrame, previous_output_path: str, output_path: str = None, shared_strings: bool = False, totals_mode: str = "value"):
+        """
+        将新增数据追加到已生成的UPS输出文件中（增量模式）
+
+        明细类工作表（总结单、运单信息、子单号）从当前最后一个数据行之后追加新行；
+        汇总类工作表（统计、德国邮编）读取已有汇总结果后与新增数据的汇总合并，
+        新增数据不涉及的汇总表不做任何改动。明细类工作表的合计行在已有合计上累加新增数据的合计，
+        汇总类工作表的合计行按合并后的汇总结果重新写入
+
+        Args:
+            new_file_data (pd.DataFrame): 新增的主数据
+            new_detail_file_data (pd.DataFrame): 新增的明细表数据
+            previous_output_path (str|file-like): 之前生成的输出文件
+            output_path (str|file-like, optional): 输出位置，默认覆盖previous_output_path
+            shared_strings (bool): 是否将低基数字符串列写入共享字符串表
+            totals_mode (str): 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+
+        Returns:
+            bool: 处理结果
+        """
+        try:
+            self.logger.info("开始追加UPS数据")
+            output_path = output_path if output_path is not None else previous_output_path
+
+            workbook = self.get_template_workbook(previous_output_path)
+            if workbook is None:
+                return False
+
+            new_file_data_count = 0 if new_file_data is None else len(new_file_data)
+            fill_plans = []
+
+            if new_file_data_count:
+                get_normalized_view(new_file_data, refresh=True)
+
+                # 总结单、运单信息：定位当前最后一个数据行，在其后追加
+                summary_sheet, first_empty_row, collection_total_row = self.get_template_summary_sheet(workbook)
+                if summary_sheet is not None:
+                    header_row = self._find_header_row(summary_sheet, self.sheet_mappings["总结单"].values(), first_empty_row)
+                    header_column_mapping = self.get_header_column_mapping(summary_sheet, header_row)
+                    fill_plans.append((summary_sheet, self.build_summary_payload(new_file_data, header_column_mapping, first_empty_row), collection_total_row, True))
+
+                waybill_sheet, first_empty_row, collection_total_row = self.get_template_waybill_sheet(workbook)
+                if waybill_sheet is not None:
+                    header_column_mapping = self.get_header_column_mapping(waybill_sheet)
+                    fill_plans.append((waybill_sheet, self.build_waybill_payload(new_file_data, header_column_mapping, first_empty_row), collection_total_row, True))
+
+                # 统计、德国邮编：与已有汇总合并
+                static_sheet, first_empty_row, collection_total_row = self.get_template_static_sheet(workbook)
+                if static_sheet is not None:
+                    fill_plan = self.build_static_append_payload(static_sheet, new_file_data, first_empty_row)
+                    if fill_plan is not None:
+                        fill_plans.append((static_sheet, fill_plan, collection_total_row, False))
+
+                german_zipcode_sheet, first_empty_row, collection_total_row = self.get_template_german_zipcode_sheet(workbook)
+                if german_zipcode_sheet is not None:
+                    fill_plan = self.build_german_zipcode_append_payload(german_zipcode_sheet, new_file_data, first_empty_row)
+                    if fill_plan is not None:
+                        fill_plans.append((german_zipcode_sheet, fill_plan, collection_total_row, False))
+
+            # 子单号：在明细末尾追加
+            if new_detail_file_data is not None and not new_detail_file_data.empty:
+                sub_order_number_sheet, first_empty_row, collection_total_row = self.get_template_sub_order_number_sheet(workbook)
+                if sub_order_number_sheet is not None:
+                    header_column_mapping = self.get_header_column_mapping(sub_order_number_sheet)
+                    fill_plans.append((sub_order_number_sheet, self.build_sub_order_number_payload(new_detail_file_data, header_column_mapping, first_empty_row), collection_total_row, True))
+
+            write_session = SheetWriteSession(workbook, output_path, totals_mode=totals_mode, shared_strings=shared_strings)
+            for worksheet, fill_plan, collection_total_row, accumulate in fill_plans:
+                write_session.write(worksheet, fill_plan, collection_total_row, accumulate)
+            write_session.finalize()
+
+            # 通常覆盖上一次的输出文件：先写入临时文件，完成后再替换，中途出错时原文件不受影响
+            write_session.save()
+            self.logger.info(f"UPS数据追加完成，更新了 {len(fill_plans)} 个工作表，输出文件: {output_path}")
+            return True
+        except Exception as e:
+            self.logger.error(f"追加UPS数据时出错: {str(e)}")
+            return False
+
+    def process_ups_rollup(self, aggregates: dict, template_path: str, output_path: str, totals_mode: str = "value", progress: ProgressToken = None):
+        """
+        使用汇总累计库的汇总结果（如周、月汇总）填充统计、德国邮编工作表
+
+        Args:
+            aggregates (dict): AggregateStore.rollup的返回值（"country"、"postcode"汇总结果）
+            template_path (str|file-like): UPS模板路径或二进制文件对象
+            output_path (str|file-like): 输出文件路径或可写的二进制流
+            totals_mode (str): 合计行模式，"value"写入合计值，"formula"改写SUM公式的区域，None表示不改动合计行
+            progress (ProgressToken, optional): 进度令牌，写入和保存时报告进度并检查取消
+
+        Returns:
+            bool: 处理结果
+        """
+        try:
+            self.logger.info("开始生成UPS汇总表")
+
+            template_workbook = self.get_template_workbook(template_path)
+            if template_workbook is None:
+                return False
+
+            fill_plans = []
+            static_sheet, first_empty_row, collection_total_row = self.get_template_static_sheet(template_workbook)
+            if static_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(static_sheet)
+                fill_plans.append((static_sheet, self.build_static_table_payload(aggregates["country"], header_column_mapping, first_empty_row), collection_total_row))
+
+            german_zipcode_sheet, first_empty_row, collection_total_row = self.get_template_german_zipcode_sheet(template_workbook)
+            if german_zipcode_sheet is not None:
+                header_column_mapping = self.get_header_column_mapping(german_zipcode_sheet)
+                fill_plans.append((german_zipcode_sheet, self.build_german_zipcode_table_payload(aggregates["postcode"], header_column_mapping, first_empty_row), collection_total_row))
+
+            write_session = SheetWriteSession(template_workbook, output_path, totals_mode=totals_mode, progress=progress)
+            for worksheet, fill_plan, collection_total_row in fill_plans:
+                write_session.write(worksheet, fill_plan, collection_total_row)
+            write_session.finalize()
+
+            write_session.save()
+            self.logger.info(f"UPS汇总表生成完成，输出文件: {output_path}")
+            return True
+        except ProcessingCancelled:
+            self.logger.warning("UPS汇总表生成已取消")
+            progress.discard_outputs()
+            return False
+        except Exception as e:
+            self.logger.error(f"生成UPS汇总表时出错: {str(e)}")
+            return False
+
+    def build_static_append_payload(self, static_sheet: Worksheet, new_file_data: pd.DataFrame, first_empty_row: int):
+        """
+        将新增数据的国家汇总与统计工作表中已有的汇总合并
+
+        Args:
+            static_sheet: 已填充的统计工作表
+            new_file_data: 新增的主数据
+            first_empty_row: 已有汇总之后的第一个空行
+
+        Returns:
+            SheetFillPlan: 覆盖整张汇总表的填充计划，新增数据没有有效国家时返回None
+        """
+        count_columns = ["件数", "收货实重", "收货材积重"]
+        new_stats = self.static_country_count(new_file_data, "国家二字码", count_columns)
+        if new_stats.empty:
+            self.logger.info("新增数据没有有效国家，统计工作表保持不变")
+            return None
+
+        field_mappings = self.sheet_mappings["统计"]
+        header_row = self._find_header_row(static_sheet, field_mappings.values(), first_empty_row)
+        header_column_mapping = self.get_header_column_mapping(static_sheet, header_row)
+        existing_stats = self._read_sheet_table(static_sheet, field_mappings, header_column_mapping, header_row + 1, first_empty_row - 1)
+
+        merged_stats = self._merge_aggregates(existing_stats, new_stats, "国家二字码", count_columns)
+
+        fill_plan = SheetFillPlan("统计", header_row + 1)
+        fill_plan.add_mapped_columns(merged_stats, field_mappings, header_column_mapping, total_fields=TOTAL_FIELDS)
+        self.logger.info(f"统计汇总合并完成: 原有 {len(existing_stats)} 个国家，合并后 {len(merged_stats)} 个国家")
+        return fill_plan
+
+    def build_german_zipcode_append_payload(self, german_zipcode_sheet: Worksheet, new_file_data: pd.DataFrame, first_empty_row: int):
+        """
+        将新增数据的DE邮编汇总与德国邮编工作表中已有的汇总合并
+
+        Args:
+            german_zipcode_sheet: 已填充的德国邮编工作表
+            new_file_data: 新增的主数据
+            first_empty_row: 已有汇总之后的第一个空行
+
+        Returns:
+            SheetFillPlan: 覆盖整张汇总表的填充计划，新增数据没有DE数据时返回None
+        """
+        count_columns = ["件数", "收货实重", "收货材积重"]
+        new_stats = self.german_zipcode_count(new_file_data, "收件人邮编", "国家二字码", "DE", count_columns)
+        if new_stats.empty:
+            self.logger.info("新增数据没有DE邮编数据，德国邮编工作表保持不变")
+            return None
+
+        field_mappings = self.sheet_mappings["德国邮编"]
+        header_row = self._find_header_row(german_zipcode_sheet, field_mappings.values(), first_empty_row)
+        header_column_mapping = self.get_header_column_mapping(german_zipcode_sheet, header_row)
+        existing_stats = self._read_sheet_table(german_zipcode_sheet, field_mappings, header_column_mapping, header_row + 1, first_empty_row - 1)
+        if "收件人邮编" in existing_stats.columns:
+            existing_stats["收件人邮编"] = existing_stats["收件人邮编"].astype(str).str.strip()
+
+        merged_stats = self._merge_aggregates(existing_stats, new_stats, "收件人邮编", count_columns)
+        merged_stats['country'] = "DE"
+
+        fill_plan = SheetFillPlan("德国邮编", header_row + 1)
+        fill_plan.add_mapped_columns(merged_stats, field_mappings, header_column_mapping, total_fields=TOTAL_FIELDS)
+        self.logger.info(f"德国邮编汇总合并完成: 原有 {len(existing_stats)} 个邮编，合并后 {len(merged_stats)} 个邮编")
+        return fill_plan
+
+    def _merge_aggregates(self, existing_stats: pd.DataFrame, new_stats: pd.DataFrame, key_column: str, count_columns: list):
+        """
+        合并两份按key_column分组的汇总结果，并按key排序
+        """
+        frames = [frame[[key_column] + count_columns] for frame in (existing_stats, new_stats)
+                  if not frame.empty and key_column in frame.columns]
+        combined = pd.concat(frames, ignore_index=True)
+        for col in count_columns:
+            combined[col] = pd.to_numeric(combined[col], errors='coerce').fillna(0)
+            # 重量等列以定点整数累加，避免浮点误差
+            if col in FIXED_POINT_SCALES:
+                combined[col] = to_fixed_point(combined[col], FIXED_POINT_SCALES[col])
+        merged = combined.groupby(key_column)[count_columns].sum().reset_index()
+        for col in count_columns:
+            if col in FIXED_POINT_SCALES:
+                merged[col] = from_fixed_point(merged[col], FIXED_POINT_SCALES[col])
+        return merged.sort_values(by=key_column).reset_index(drop=True)
+
+    def _read_sheet_table(self, worksheet: Worksheet, field_mappings: dict, header_column_mapping: dict, start_row: int, end_row: int):
+        """
+        按字段映射关系读取工作表中已有的数据区域
+
+        Args:
+            worksheet: 工作表
+            field_mappings: 数据字段到模板字段的映射
+            header_column_mapping: 模板表头到列号的映射
+            start_row: 数据起始行
+            end_row: 数据结束行（包含）
+
+        Returns:
+            pd.DataFrame: 以数据字段为列名的已有数据
+        """
+        columns = {}
+        for data_field, template_field in field_mappings.items():
+            col_num = header_column_mapping.get(template_field)
+            if col_num is None or end_row < start_row:
+                continue
+            columns[data_field] = [
+                row[0] for row in worksheet.iter_rows(min_row=start_row, max_row=end_row, min_col=col_num, max_col=col_num, values_only=True)
+            ]
+        return pd.DataFrame(columns)
+
+    def _find_header_row(self, worksheet: Worksheet, header_names, max_row: int):
+        """
+        在前max_row行中查找包含最多映射表头的行
+
+        Args:
+            worksheet: 工作表
+            header_names: 模板表头名称
+            max_row: 最多查找到的行号
+
+        Returns:
+            int: 表头所在行号，未找到时返回1
+        """
+        header_names = set(header_names)
+        best_row, best_hits = 1, 0
+        for row_idx, row in enumerate(worksheet.iter_rows(min_row=1, max_row=max(max_row, 1), values_only=True), start=1):
+            hits = sum(1 for value in row if value is not None and str(value).strip() in header_names)
+            if hits > best_hits:
+                best_row, best_hits = row_idx, hits
+        return best_row
+
     def process_summary_sheet(
       self, template_workbook: Workbook, summary_sheet: Worksheet, original_file_data: pd.DataFrame, first_empty_row: int, collection_total_row: int, original_file_data_count: int):
       """
@@ -147,16 +476,7 @@ class UPSDataProcessor:
           self.logger.error("获取模板工作表失败")
           return False
 
-      summary_sheet_count = summary_sheet.max_row
-
-      # 处理中间的行数是否够填充数据
-      need_fill_row_count = original_file_data_count - (summary_sheet_count - first_empty_row)
-      if need_fill_row_count > 0:
-        # 需要填充的行数
-        for i in range(need_fill_row_count):
-          summary_sheet.append(original_file_data.iloc[i+first_empty_row].to_dict())
-        # collection_total_row = summary_sheet_count + need_fill_row_count
-
+      TotalsWriter(None).reserve_rows(summary_sheet, first_empty_row, original_file_data_count, collection_total_row)
       self.fill_summary_sheet(summary_sheet, original_file_data, first_empty_row)
 
     def get_header_column_mapping(self, worksheet, header_row=1):
@@ -196,57 +516,37 @@ class UPSDataProcessor:
         填充总结单工作表
         """
         try:
-            # 获取数据字段到模板字段的映射关系
-            field_mappings = self.sheet_mappings["总结单"]
-
             # 获取模板表头到列号的映射
             header_column_mapping = self.get_header_column_mapping(summary_sheet, first_empty_row - 1)
-            self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
-
-            # 检查原始数据的列名和可用数据
-            available_columns = original_file_data.columns.tolist()
-            self.logger.info(f"原始数据可用列: {available_columns}")
-            self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
-
-            # 数据行数
-            data_row_count = len(original_file_data)
-            self.logger.info(f"需要填充 {data_row_count} 行数据")
-
-            # 逐行填充数据
-            for data_row_idx in range(data_row_count):
-                target_row = first_empty_row + data_row_idx
-                row_data = original_file_data.iloc[data_row_idx]
-
-                self.logger.debug(f"开始填充第 {data_row_idx + 1} 行数据到模板第 {target_row} 行")
-
-                # 遍历字段映射关系
-                for data_field, template_field in field_mappings.items():
-                    try:
-                        # 检查数据中是否有该字段
-                        if data_field in available_columns:
-                            # 检查模板中是否有对应的表头列
-                            if template_field in header_column_mapping:
-                                col_num = header_column_mapping[template_field]
-                                field_value = row_data[data_field]
-
-                                # 填充数据到指定位置
-                                summary_sheet.cell(row=target_row, column=col_num).value = field_value
-                                self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                            else:
-                                self.logger.warning(f"  模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
-                        else:
-                            self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
-
-                    except Exception as e:
-                        self.logger.error(f"  填充字段 '{data_field}' 时出错: {str(e)}")
-                        continue
-
-            self.logger.info(f"总结单数据填充完成，共填充 {data_row_count} 行")
+            self.build_summary_payload(original_file_data, header_column_mapping, first_empty_row).apply(summary_sheet)
 
         except Exception as e:
             self.logger.error(f"填充总结单工作表时出错: {str(e)}")
             raise
 
+    def build_summary_payload(self, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        计算总结单工作表的填充数据（不操作工作簿，可在线程/进程池中执行）
+
+        Args:
+            original_file_data: 原始数据
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 总结单填充计划
+        """
+        # 获取数据字段到模板字段的映射关系
+        field_mappings = self.sheet_mappings["总结单"]
+        self.logger.info(f"原始数据可用列: {original_file_data.columns.tolist()}")
+        self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
+
+        fill_plan = SheetFillPlan("总结单", first_empty_row)
+        fill_plan.add_mapped_columns(original_file_data, field_mappings, header_column_mapping, total_fields=TOTAL_FIELDS)
+
+        self.logger.info(f"总结单数据计算完成，共 {len(original_file_data)} 行")
+        return fill_plan
+
     def get_template_summary_sheet(self, template_workbook: Workbook):
         """
         获取模板中的总结单工作表，并找到关键位置信息
@@ -294,6 +594,7 @@ class UPSDataProcessor:
 
             # 查找"Collection Total"所在的行
             collection_total_row = self._find_collection_total_row(summary_sheet, max_row, max_col)
+            first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
             self.logger.info(f"总结单工作表分析完成:")
             self.logger.info(f"  - 工作表名称: '{summary_sheet.title}'")
@@ -324,16 +625,7 @@ class UPSDataProcessor:
           self.logger.error("获取模板工作表失败")
           return False
 
-      waybill_sheet_count = waybill_sheet.max_row
-
-      # 处理中间的行数是否够填充数据
-      need_fill_row_count = original_file_data_count - (waybill_sheet_count - first_empty_row)
-      if need_fill_row_count > 0:
-        # 需要填充的行数
-        for i in range(need_fill_row_count):
-          waybill_sheet.append(original_file_data.iloc[i+first_empty_row].to_dict())
-        collection_total_row = waybill_sheet_count + need_fill_row_count
-
+      TotalsWriter(None).reserve_rows(waybill_sheet, first_empty_row, original_file_data_count, collection_total_row)
       self.fill_waybill_sheet(waybill_sheet, original_file_data, first_empty_row)
 
     def fill_waybill_sheet(self, waybill_sheet: Worksheet, original_file_data: pd.DataFrame, first_empty_row: int):
@@ -341,57 +633,37 @@ class UPSDataProcessor:
         填充运单信息工作表
         """
         try:
-            # 获取数据字段到模板字段的映射关系
-            field_mappings = self.sheet_mappings["运单信息"]
-
             # 获取模板表头到列号的映射
             header_column_mapping = self.get_header_column_mapping(waybill_sheet)
-
-            # 检查原始数据的列名和可用数据
-            available_columns = original_file_data.columns.tolist()
-            self.logger.info(f"原始数据可用列: {available_columns}")
-            self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
-
-            # 数据行数
-            data_row_count = len(original_file_data)
-            self.logger.info(f"需要填充 {data_row_count} 行数据")
-
-            # 逐行填充数据
-            for data_row_idx in range(data_row_count):
-                target_row = first_empty_row + data_row_idx
-                row_data = original_file_data.iloc[data_row_idx]
-
-                self.logger.debug(f"开始填充第 {data_row_idx + 1} 行数据到模板第 {target_row} 行")
-
-                # 遍历字段映射关系
-                for data_field, template_field in field_mappings.items():
-                    try:
-                        # 检查数据中是否有该字段
-                        # print('data_field', data_field, 'available_columns', available_columns, '===============')
-                        if data_field in available_columns:
-                            # 检查模板中是否有对应的表头列
-                            if template_field in header_column_mapping:
-                                col_num = header_column_mapping[template_field]
-                                field_value = row_data[data_field]
-
-                                # 填充数据到指定位置
-                                waybill_sheet.cell(row=target_row, column=col_num).value = field_value
-                                self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                            else:
-                                self.logger.warning(f"  模板中未找到表头 '{template_field}'，跳过字段 '{data_field}'")
-                        else:
-                            self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
-
-                    except Exception as e:
-                        self.logger.error(f"  填充字段 '{data_field}' 时出错: {str(e)}")
-                        continue
-
-            self.logger.info(f"运单信息数据填充完成，共填充 {data_row_count} 行")
+            self.build_waybill_payload(original_file_data, header_column_mapping, first_empty_row).apply(waybill_sheet)
 
         except Exception as e:
             self.logger.error(f"填充运单信息工作表时出错: {str(e)}")
             raise
 
+    def build_waybill_payload(self, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        计算运单信息工作表的填充数据
+
+        Args:
+            original_file_data: 原始数据
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 运单信息填充计划
+        """
+        # 获取数据字段到模板字段的映射关系
+        field_mappings = self.sheet_mappings["运单信息"]
+        self.logger.info(f"原始数据可用列: {original_file_data.columns.tolist()}")
+        self.logger.info(f"模板表头到列号映射: {header_column_mapping}")
+
+        fill_plan = SheetFillPlan("运单信息", first_empty_row)
+        fill_plan.add_mapped_columns(original_file_data, field_mappings, header_column_mapping, total_fields=TOTAL_FIELDS)
+
+        self.logger.info(f"运单信息数据计算完成，共 {len(original_file_data)} 行")
+        return fill_plan
+
     def get_template_waybill_sheet(self, template_workbook: Workbook):
         """
         获取模板中的运单信息工作表
@@ -427,6 +699,7 @@ class UPSDataProcessor:
 
             first_empty_row = self._find_first_empty_row(waybill_sheet, max_row, max_col)
             collection_total_row = self._find_collection_total_row(waybill_sheet, max_row, max_col, ["合计 Total"])
+            first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
             self.logger.info(f"运单信息工作表分析完成:")
             self.logger.info(f"  - 工作表名称: '{waybill_sheet.title}'")
@@ -448,34 +721,46 @@ class UPSDataProcessor:
             return False
 
         try:
-          # 国家	件数	收货实重	收货材积重
-          static_sheet_datas = self.static_country_count(original_file_data, "国家二字码", ["件数", "收货实重", "收货材积重"])
-          print('static_sheet_datas', static_sheet_datas, '===============')
-
           header_column_mapping = self.get_header_column_mapping(static_sheet)
+          self.build_static_payload(original_file_data, header_column_mapping, first_empty_row).apply(static_sheet)
 
-          field_mappings = self.sheet_mappings["统计"]
+        except Exception as e:
+            self.logger.error(f"填充统计工作表时出错: {str(e)}")
+            raise
 
-          available_columns = static_sheet_datas.columns.tolist()
+    def build_static_payload(self, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        计算统计工作表的填充数据（按国家分组汇总）
 
-          data_row_count = len(static_sheet_datas)
-          for data_row_idx in range(data_row_count):
-              target_row = first_empty_row + data_row_idx
-              row_data = static_sheet_datas.iloc[data_row_idx]
-              for data_field, template_field in field_mappings.items():
-                  if data_field in available_columns:
-                      col_num = header_column_mapping[template_field]
-                      field_value = row_data[data_field]
-                      static_sheet.cell(row=target_row, column=col_num).value = field_value
-                      self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                  else:
-                      self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
+        Args:
+            original_file_data: 原始数据
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
 
-              self.logger.info(f"统计数据填充完成，共填充 {data_row_count} 行")
+        Returns:
+            SheetFillPlan: 统计填充计划
+        """
+        # 国家	件数	收货实重	收货材积重
+        static_sheet_datas = self.static_country_count(original_file_data, "国家二字码", ["件数", "收货实重", "收货材积重"])
+        return self.build_static_table_payload(static_sheet_datas, header_column_mapping, first_empty_row)
 
-        except Exception as e:
-            self.logger.error(f"填充统计工作表时出错: {str(e)}")
-            raise
+    def build_static_table_payload(self, static_sheet_datas: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        根据已汇总的按国家统计结果计算统计工作表的填充数据
+
+        Args:
+            static_sheet_datas: 按国家统计结果（国家二字码、件数、收货实重、收货材积重）
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 统计填充计划
+        """
+        fill_plan = SheetFillPlan("统计", first_empty_row)
+        fill_plan.add_mapped_columns(static_sheet_datas, self.sheet_mappings["统计"], header_column_mapping, total_fields=TOTAL_FIELDS)
+
+        self.logger.info(f"统计数据计算完成，共 {len(static_sheet_datas)} 行")
+        return fill_plan
 
     def get_template_static_sheet(self, template_workbook: Workbook):
         """
@@ -510,6 +795,7 @@ class UPSDataProcessor:
 
             first_empty_row = self._find_first_empty_row(static_sheet, max_row, max_col)
             collection_total_row = self._find_collection_total_row(static_sheet, max_row, max_col, ["Total"])
+            first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
             self.logger.info(f"统计工作表分析完成:")
             self.logger.info(f"  - 工作表名称: '{static_sheet.title}'")
@@ -521,6 +807,38 @@ class UPSDataProcessor:
             self.logger.error(f"获取统计工作表时出错: {str(e)}")
             return None, None, None
 
+    def compute_summary_aggregates(self, original_file_data: pd.DataFrame, country_column: str = "国家二字码", zipcode_column: str = "收件人邮编", country_code: str = "DE", count_columns: list = None):
+        """
+        一次计算各汇总工作表需要的分组统计（结果缓存在规范化视图上，统计、德国邮编工作表共用）
+
+        Args:
+            original_file_data (pd.DataFrame): 原始数据
+            country_column (str): 国家列名
+            zipcode_column (str): 邮编列名
+            country_code (str): 按邮编统计的国家代码
+            count_columns (list): 需要统计的数值列名列表
+
+        Returns:
+            dict: "country" -> 按国家统计结果，"postcode" -> 指定国家按邮编统计结果（缺少邮编列时不计算），
+                "totals" -> 有效国家代码行的各列总计
+        """
+        count_columns = [col for col in (count_columns or ["件数", "收货实重", "收货材积重"]) if col != zipcode_column]
+        normalized = get_normalized_view(original_file_data)
+
+        def compute():
+            if use_polars(len(original_file_data), self.polars_row_threshold):
+                aggregates = PolarsEngine().summary_aggregates(normalized, country_column, zipcode_column, country_code, count_columns)
+                if aggregates is not None:
+                    return aggregates
+            engine = AggregationEngine(normalized, count_columns)
+            engine.add_group_by("country", country_column, KEY_COUNTRY)
+            if zipcode_column in original_file_data.columns:
+                engine.add_group_by("postcode", zipcode_column, KEY_POSTCODE, country_column, country_code)
+            return engine.run(totals_column=country_column)
+
+        key = ("ups_summary", country_column, zipcode_column, country_code.upper(), tuple(count_columns))
+        return normalized.get_derived(key, compute)
+
     def static_country_count(self, original_file_data: pd.DataFrame, country_column: str, count_columns: list):
         """
         根据国家二字码统计件数、收货实重、收货材积重
@@ -565,55 +883,27 @@ class UPSDataProcessor:
                 self.logger.info(f"可用列: {available_columns}")
                 return pd.DataFrame()
 
-            # 3. 数据预处理 - 创建工作副本
-            work_data = original_file_data[[country_column] + count_columns].copy()
-
-            # 4. 国家代码标准化处理
-            work_data[country_column] = work_data[country_column].astype(str).str.strip().str.upper()
-
-            # 过滤掉无效的国家代码
-            before_filter_count = len(work_data)
-            work_data = work_data[
-                (work_data[country_column] != '') &
-                (work_data[country_column] != 'NAN') &
-                (work_data[country_column] != 'NONE') &
-                (work_data[country_column].notna())
-            ]
-            after_filter_count = len(work_data)
+            # 3. 使用规范化视图（国家代码去空格、转大写，数值列无法转换的值按0处理），过滤掉无效的国家代码
+            normalized = get_normalized_view(original_file_data)
+            country_codes, _ = normalized.country_codes(country_column)
+            before_filter_count = len(country_codes)
+            after_filter_count = int((country_codes >= 0).sum())
 
             if before_filter_count != after_filter_count:
                 self.logger.warning(f"过滤无效国家代码后，数据行数从 {before_filter_count} 减少到 {after_filter_count}")
 
-            # 5. 数值列类型检查和转换
-            for col in count_columns:
-                try:
-                    # 尝试转换为数值类型
-                    work_data[col] = pd.to_numeric(work_data[col], errors='coerce')
-
-                    # 检查转换后的空值数量
-                    null_count = work_data[col].isnull().sum()
-                    if null_count > 0:
-                        self.logger.warning(f"列 '{col}' 中有 {null_count} 个值无法转换为数字，将用0填充")
-                        work_data[col] = work_data[col].fillna(0)
-
-                except Exception as e:
-                    self.logger.error(f"转换列 '{col}' 为数值类型时出错: {str(e)}")
-                    work_data[col] = 0
-
-            # 6. 检查是否还有有效数据
-            if work_data.empty:
+            # 4. 检查是否还有有效数据
+            if not after_filter_count:
                 self.logger.warning("数据预处理后没有有效数据")
                 return pd.DataFrame(columns=[country_column] + count_columns)
 
-            # 7. 按国家分组统计
-            self.logger.info(f"开始分组统计，有效数据行数: {len(work_data)}")
-            static_sheet_datas = work_data.groupby(country_column)[count_columns].sum().reset_index()
+            # 5. 按国家分组统计（与德国邮编汇总共用一次计算）
+            self.logger.info(f"开始分组统计，有效数据行数: {after_filter_count}")
+            aggregates = self.compute_summary_aggregates(original_file_data, country_column=country_column, count_columns=count_columns)
+            static_sheet_datas = aggregates["country"].copy()
 
-            # 8. 结果验证和排序
+            # 6. 记录统计结果（汇总结果已按国家代码排序）
             if not static_sheet_datas.empty:
-                # 按国家代码排序
-                static_sheet_datas = static_sheet_datas.sort_values(by=country_column).reset_index(drop=True)
-
                 # 记录统计结果
                 country_count = len(static_sheet_datas)
                 self.logger.info(f"统计完成，共 {country_count} 个国家:")
@@ -643,40 +933,51 @@ class UPSDataProcessor:
             return False
 
         try:
-          # 收件人邮编	件数	收货实重	收货材积重
-          german_zipcode_sheet_datas = self.german_zipcode_count(original_file_data, "收件人邮编", "国家二字码", "DE", ["件数", "收货实重", "收货材积重"])
-          print('german_zipcode_sheet_datas', german_zipcode_sheet_datas, '===============')
-
-          # 添加一列 country
-          if not german_zipcode_sheet_datas.empty:
-              german_zipcode_sheet_datas['country'] = "DE"
-          print('german_zipcode_sheet_datas', german_zipcode_sheet_datas, '===============')
-
           header_column_mapping = self.get_header_column_mapping(german_zipcode_sheet)
+          self.build_german_zipcode_payload(original_file_data, header_column_mapping, first_empty_row).apply(german_zipcode_sheet)
 
-          field_mappings = self.sheet_mappings["德国邮编"]
-
-          available_columns = german_zipcode_sheet_datas.columns.tolist()
-          print('available_columns', available_columns, '===============')
-
-          data_row_count = len(german_zipcode_sheet_datas)
-          for data_row_idx in range(data_row_count):
-              target_row = first_empty_row + data_row_idx
-              row_data = german_zipcode_sheet_datas.iloc[data_row_idx]
-              for data_field, template_field in field_mappings.items():
-                  if data_field in available_columns:
-                      col_num = header_column_mapping[template_field]
-                      field_value = row_data[data_field]
-                      german_zipcode_sheet.cell(row=target_row, column=col_num).value = field_value
-                      self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                  else:
-                      self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
-
-              self.logger.info(f"德国邮编数据填充完成，共填充 {data_row_count} 行")
         except Exception as e:
             self.logger.error(f"填充德国邮编工作表时出错: {str(e)}")
             raise
 
+    def build_german_zipcode_payload(self, original_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        计算德国邮编工作表的填充数据（DE按邮编分组汇总）
+
+        Args:
+            original_file_data: 原始数据
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 德国邮编填充计划
+        """
+        # 收件人邮编	件数	收货实重	收货材积重
+        german_zipcode_sheet_datas = self.german_zipcode_count(original_file_data, "收件人邮编", "国家二字码", "DE", ["件数", "收货实重", "收货材积重"])
+        return self.build_german_zipcode_table_payload(german_zipcode_sheet_datas, header_column_mapping, first_empty_row)
+
+    def build_german_zipcode_table_payload(self, german_zipcode_sheet_datas: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        根据已汇总的DE按邮编统计结果计算德国邮编工作表的填充数据
+
+        Args:
+            german_zipcode_sheet_datas: 按邮编统计结果（收件人邮编、件数、收货实重、收货材积重）
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 德国邮编填充计划
+        """
+        # 添加一列 country
+        if not german_zipcode_sheet_datas.empty:
+            german_zipcode_sheet_datas = german_zipcode_sheet_datas.assign(country="DE")
+
+        fill_plan = SheetFillPlan("德国邮编", first_empty_row)
+        fill_plan.add_mapped_columns(german_zipcode_sheet_datas, self.sheet_mappings["德国邮编"], header_column_mapping, total_fields=TOTAL_FIELDS)
+
+        self.logger.info(f"德国邮编数据计算完成，共 {len(german_zipcode_sheet_datas)} 行")
+        return fill_plan
+
     def german_zipcode_count(self, original_file_data: pd.DataFrame, zipcode_column: str, country_column: str, country_code: str, count_columns: list):
         """
         根据指定国家的邮编统计件数、收货实重、收货材积重
@@ -729,73 +1030,40 @@ class UPSDataProcessor:
                 self.logger.info(f"可用列: {available_columns}")
                 return pd.DataFrame()
 
-            # 3. 数据预处理 - 创建工作副本
-            work_data = original_file_data[required_columns].copy()
-
-            # 4. 国家代码标准化并筛选指定国家
-            work_data[country_column] = work_data[country_column].astype(str).str.strip().str.upper()
+            # 3. 使用规范化视图，筛选指定国家
+            normalized = get_normalized_view(original_file_data)
             country_code_upper = country_code.upper()
+            country_mask = normalized.country_mask(country_column, country_code_upper)
 
-            # 筛选指定国家的数据
-            before_country_filter = len(work_data)
-            work_data = work_data[work_data[country_column] == country_code_upper]
-            after_country_filter = len(work_data)
+            before_country_filter = len(country_mask)
+            after_country_filter = int(country_mask.sum())
 
             self.logger.info(f"筛选{country_code_upper}国家数据后，数据行数从 {before_country_filter} 减少到 {after_country_filter}")
 
-            if work_data.empty:
+            if not after_country_filter:
                 self.logger.warning(f"没有找到国家代码为 {country_code_upper} 的数据")
                 return pd.DataFrame(columns=[zipcode_column] + count_columns)
 
-            # 5. 邮编标准化处理
-            work_data[zipcode_column] = work_data[zipcode_column].astype(str).str.strip()
-
-            # 过滤掉无效的邮编
-            before_zipcode_filter = len(work_data)
-            work_data = work_data[
-                (work_data[zipcode_column] != '') &
-                (work_data[zipcode_column] != 'NAN') &
-                (work_data[zipcode_column] != 'NONE') &
-                (work_data[zipcode_column].notna())
-            ]
-            after_zipcode_filter = len(work_data)
+            # 4. 过滤掉无效的邮编（邮编已规范化为字符串，空值为空字符串）
+            zipcode_mask = country_mask & normalized.postcode_valid_mask(zipcode_column)
+            before_zipcode_filter = after_country_filter
+            after_zipcode_filter = int(zipcode_mask.sum())
 
             if before_zipcode_filter != after_zipcode_filter:
                 self.logger.warning(f"过滤无效邮编后，数据行数从 {before_zipcode_filter} 减少到 {after_zipcode_filter}")
 
-            # 6. 数值列类型检查和转换
-            for col in count_columns:
-                try:
-                    # 除了收件人邮编，其他都尝试转换为数值类型
-                    _item_data = work_data[col]
-                    if col != zipcode_column:
-                      _item_data = pd.to_numeric(_item_data, errors='coerce')
-                      # 检查转换后的空值数量
-                      null_count = work_data[col].isnull().sum()
-                      if null_count > 0:
-                          self.logger.warning(f"列 '{col}' 中有 {null_count} 个值无法转换为数字，将用0填充")
-                          _item_data = _item_data.fillna(0)
-
-                    work_data[col] = _item_data
-
-                except Exception as e:
-                    self.logger.error(f"转换列 '{col}' 为数值类型时出错: {str(e)}")
-                    work_data[col] = 0
-
-            # 7. 检查是否还有有效数据
-            if work_data.empty:
+            # 5. 检查是否还有有效数据
+            if not after_zipcode_filter:
                 self.logger.warning("数据预处理后没有有效数据")
                 return pd.DataFrame(columns=[zipcode_column] + count_columns)
 
-            # 8. 按邮编分组统计
-            self.logger.info(f"开始按邮编分组统计，有效数据行数: {len(work_data)}")
-            zipcode_stats = work_data.groupby(zipcode_column)[count_columns].sum().reset_index()
+            # 6. 按邮编分组统计（与国家汇总共用一次计算）
+            self.logger.info(f"开始按邮编分组统计，有效数据行数: {after_zipcode_filter}")
+            aggregates = self.compute_summary_aggregates(original_file_data, country_column, zipcode_column, country_code_upper, count_columns)
+            zipcode_stats = aggregates["postcode"].copy()
 
-            # 9. 结果验证和排序
+            # 7. 记录统计结果（汇总结果已按邮编排序）
             if not zipcode_stats.empty:
-                # 按邮编排序
-                zipcode_stats = zipcode_stats.sort_values(by=zipcode_column).reset_index(drop=True)
-
                 # 记录统计结果
                 zipcode_count = len(zipcode_stats)
                 self.logger.info(f"{country_code_upper}邮编统计完成，共 {zipcode_count} 个邮编:")
@@ -849,6 +1117,7 @@ class UPSDataProcessor:
 
             first_empty_row = self._find_first_empty_row(german_zipcode_sheet, max_row, max_col)
             collection_total_row = self._find_collection_total_row(german_zipcode_sheet, max_row, max_col, ["Total"])
+            first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
 
             self.logger.info(f"德国邮编工作表分析完成:")
             self.logger.info(f"  - 工作表名称: '{german_zipcode_sheet.title}'")
@@ -869,44 +1138,36 @@ class UPSDataProcessor:
             return False
 
         try:
-          # 客户单号	子转单号
-          sub_order_number_sheet_datas = original_file_data[["客户单号", "子转单号"]].copy()
-          
-          # 将子转单号转换为文本格式
-          sub_order_number_sheet_datas['子转单号'] = sub_order_number_sheet_datas['子转单号'].astype(str)
-          
-          print('sub_order_number_sheet_datas', sub_order_number_sheet_datas, '===============')
-
           header_column_mapping = self.get_header_column_mapping(sub_order_number_sheet)
-
-          field_mappings = self.sheet_mappings["子单号"]
-
-          available_columns = sub_order_number_sheet_datas.columns.tolist()
-
-          data_row_count = len(sub_order_number_sheet_datas)
-          for data_row_idx in range(data_row_count):
-              target_row = first_empty_row + data_row_idx
-              row_data = sub_order_number_sheet_datas.iloc[data_row_idx]
-              for data_field, template_field in field_mappings.items():
-                  if data_field in available_columns:
-                      col_num = header_column_mapping[template_field]
-                      field_value = row_data[data_field]
-                      
-                      # 确保子转单号以文本格式填充
-                      if data_field == "子转单号":
-                          field_value = str(field_value)
-                      
-                      sub_order_number_sheet.cell(row=target_row, column=col_num).value = field_value
-                      self.logger.debug(f"  填充: {data_field}({field_value}) -> {template_field}(列{col_num})")
-                  else:
-                      self.logger.warning(f"  原始数据中未找到字段 '{data_field}'，跳过")
-
-              self.logger.info(f"子单号数据填充完成，共填充 {data_row_count} 行")
+          fill_plan = self.build_sub_order_number_payload(original_file_data, header_column_mapping, first_empty_row)
+          SheetOverflowWriter().write(template_workbook, sub_order_number_sheet, fill_plan)
 
         except Exception as e:
             self.logger.error(f"填充子单号工作表时出错: {str(e)}")
             raise
 
+    def build_sub_order_number_payload(self, original_detail_file_data: pd.DataFrame, header_column_mapping: dict, first_empty_row: int):
+        """
+        计算子单号工作表的填充数据
+
+        Args:
+            original_detail_file_data: 单件明细表数据
+            header_column_mapping: 模板表头到列号的映射
+            first_empty_row: 数据起始行
+
+        Returns:
+            SheetFillPlan: 子单号填充计划
+        """
+        # 客户单号	子转单号
+        sub_order_number_sheet_datas = original_detail_file_data[["客户单号", "子转单号"]]
+
+        # 子转单号整列以文本格式填充
+        fill_plan = SheetFillPlan("子单号", first_empty_row)
+        fill_plan.add_mapped_columns(sub_order_number_sheet_datas, self.sheet_mappings["子单号"], header_column_mapping, text_fields=["子转单号"])
+
+        self.logger.info(f"子单号数据计算完成，共 {len(sub_order_number_sheet_datas)} 行")
+        return fill_plan
+
     def get_template_sub_order_number_sheet(self, template_workbook: Workbook):
         """
         获取模板中的子单号工作表
@@ -942,6 +1203,7 @@ class UPSDataProcessor:
             
             first_empty_row = self._find_first_empty_row(sub_order_number_sheet, max_row, max_col)
             collection_total_row = self._find_collection_total_row(sub_order_number_sheet, max_row, max_col, ["Total"])
+            first_empty_row = self._clamp_first_empty_row(first_empty_row, collection_total_row)
             
             self.logger.info(f"子单号工作表分析完成:")
             self.logger.info(f"  - 工作表名称: '{sub_order_number_sheet.title}'")
@@ -990,6 +1252,12 @@ class UPSDataProcessor:
             self.logger.error(f"查找空行时出错: {str(e)}")
             return max_row + 1  # 返回一个安全的行号
 
+    def _clamp_first_empty_row(self, first_empty_row: int, collection_total_row: int):
+        """数据区已填满时第一个空行位于合计行之后，新数据仍从合计行之前开始填充（由合计行处理插入行）"""
+        if collection_total_row is not None and first_empty_row > collection_total_row:
+            return collection_total_row
+        return first_empty_row
+
     def _find_collection_total_row(self, worksheet: Worksheet, max_row: int, max_col: int, search_terms: list = None):
         """
         查找第一列中包含"Collection Total"的行
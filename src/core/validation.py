@@ -0,0 +1,236 @@
+# -*- coding: utf-8 -*-
+"""
+输入数据检查
+所有检查规则以向量化掩码一次计算（不逐行遍历），可在加载模板的同时在工作线程中执行，
+结果为每条规则命中的行（主数据/明细的行标签，与源文件的数据行对应），可写入工作簿的检查工作表或JSON文件
+"""
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.core.normalizer import get_normalized_view
+
+# 支持的检查结果输出方式：sheet（输出工作簿中的检查工作表）、json（输出文件旁的JSON文件）
+VALIDATION_MODES = ("sheet", "json")
+
+# 检查工作表名称
+VALIDATION_SHEET_NAME = "数据检查"
+
+# 检查工作表中每条规则最多列出的行号数量（JSON中列出全部）
+MAX_SHEET_ROWS_PER_RULE = 200
+
+# 需要为数字的列
+NUMERIC_FIELDS = ("件数", "收货实重", "收货材积重", "方数")
+
+
+class ValidationReport:
+    """检查结果：规则 -> 命中的行"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        # 规则名称 -> {"description": 说明, "source": "main"/"detail", "rows": 行标签列表（源文件第一个数据行为0）}
+        self.rules = {}
+
+    def add(self, name: str, description: str, source: str, mask: np.ndarray, index: pd.Index):
+        """
+        记录一条规则的检查结果（只记录有命中的规则）
+
+        Args:
+            name: 规则名称
+            description: 规则说明
+            source: "main"（主数据）或"detail"（明细）
+            mask: 每行是否命中
+            index: 数据的行标签（读取时删除了全空行但未重置索引，标签仍与源文件的数据行对应，行位置则不对应）
+        """
+        rows = np.asarray(index)[np.asarray(mask, dtype=bool)]
+        if len(rows):
+            self.rules[name] = {"description": description, "source": source, "rows": rows.tolist()}
+
+    @property
+    def issue_count(self):
+        """命中的行数合计"""
+        return sum(len(rule["rows"]) for rule in self.rules.values())
+
+    def to_dict(self):
+        """转换为可序列化的字典"""
+        return {"issue_count": self.issue_count, "rules": self.rules}
+
+    def log_summary(self):
+        """在日志中输出各规则的命中数量"""
+        if not self.rules:
+            self.logger.info("数据检查完成，未发现问题")
+            return
+        self.logger.warning(f"数据检查完成，{len(self.rules)} 条规则共命中 {self.issue_count} 行")
+        for name, rule in self.rules.items():
+            self.logger.warning(f"  [{rule['source']}] {rule['description']}: {len(rule['rows'])} 行")
+
+    def output_to_workbook(self, mode: str, workbook):
+        """
+        保存工作簿之前调用："sheet"方式写入检查工作表
+
+        Args:
+            mode: 输出方式（见VALIDATION_MODES）
+            workbook: 输出工作簿
+        """
+        if mode not in VALIDATION_MODES:
+            raise ValueError(f"不支持的检查结果输出方式: {mode}")
+        if mode == "sheet":
+            self.write_sheet(workbook)
+
+    def output_beside(self, mode: str, output_path):
+        """
+        保存工作簿之后调用："json"方式写入输出文件旁的JSON文件（输出目标不是文件路径时只记录日志）。
+        写入失败只记录日志，不影响已保存的输出文件
+
+        Args:
+            mode: 输出方式（见VALIDATION_MODES）
+            output_path: 输出文件路径
+
+        Returns:
+            str: 写入的JSON文件路径，未写入时为None
+        """
+        if mode != "json":
+            return None
+        if not isinstance(output_path, (str, Path)):
+            self.logger.warning("输出目标不是文件路径，检查结果只记录在日志中")
+            return None
+        try:
+            return self.write_json(get_report_json_path(output_path))
+        except (OSError, TypeError, ValueError) as e:
+            self.logger.error(f"写入数据检查结果时出错: {str(e)}")
+            return None
+
+    def write_json(self, path):
+        """
+        写入JSON文件
+
+        Args:
+            path (str|Path): 文件路径
+
+        Returns:
+            str: 文件路径
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        self.logger.info(f"数据检查结果已写入: {path}")
+        return str(path)
+
+    def write_sheet(self, workbook, sheet_name: str = VALIDATION_SHEET_NAME, max_rows: int = MAX_SHEET_ROWS_PER_RULE):
+        """
+        在工作簿末尾写入检查工作表（行号为源文件中的Excel行号，即行标签+2）
+
+        Args:
+            workbook: 目标工作簿
+            sheet_name: 工作表名称
+            max_rows: 每条规则最多列出的行号数量
+        """
+        if sheet_name in workbook.sheetnames:
+            del workbook[sheet_name]
+        worksheet = workbook.create_sheet(sheet_name)
+        worksheet.append(["规则", "说明", "数据", "行数", "源文件行号"])
+        for name, rule in self.rules.items():
+            rows = rule["rows"]
+            excel_rows = ", ".join(str(row + 2) for row in rows[:max_rows])
+            if len(rows) > max_rows:
+                excel_rows += f" ...（共{len(rows)}行）"
+            worksheet.append([name, rule["description"], "主数据" if rule["source"] == "main" else "明细", len(rows), excel_rows])
+        self.logger.info(f"数据检查结果已写入工作表 '{sheet_name}'")
+
+
+class InputValidator:
+    """输入数据检查"""
+
+    def __init__(self, country_column: str = "国家二字码", zipcode_column: str = "收件人邮编",
+                 tracking_column: str = "转单号", order_column: str = "客户单号", numeric_fields=NUMERIC_FIELDS):
+        """
+        Args:
+            country_column: 国家列名
+            zipcode_column: 邮编列名
+            tracking_column: 转单号列名（不应重复）
+            order_column: 客户单号列名（明细与主数据的匹配字段）
+            numeric_fields: 需要为数字的列
+        """
+        self.logger = logging.getLogger(__name__)
+        self.country_column = country_column
+        self.zipcode_column = zipcode_column
+        self.tracking_column = tracking_column
+        self.order_column = order_column
+        self.numeric_fields = list(numeric_fields)
+
+    def validate(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame = None):
+        """
+        执行所有检查规则
+
+        Args:
+            original_file_data: 主数据
+            original_detail_file_data: 明细数据
+
+        Returns:
+            ValidationReport: 检查结果
+        """
+        report = ValidationReport()
+        if original_file_data is not None and not original_file_data.empty:
+            self._validate_main(original_file_data, report)
+            if original_detail_file_data is not None and not original_detail_file_data.empty:
+                self._validate_detail(original_file_data, original_detail_file_data, report)
+        report.log_summary()
+        return report
+
+    def validate_async(self, original_file_data: pd.DataFrame, original_detail_file_data: pd.DataFrame = None):
+        """
+        在工作线程中执行检查（如在加载模板的同时执行）
+
+        Returns:
+            concurrent.futures.Future: 结果为ValidationReport
+        """
+        executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="validation")
+        future = executor.submit(self.validate, original_file_data, original_detail_file_data)
+        executor.shutdown(wait=False)
+        return future
+
+    def _validate_main(self, data: pd.DataFrame, report: ValidationReport):
+        """主数据检查"""
+        columns = data.columns
+        normalized = get_normalized_view(data)
+
+        if self.country_column in columns:
+            country_codes, _ = normalized.country_codes(self.country_column)
+            report.add("missing_country", f"缺少国家代码（{self.country_column}）", "main", country_codes < 0, data.index)
+
+            if self.zipcode_column in columns:
+                de_rows = normalized.country_mask(self.country_column, "DE")
+                report.add("missing_de_postcode", f"DE缺少邮编（{self.zipcode_column}）", "main",
+                           de_rows & ~normalized.postcode_valid_mask(self.zipcode_column), data.index)
+
+        for field in self.numeric_fields:
+            if field in columns:
+                values = data[field]
+                numbers = pd.to_numeric(values, errors="coerce")
+                report.add(f"missing_{field}", f"缺少{field}", "main", values.isna().to_numpy(), data.index)
+                report.add(f"non_numeric_{field}", f"{field}不是数字", "main", (numbers.isna() & values.notna()).to_numpy(), data.index)
+                report.add(f"negative_{field}", f"{field}为负数", "main", (numbers < 0).to_numpy(), data.index)
+
+        if self.tracking_column in columns:
+            tracking = data[self.tracking_column]
+            report.add("duplicate_tracking", f"{self.tracking_column}重复", "main",
+                       (tracking.duplicated(keep=False) & tracking.notna()).to_numpy(), data.index)
+
+    def _validate_detail(self, data: pd.DataFrame, detail: pd.DataFrame, report: ValidationReport):
+        """明细数据检查（与主数据的对应关系）"""
+        if self.order_column not in detail.columns:
+            return
+        orders = detail[self.order_column]
+        report.add("missing_detail_order", f"明细缺少{self.order_column}", "detail", orders.isna().to_numpy(), detail.index)
+        if self.order_column in data.columns:
+            report.add("orphan_detail_order", f"明细的{self.order_column}不在主数据中", "detail",
+                       (~orders.isin(data[self.order_column].dropna()) & orders.notna()).to_numpy(), detail.index)
+
+
+def get_report_json_path(output_path):
+    """检查结果JSON文件路径，如 UPS总结单-xxx.xlsx -> UPS总结单-xxx.validation.json"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}.validation.json")
@@ -0,0 +1,16 @@
+# -*- coding: utf-8 -*-
+"""
+forkserver服务进程的预加载模块（见job_runner.get_worker_context）
+服务进程导入本模块时导入pandas、numpy、openpyxl和处理模块，并将设置中的各模板载入模板缓存；
+工作进程由服务进程fork产生，继承已导入的模块和模板缓存，无需重新导入和解析模板即可开始处理
+"""
+import logging
+
+from config import TEMPLATE_TYPES
+from src.core.job_runner import warm_worker
+
+try:
+    warm_worker(list(TEMPLATE_TYPES))
+except Exception as e:
+    # 预加载失败不影响服务进程启动，工作进程处理时自行载入模板
+    logging.getLogger(__name__).warning(f"预加载模板失败: {str(e)}")
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+工作簿写入
+处理、追加、汇总表各路径写入工作簿的步骤相同：为数据区预留行（在合计行之前插入）、写入填充计划（超过单表行数上限时分片）、
+更新合计行、登记需要移入共享字符串表的列；全部工作表写完后统一收尾，
+保存（报告进度、检查取消，写入临时文件后替换输出文件）之后再改写共享字符串表
+"""
+from openpyxl import Workbook
+from openpyxl.worksheet.worksheet import Worksheet
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.overflow import SheetOverflowWriter
+from src.core.progress import replace_when_done, save_workbook
+from src.core.shared_strings import SharedStringsOptimizer
+from src.core.style_registry import StyleRegistry
+from src.core.totals import TotalsWriter
+
+
+class SheetWriteSession:
+    """向一个工作簿写入多个工作表的填充计划"""
+
+    def __init__(self, workbook: Workbook, output_path=None, overflow_mode: str = "sheet", totals_mode: str = "value",
+                 shared_strings: bool = False, progress=None):
+        """
+        Args:
+            workbook: 目标工作簿
+            output_path (str|file-like): 输出文件路径（"workbook"分片模式的续簿写在其旁边）
+            overflow_mode: 分片模式（见SheetOverflowWriter）
+            totals_mode: 合计行模式（见TotalsWriter）
+            shared_strings: 是否将低基数字符串列移入共享字符串表（保存后调用optimize）
+            progress (ProgressToken, optional): 进度令牌
+        """
+        self.workbook = workbook
+        self.output_path = output_path
+        self.progress = progress
+        self.overflow_writer = SheetOverflowWriter(overflow_mode, style_registry=StyleRegistry(workbook), progress=progress)
+        self.totals_writer = TotalsWriter(totals_mode)
+        self.shared_strings_optimizer = SharedStringsOptimizer() if shared_strings else None
+
+    def write(self, worksheet: Worksheet, fill_plan: SheetFillPlan, total_row: int, accumulate: bool = False):
+        """
+        写入一个工作表的填充计划
+
+        Args:
+            worksheet: 目标工作表
+            fill_plan: 填充计划
+            total_row: 合计行行号，None表示没有合计行
+            accumulate: 合计行是否在已有合计上累加（追加模式）
+        """
+        total_row = self.totals_writer.reserve_rows(worksheet, fill_plan.start_row, fill_plan.row_count, total_row)
+        locations = self.overflow_writer.write(self.workbook, worksheet, fill_plan, self.output_path)
+        self.totals_writer.write_totals(worksheet, fill_plan, total_row, accumulate)
+        if self.shared_strings_optimizer is not None:
+            self.shared_strings_optimizer.register(self.workbook, locations, fill_plan)
+
+    def finalize(self):
+        """全部工作表写完后、保存之前调用"""
+        self.totals_writer.finalize(self.workbook)
+
+    def save(self):
+        """
+        finalize之后调用：保存工作簿并改写共享字符串表。先写入输出文件同目录的临时文件，全部完成后再替换输出文件，
+        中途出错或被取消时原有的输出文件（如追加模式覆盖的上一次输出）保持不变
+        """
+        with replace_when_done(self.output_path) as temp_path:
+            save_workbook(self.workbook, temp_path, self.progress)
+            self.optimize(temp_path)
+
+    def optimize(self, saved_path):
+        """
+        保存之后调用：改写共享字符串表（未启用时不做任何事）
+
+        Args:
+            saved_path (str|file-like): 已保存的工作簿路径或二进制流
+        """
+        if self.shared_strings_optimizer is not None:
+            self.shared_strings_optimizer.optimize(saved_path)
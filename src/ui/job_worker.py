@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+"""
+界面的后台处理线程
+处理任务在后台线程中依次执行，界面线程只负责提交任务，并通过root.after定时读取事件队列更新界面，
+处理期间窗口保持响应，进度条显示当前阶段、已处理行数和预计剩余时间；处理中可以继续提交任务排队，
+也可以取消任务（通过任务的ProgressToken，处理线程在下一次检查时停止并删除写了一半的输出文件）。
+处理器为IsolatedProcessor时处理在子进程中执行，进度和取消经由它在进程间转发
+"""
+import itertools
+import logging
+import queue
+import threading
+
+from src.core.progress import DEFAULT_CHECK_INTERVAL, ProgressToken
+
+# 事件类型
+EVENT_QUEUED = "queued"
+EVENT_STARTED = "started"
+EVENT_FINISHED = "finished"
+EVENT_FAILED = "failed"
+EVENT_PROGRESS = "progress"
+EVENT_CANCELLED = "cancelled"
+
+
+class ProcessJob:
+    """界面提交的一个处理任务"""
+
+    _ids = itertools.count(1)
+
+    def __init__(self, input_file: str, template_type, detail_file: str = None):
+        """
+        Args:
+            input_file: 主数据文件路径
+            template_type: 模板类型 ("UPS" 或 "DPD")，列表时同一次读取生成各模板的输出（结果为 {模板类型: 输出文件路径}）
+            detail_file: 单件明细表文件路径
+        """
+        self.job_id = next(self._ids)
+        self.input_file = input_file
+        self.template_type = template_type
+        self.detail_file = detail_file
+        # 输出文件路径，处理失败为None
+        self.result = None
+        # 异常信息
+        self.error = None
+        # 进度令牌，由JobWorker提交时创建
+        self.progress = None
+        # 最近一次进度（ProgressInfo）
+        self.progress_info = None
+
+    @property
+    def cancelled(self):
+        """是否已取消"""
+        return self.progress is not None and self.progress.cancelled
+
+
+class JobWorker:
+    """在后台线程中依次执行处理任务，状态通过事件队列传回界面线程"""
+
+    def __init__(self, processor, check_interval: int = DEFAULT_CHECK_INTERVAL):
+        """
+        Args:
+            processor (ExcelProcessor|IsolatedProcessor): 处理器，只在后台线程中使用（IsolatedProcessor在子进程中处理）
+            check_interval: 每处理多少行报告一次进度并检查取消
+        """
+        self.logger = logging.getLogger(__name__)
+        self.processor = processor
+        self.check_interval = check_interval
+        self._jobs = queue.Queue()
+        # (事件类型, ProcessJob)
+        self._events = queue.Queue()
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._running = None
+        self._thread = threading.Thread(target=self._run, name="gui-worker", daemon=True)
+        self._thread.start()
+
+    @property
+    def pending_count(self):
+        """排队中（尚未开始）的任务数"""
+        with self._lock:
+            return self._pending
+
+    @property
+    def running_job(self):
+        """正在处理的任务，没有时为None"""
+        with self._lock:
+            return self._running
+
+    @property
+    def busy(self):
+        """是否有正在处理或排队中的任务"""
+        with self._lock:
+            return self._running is not None or self._pending > 0
+
+    def submit(self, job: ProcessJob):
+        """
+        提交任务（界面线程调用，立即返回）
+
+        Args:
+            job: 处理任务
+
+        Returns:
+            int: 提交后排队中的任务数
+        """
+        job.progress = ProgressToken(lambda info: self._on_progress(job, info), self.check_interval)
+        with self._lock:
+            self._pending += 1
+            pending = self._pending
+        self._jobs.put(job)
+        self._events.put((EVENT_QUEUED, job))
+        return pending
+
+    def poll_events(self):
+        """
+        取出所有未处理的事件（界面线程调用，不阻塞）
+
+        Returns:
+            list: (事件类型, ProcessJob) 列表
+        """
+        events = []
+        while True:
+            try:
+                events.append(self._events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def cancel(self, job: ProcessJob = None):
+        """
+        取消任务（界面线程调用，立即返回）：排队中的任务不再执行，正在处理的任务在下一次检查时停止
+
+        Args:
+            job: 要取消的任务，默认为正在处理的任务
+
+        Returns:
+            bool: 是否有任务被取消
+        """
+        job = job or self.running_job
+        if job is None or job.progress is None or job.cancelled:
+            return False
+        job.progress.cancel()
+        return True
+
+    def shutdown(self):
+        """丢弃排队中的任务并取消正在处理的任务，线程在任务停止后退出"""
+        while True:
+            try:
+                self._jobs.get_nowait()
+            except queue.Empty:
+                break
+        with self._lock:
+            self._pending = 0
+        self.cancel()
+        self._jobs.put(None)
+
+    def _on_progress(self, job: ProcessJob, info):
+        """进度回调（在处理线程中调用）"""
+        job.progress_info = info
+        self._events.put((EVENT_PROGRESS, job))
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None:
+                return
+            with self._lock:
+                self._pending -= 1
+                if job.cancelled:
+                    self._events.put((EVENT_CANCELLED, job))
+                    continue
+                self._running = job
+            self._events.put((EVENT_STARTED, job))
+            try:
+                job.result = self.processor.process_file(
+                    input_file=job.input_file,
+                    detail_file=job.detail_file,
+                    template_type=job.template_type,
+                    progress=job.progress,
+                )
+                succeeded = any(job.result.values()) if isinstance(job.result, dict) else job.result is not None
+                event = EVENT_CANCELLED if job.cancelled and not succeeded else EVENT_FINISHED
+            except Exception as e:
+                self.logger.error(f"后台处理任务时出错: {str(e)}")
+                job.error = str(e)
+                event = EVENT_FAILED
+            with self._lock:
+                self._running = None
+            self._events.put((event, job))
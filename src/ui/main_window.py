@@ -7,6 +7,7 @@ import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 import ttkbootstrap as ttk_boot
 from ttkbootstrap.constants import *
+import logging
 import os
 import sys
 from pathlib import Path
@@ -18,6 +19,8 @@ sys.path.insert(0, str(project_root))
 from config import *
 from src.ui.settings_window import SettingsWindow
 from src.core.excel_processor import ExcelProcessor
+from src.core.job_runner import IsolatedProcessor
+from src.ui.job_worker import JobWorker, ProcessJob, EVENT_QUEUED, EVENT_STARTED, EVENT_FINISHED, EVENT_PROGRESS, EVENT_CANCELLED
 
 class MainWindow:
     """主窗口类"""
@@ -37,14 +40,23 @@ class MainWindow:
         self.template_type = tk.StringVar(value="UPS")
         self.status_message = tk.StringVar(value="请选择Excel文件")
 
-        # 初始化处理器
+        # 初始化处理器（在后台线程中执行处理，界面线程定时读取处理状态）
         self.processor = ExcelProcessor()
+        # 处理在子进程中执行，界面进程只接收输出文件路径，内存占用不随处理次数增长
+        self.isolated_processor = None
+        if UI_WORKER_MAX_JOBS:
+            self.isolated_processor = IsolatedProcessor(UI_WORKER_MAX_JOBS, getattr(logging, LOG_LEVEL), LOG_FORMAT, PROGRESS_CHECK_ROWS,
+                                                        warm_templates=list(TEMPLATE_TYPES), start_method=WORKER_START_METHOD)
+        self.worker = JobWorker(self.isolated_processor or self.processor, PROGRESS_CHECK_ROWS)
 
         # 创建UI组件
         self.create_menu()
         self.create_widgets()
         self.create_layout()
 
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        self.root.after(UI_POLL_INTERVAL_MS, self.poll_worker)
+
     def center_window(self):
         """将窗口居中显示"""
         self.root.update_idletasks()
@@ -197,6 +209,15 @@ class MainWindow:
             bootstyle="success"
         )
 
+        # 同时生成UPS和DPD（只读取一次文件）
+        self.both_radio = ttk_boot.Radiobutton(
+            self.type_frame,
+            text="UPS + DPD",
+            variable=self.template_type,
+            value="UPS+DPD",
+            bootstyle="success"
+        )
+
         # 处理按钮
         self.process_btn = ttk_boot.Button(
             self.root,
@@ -217,13 +238,23 @@ class MainWindow:
             bootstyle="info"
         )
 
-        # 进度条
+        # 进度条（按整个处理的完成比例显示）
         self.progress = ttk_boot.Progressbar(
             self.status_frame,
-            mode="indeterminate",
+            mode="determinate",
+            maximum=100,
             bootstyle="success"
         )
 
+        # 取消按钮
+        self.cancel_btn = ttk_boot.Button(
+            self.status_frame,
+            text="取消",
+            command=self.cancel_job,
+            bootstyle="outline-danger",
+            width=6
+        )
+
     def create_layout(self):
         """布局UI组件"""
         # 主标题
@@ -249,6 +280,7 @@ class MainWindow:
         self.type_frame.pack(fill="x", padx=20, pady=8)
         self.ups_radio.pack(side="left", padx=20)
         self.dpd_radio.pack(side="left", padx=20)
+        self.both_radio.pack(side="left", padx=20)
 
         # 处理按钮
         self.process_btn.pack(pady=20)
@@ -321,53 +353,106 @@ class MainWindow:
             self.status_message.set("请选择Excel文件")
 
     def process_file(self):
-        """处理文件"""
+        """提交处理任务（在后台线程中执行，处理中可以继续提交，任务依次处理）"""
         if not self.selected_file.get():
             messagebox.showwarning("警告", "请先选择Excel文件")
             return
 
+        detail_file_path = self.detail_file.get() if self.detail_file.get() else None
+        template_type = self.template_type.get()
+        job = ProcessJob(
+            # 主数据文件
+            input_file=self.selected_file.get(),
+            # 模板类型（"UPS+DPD"时同一次读取生成两个输出）
+            template_type=template_type.split("+") if "+" in template_type else template_type,
+            # 明细表文件
+            detail_file=detail_file_path,
+        )
+        self.worker.submit(job)
+
+    def poll_worker(self):
+        """读取后台处理的事件并更新界面（通过root.after定时调用）"""
         try:
-            # 显示进度条
-            self.progress.pack(side="right", padx=10)
-            self.progress.start()
-            self.status_message.set("正在处理文件...")
-            self.process_btn.config(state="disabled")
-
-            # 更新界面
-            self.root.update()
-
-            # 执行处理
-            detail_file_path = self.detail_file.get() if self.detail_file.get() else None
-            result = self.processor.process_file(
-                # 主数据文件
-                input_file=self.selected_file.get(),
-                # 明细表文件
-                detail_file=detail_file_path,
-                # 模板类型
-                template_type=self.template_type.get(),
-            )
-
-            # 停止进度条
-            self.progress.stop()
-            self.progress.pack_forget()
+            for event, job in self.worker.poll_events():
+                filename = os.path.basename(job.input_file)
+                if event == EVENT_QUEUED:
+                    if self.worker.running_job is not None:
+                        self.status_message.set(f"{filename} 已加入队列，排队中 {self.worker.pending_count} 个")
+                elif event == EVENT_STARTED:
+                    # 显示进度条和取消按钮
+                    self.cancel_btn.configure(state="normal")
+                    self.cancel_btn.pack(side="right")
+                    self.progress.configure(value=0)
+                    self.progress.pack(side="right", padx=10)
+                    self.update_processing_status(filename)
+                elif event == EVENT_PROGRESS:
+                    if job is self.worker.running_job and not job.cancelled:
+                        self.progress.configure(value=job.progress_info.fraction * 100)
+                        self.update_processing_status(filename, job.progress_info)
+                elif event == EVENT_CANCELLED:
+                    self.on_job_done()
+                    self.status_message.set(f"{filename} 已取消")
+                elif event == EVENT_FINISHED and isinstance(job.result, dict):
+                    self.on_job_done()
+                    self.show_carrier_results(filename, job.result)
+                elif event == EVENT_FINISHED and job.result:
+                    self.on_job_done()
+                    self.status_message.set(f"{filename} 处理完成！文件已保存到桌面")
+                    messagebox.showinfo("成功", f"文件处理完成！\n输出文件: {job.result}")
+                elif event == EVENT_FINISHED:
+                    self.on_job_done()
+                    self.status_message.set(f"{filename} 处理失败")
+                    messagebox.showerror("错误", f"{filename} 处理失败，请检查文件格式")
+                else:
+                    self.on_job_done()
+                    self.status_message.set(f"{filename} 处理出错")
+                    messagebox.showerror("错误", f"处理文件时出错:\n{job.error}")
+        finally:
+            self.root.after(UI_POLL_INTERVAL_MS, self.poll_worker)
+
+    def show_carrier_results(self, filename, results):
+        """显示同时生成多个模板输出的结果（results: {模板类型: 输出文件路径或None}）"""
+        failed = [template_type for template_type, output_path in results.items() if not output_path]
+        outputs = "\n".join(f"{template_type}: {output_path}" for template_type, output_path in results.items() if output_path)
+        if not failed:
+            self.status_message.set(f"{filename} 处理完成！文件已保存到桌面")
+            messagebox.showinfo("成功", f"文件处理完成！\n输出文件:\n{outputs}")
+        elif outputs:
+            self.status_message.set(f"{filename} 部分处理失败: {', '.join(failed)}")
+            messagebox.showwarning("警告", f"{', '.join(failed)} 处理失败，请检查文件格式\n已生成:\n{outputs}")
+        else:
+            self.status_message.set(f"{filename} 处理失败")
+            messagebox.showerror("错误", f"{filename} 处理失败，请检查文件格式")
+
+    def update_processing_status(self, filename, progress_info=None):
+        """显示正在处理的文件、当前阶段和预计剩余时间、排队中的任务数"""
+        pending = self.worker.pending_count
+        suffix = f"（排队中 {pending} 个）" if pending else ""
+        if progress_info is None:
+            self.status_message.set(f"正在处理 {filename}...{suffix}")
+        else:
+            self.status_message.set(f"{filename} {progress_info}{suffix}")
 
-            if result:
-                self.status_message.set("处理完成！文件已保存到桌面")
-                messagebox.showinfo("成功", f"文件处理完成！\\n输出文件: {result}")
-            else:
-                self.status_message.set("处理失败")
-                messagebox.showerror("错误", "文件处理失败，请检查文件格式")
+    def cancel_job(self):
+        """取消正在处理的任务（处理线程在下一次检查时停止，并删除写了一半的输出文件）"""
+        if self.worker.cancel():
+            self.cancel_btn.configure(state="disabled")
+            self.status_message.set("正在取消...")
 
-        except Exception as e:
-            # 停止进度条
-            self.progress.stop()
+    def on_job_done(self):
+        """一个任务结束后，没有后续任务时隐藏进度条和取消按钮（有后续任务时由其开始事件更新状态）"""
+        if not self.worker.busy:
             self.progress.pack_forget()
+            self.cancel_btn.pack_forget()
 
-            self.status_message.set("处理出错")
-            messagebox.showerror("错误", f"处理文件时出错:\\n{str(e)}")
-
-        finally:
-            self.process_btn.config(state="normal")
+    def on_close(self):
+        """关闭窗口：有未完成的任务时确认"""
+        if self.worker.busy and not messagebox.askyesno("确认退出", "还有未完成的处理任务，确定退出吗？"):
+            return
+        self.worker.shutdown()
+        if self.isolated_processor is not None:
+            self.isolated_processor.close()
+        self.root.destroy()
 
     def open_settings(self):
         """打开设置窗口"""
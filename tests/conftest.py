@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+测试公共夹具：在临时目录中生成最小的UPS/DPD模板和主数据、单件明细表
+"""
+import random
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+from openpyxl import Workbook
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+COUNTRIES = ["DE", "DE", "DE", "FR", "IT", "ES", "NL", "PL", "GB", "US", None]
+POSTCODES = ["4347", "6126", "14656", "21423", "36251", "39171", "44145", "10115", "80331"]
+
+
+def _add_total_row(worksheet, row: int, label: str, sum_columns: str):
+    worksheet.cell(row=row, column=1).value = label
+    for column in sum_columns:
+        worksheet[f"{column}{row}"] = f"=SUM({column}2:{column}{row - 1})"
+
+
+def build_ups_template(path, rows: int = 30):
+    """UPS模板：各工作表第1行为表头，数据区之后为合计行"""
+    workbook = Workbook()
+    summary = workbook.active
+    summary.title = "总结单"
+    summary.append(["Tracking Number", "Packages", "G.W", "V.G", "ZIP code", "country"])
+    _add_total_row(summary, rows, "Collection Total", "BCD")
+    waybill = workbook.create_sheet("运单信息")
+    waybill.append(["参考号\n（Reference NO)", "件数\n(PCS)", "实重\n(Kg)", "材重\n(Kg)", "目的地\n(Destination)",
+                    "UPS主运单号\n(Tracking Number)", "提单号（集装箱/空运）"])
+    static = workbook.create_sheet("统计")
+    static.append(["Destination", "Package", "G.W", "V.W"])
+    _add_total_row(static, 15, "Total", "BCD")
+    german = workbook.create_sheet("德国邮编")
+    german.append(["zipcode", "PCS", "GW", "VW", "country"])
+    _add_total_row(german, 15, "Total", "BCD")
+    sub_order = workbook.create_sheet("子单号")
+    sub_order.append(["参考号\n（Reference NO)", "UPS 子单号\n(Tracking Number)"])
+    workbook.save(path)
+    return str(path)
+
+
+def build_dpd_template(path, rows: int = 30):
+    """DPD模板：运单清单、子单号第1行为表头，数据区之后为合计行；总结单第4行为统计行（F~AA列）"""
+    workbook = Workbook()
+    list_sheet = workbook.active
+    list_sheet.title = "List （运单清单）"
+    list_sheet.append(["Remark\n（箱唛 or  FBA ）", "Tracking No", "County", "PCS", "GW (kg)", "VW（kg)", "Cubic Number(CBM)", "post Code"])
+    list_sheet.cell(row=rows, column=3).value = "合计 Total"
+    for column in "DEFG":
+        list_sheet[f"{column}{rows}"] = f"=SUM({column}2:{column}{rows - 1})"
+    sub_order = workbook.create_sheet("子单号")
+    sub_order.append(["参考号 （必填）", "子单号（必填）", "主单号（必填）", "公司", "收件人", "方数"])
+    _add_total_row(sub_order, rows, "Collection Total", "F")
+    summary = workbook.create_sheet("总结单")
+    summary["A1"] = "DPD Summary"
+    summary["A3"] = "PCS"
+    workbook.save(path)
+    return str(path)
+
+
+def make_manifest(count: int, start: int = 0, seed: int = 1):
+    """
+    生成主数据和单件明细表
+
+    Returns:
+        tuple: (主数据, 明细表)
+    """
+    rnd = random.Random(seed)
+    rows = []
+    for index in range(start, start + count):
+        rows.append({
+            "客户单号": f"FBA{index:06d}",
+            "转单号": f"1Z{index:010d}",
+            "国家二字码": rnd.choice(COUNTRIES),
+            "件数": rnd.randint(1, 5),
+            "收货实重": round(rnd.uniform(0.1, 30), 3),
+            "收货材积重": round(rnd.uniform(0.1, 30), 2),
+            "收件人邮编": rnd.choice(POSTCODES),
+            "柜号": "C1",
+            "方数": round(rnd.uniform(0.001, 0.5), 6),
+        })
+    main = pd.DataFrame(rows)
+    detail = pd.DataFrame([{"客户单号": row["客户单号"], "子转单号": f"{row['转单号']}{piece:02d}"}
+                           for row in rows for piece in range(row["件数"])])
+    return main, detail
+
+
+@pytest.fixture
+def ups_template(tmp_path):
+    return build_ups_template(tmp_path / "ups_template.xlsx")
+
+
+@pytest.fixture
+def dpd_template(tmp_path):
+    return build_dpd_template(tmp_path / "dpd_template.xlsx")
@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""汇总累计库：以数据内容为记录标识，重复处理不重复计算，同名的不同文件互不影响"""
+from datetime import date
+
+import pytest
+
+import src.cli.rollup
+import src.core.excel_processor
+from conftest import make_manifest
+from src.cli import main as cli_main
+from src.core.aggregate_store import AggregateStore, content_key
+from src.core.excel_processor import ExcelProcessor
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+@pytest.fixture
+def store_path(tmp_path, monkeypatch):
+    path = tmp_path / "aggregates.db"
+    monkeypatch.setattr(src.core.excel_processor, "AGGREGATE_STORE_PATH", str(path))
+    monkeypatch.setattr(src.cli.rollup, "AGGREGATE_STORE_PATH", str(path))
+    return path
+
+
+def _rollup(path, start="2026-01-01", end="2026-12-31"):
+    store = AggregateStore(path)
+    try:
+        return store.rollup(start, end)
+    finally:
+        store.close()
+
+
+def _pieces(data):
+    """有效国家代码行的件数合计（汇总只统计有国家代码的行）"""
+    return data.loc[data["国家二字码"].notna(), "件数"].sum()
+
+
+def _record(processor, data, input_file, data_date):
+    assert processor.record_aggregates(UPSDataProcessor(), data, input_file, data_date)
+
+
+def test_reprocessing_same_data_is_counted_once(store_path, tmp_path):
+    main, _ = make_manifest(30)
+    processor = ExcelProcessor()
+    _record(processor, main, tmp_path / "a" / "manifest.xlsx", "2026-03-02")
+    _record(processor, main, tmp_path / "a" / "manifest.xlsx", "2026-03-02")
+    # 批量处理和收件箱处理了同一份数据（路径不同）
+    _record(processor, main, tmp_path / "b" / "manifest.xlsx", "2026-03-02")
+
+    rollup = _rollup(store_path)
+    assert rollup["runs"] == 1
+    assert rollup["totals"]["件数"] == _pieces(main)
+
+
+def test_same_name_different_data_kept_separately(store_path, tmp_path):
+    first, _ = make_manifest(30)
+    second, _ = make_manifest(20, start=30, seed=2)
+    processor = ExcelProcessor()
+    _record(processor, first, tmp_path / "a" / "manifest.xlsx", "2026-03-02")
+    _record(processor, second, tmp_path / "b" / "manifest.xlsx", "2026-03-02")
+
+    rollup = _rollup(store_path)
+    assert rollup["runs"] == 2
+    assert rollup["totals"]["件数"] == _pieces(first) + _pieces(second)
+
+
+def test_append_records_delta_next_to_full_run(store_path, tmp_path):
+    """追加的数据只保存新增部分，与之前的完整记录相加等于全部数据的汇总"""
+    full, _ = make_manifest(50)
+    head, tail = full.iloc[:40].reset_index(drop=True), full.iloc[40:].reset_index(drop=True)
+    processor = ExcelProcessor()
+    _record(processor, head, tmp_path / "manifest.xlsx", "2026-03-02")
+    _record(processor, tail, tmp_path / "manifest.xlsx", "2026-03-02")
+
+    rollup = _rollup(store_path)
+    assert rollup["runs"] == 2
+    assert rollup["totals"] == UPSDataProcessor().compute_summary_aggregates(full)["totals"]
+
+
+def test_data_date_does_not_follow_processing_date(store_path, tmp_path):
+    main, _ = make_manifest(10)
+    input_file = tmp_path / "manifest.xlsx"
+    main.to_excel(input_file, index=False)
+    processor = ExcelProcessor()
+    assert processor.get_data_date(input_file, "2026-03-02") == "2026-03-02"
+    assert processor.get_data_date(input_file) == date.fromtimestamp(input_file.stat().st_mtime)
+    assert content_key(main) == content_key(main.copy())
+
+
+def test_rollup_command(store_path, tmp_path, ups_template, monkeypatch):
+    main, _ = make_manifest(30)
+    _record(ExcelProcessor(), main, tmp_path / "manifest.xlsx", "2026-03-04")
+    monkeypatch.setattr(ExcelProcessor, "get_template_path", lambda self, template_type: ups_template)
+    output_dir = tmp_path / "out"
+
+    assert cli_main(["rollup", "--date", "2026-03-04", "-o", str(output_dir)]) == 0
+    assert (output_dir / "UPS汇总-2026-03-02_2026-03-08.xlsx").exists()
+    # 其他周没有已保存的汇总结果
+    assert cli_main(["rollup", "--date", "2026-04-20", "-o", str(output_dir)]) == 1
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""分组汇总：整数和定点列按int64精确累加，超出定点精度的数值记录警告；指定邮编分组"""
+import logging
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_manifest
+from src.core.aggregation import KEY_COUNTRY, KEY_POSTCODE, AggregationEngine
+from src.core.dpd.dpd_processor import DPDProcessor
+from src.core.normalizer import NormalizedData, to_fixed_point
+
+
+def test_integer_group_sums_are_exact_beyond_float_precision():
+    # 每个值都能被float64精确表示，但累加结果超过2⁵³，按浮点累加会丢失个位
+    large = 2 ** 53 - 1
+    data = pd.DataFrame({"国家二字码": ["DE", "DE", "DE", "DE", "FR"], "件数": [large, 1, 1, 1, 5]})
+    results = AggregationEngine(NormalizedData(data), ["件数"], fixed_point_scales={}).add_group_by("country", "国家二字码").run()
+
+    sums = dict(zip(results["country"]["国家二字码"], results["country"]["件数"]))
+    assert int(sums["DE"]) == large + 3
+    assert int(sums["FR"]) == 5
+    assert results["country"]["件数"].dtype == np.int64
+
+
+def test_fixed_point_group_sums_match_decimal_totals():
+    data = pd.DataFrame({"国家二字码": ["DE"] * 10 + ["FR"], "收货实重": [0.1] * 10 + [1.234]})
+    results = AggregationEngine(NormalizedData(data), ["收货实重"]).add_group_by("country", "国家二字码").run()
+
+    sums = dict(zip(results["country"]["国家二字码"], results["country"]["收货实重"]))
+    assert sums == {"DE": 1.0, "FR": 1.234}
+    assert results["totals"]["收货实重"] == 2.234
+
+
+def test_precision_beyond_scale_is_logged(caplog):
+    with caplog.at_level(logging.WARNING, logger="src.core.normalizer"):
+        assert to_fixed_point([1.5, 0.1, 2.0], 1000).tolist() == [1500, 100, 2000]
+    assert not caplog.records
+
+    with caplog.at_level(logging.WARNING, logger="src.core.normalizer"):
+        assert to_fixed_point([1.2345, 0.1], 1000).tolist() == [1234, 100]
+    assert "1 个数值的精度超过定点比例" in caplog.text
+
+
+def test_duplicate_postcode_buckets_use_first_position():
+    data = pd.DataFrame({"收件人邮编": ["4347", "6126", 4347.0, "99999", None]})
+    buckets = NormalizedData(data).postcode_buckets("收件人邮编", ["4347", "6126", " 4347"])
+
+    assert buckets.tolist() == [0, 1, 0, -1, -1]
+
+
+def test_duplicate_dpd_de_postcodes_are_rejected():
+    processor = DPDProcessor()
+    processor.sheet_mappings["总结单"]["de_postcodes"] = ["4347", "6126", "4347"]
+
+    with pytest.raises(ValueError, match="DE指定邮编重复"):
+        processor.count_category_pieces(pd.DataFrame({"国家二字码": ["DE"], "收件人邮编": ["4347"], "件数": [1]}))
+
+
+def test_engine_matches_pandas_groupby_for_all_specs():
+    """一次计算的国家汇总、德国邮编汇总与pandas逐个分组的结果一致"""
+    main, _ = make_manifest(300)
+    engine = AggregationEngine(NormalizedData(main), ["件数", "收货实重", "方数"])
+    engine.add_group_by("country", "国家二字码", KEY_COUNTRY)
+    engine.add_group_by("postcode", "收件人邮编", KEY_POSTCODE, "国家二字码", "DE")
+    results = engine.run(totals_column="国家二字码")
+
+    valid = main[main["国家二字码"].notna()]
+    expected_country = valid.groupby("国家二字码")[["件数", "收货实重", "方数"]].sum().reset_index()
+    pd.testing.assert_frame_equal(results["country"], expected_country, check_exact=False, check_dtype=False)
+
+    german = valid[valid["国家二字码"] == "DE"]
+    expected_postcode = german.groupby("收件人邮编")[["件数", "收货实重", "方数"]].sum().reset_index()
+    pd.testing.assert_frame_equal(results["postcode"], expected_postcode, check_exact=False, check_dtype=False)
+
+    assert results["totals"]["件数"] == valid["件数"].sum()
+    assert results["totals"]["收货实重"] == pytest.approx(valid["收货实重"].sum())
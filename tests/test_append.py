@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+"""追加模式：先处理一部分数据再追加其余数据，结果应与一次处理全部数据相同"""
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+from conftest import make_manifest
+from src.cli import main as cli_main
+from src.core.excel_processor import ExcelProcessor
+from src.core.totals import TotalsWriter
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def _split(main, detail, count):
+    head, tail = main.iloc[:count].reset_index(drop=True), main.iloc[count:].reset_index(drop=True)
+    in_head = detail["客户单号"].isin(head["客户单号"])
+    return (head, detail[in_head].reset_index(drop=True)), (tail, detail[~in_head].reset_index(drop=True))
+
+
+def _sheet_values(path):
+    workbook = load_workbook(path)
+    return {worksheet.title: list(worksheet.iter_rows(values_only=True)) for worksheet in workbook.worksheets}
+
+
+def test_ups_append_matches_single_run(ups_template, tmp_path):
+    main, detail = make_manifest(50)
+    (head, head_detail), (tail, tail_detail) = _split(main, detail, 40)
+    processor = UPSDataProcessor()
+
+    full_path = tmp_path / "full.xlsx"
+    appended_path = tmp_path / "appended.xlsx"
+    assert processor.process_ups_data(main, detail, ups_template, str(full_path))
+    assert processor.process_ups_data(head, head_detail, ups_template, str(appended_path))
+    assert processor.append_ups_data(tail, tail_detail, str(appended_path))
+
+    full, appended = _sheet_values(full_path), _sheet_values(appended_path)
+    assert full.keys() == appended.keys()
+    for title in full:
+        assert appended[title] == full[title], title
+
+
+def test_accumulated_totals_use_fixed_point():
+    assert 0.1 + 0.2 != 0.3
+    assert TotalsWriter.add_totals(0.1, 0.2, 1000) == 0.3
+    assert TotalsWriter.add_totals(520.26, 254.45, 1000) == 774.71
+    assert TotalsWriter.add_totals(3, 4) == 7
+
+
+def test_append_command_matches_single_run(ups_template, tmp_path):
+    main, detail = make_manifest(50)
+    (head, head_detail), (tail, tail_detail) = _split(main, detail, 40)
+    tail.to_excel(tmp_path / "tail.xlsx", index=False)
+    # 明细表按文件名规则自动匹配
+    tail_detail.to_excel(tmp_path / "tail_明细.xlsx", index=False)
+    # 一次处理全部数据时使用与追加时相同的（从文件读回的）新增数据
+    reader = ExcelProcessor()
+    tail = reader.get_original_file_data(str(tmp_path / "tail.xlsx"), 0)
+    tail_detail = reader.get_original_file_data(str(tmp_path / "tail_明细.xlsx"), 0)
+    full_path, appended_path = tmp_path / "full.xlsx", tmp_path / "appended.xlsx"
+    UPSDataProcessor().process_ups_data(pd.concat([head, tail], ignore_index=True), pd.concat([head_detail, tail_detail], ignore_index=True),
+                                        ups_template, str(full_path))
+    UPSDataProcessor().process_ups_data(head, head_detail, ups_template, str(appended_path))
+
+    assert cli_main(["append", str(tmp_path / "tail.xlsx"), "--to", str(appended_path)]) == 0
+    assert _sheet_values(appended_path) == _sheet_values(full_path)
+    assert not [path.name for path in tmp_path.iterdir() if ".tmp" in path.name]
+
+
+def test_failed_append_keeps_previous_output(ups_template, tmp_path, monkeypatch):
+    main, detail = make_manifest(50)
+    (head, head_detail), (tail, tail_detail) = _split(main, detail, 40)
+    previous_path = tmp_path / "previous.xlsx"
+    UPSDataProcessor().process_ups_data(head, head_detail, ups_template, str(previous_path))
+    previous = previous_path.read_bytes()
+
+    def interrupted_save(workbook, filename):
+        Path(filename).write_bytes(b"partial")
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(Workbook, "save", interrupted_save)
+    assert not UPSDataProcessor().append_ups_data(tail, tail_detail, str(previous_path))
+    assert previous_path.read_bytes() == previous
+    assert not [path.name for path in tmp_path.iterdir() if ".tmp" in path.name]
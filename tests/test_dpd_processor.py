@@ -0,0 +1,139 @@
+# -*- coding: utf-8 -*-
+"""DPD处理：运单清单、子单号、总结单的填充和合计；追加新增数据与一次处理全部数据的结果一致；总结单分类"""
+import pytest
+from openpyxl import load_workbook
+
+from conftest import make_manifest
+from src.core.dpd.dpd_processor import DPDProcessor
+from src.core.normalizer import canonical_postcode
+from src.core.write_session import SheetWriteSession
+
+# 总结单统计行及各列（见DPDProcessor.sheet_mappings["总结单"]）
+SUMMARY_ROW = 4
+TOTAL_COLUMN = 27
+
+
+def _manifest(count, start=0, seed=1):
+    main, detail = make_manifest(count, start, seed)
+    main["收件人公司"] = "ACME"
+    main["收件人姓名"] = [f"收件人{index}" for index in range(start, start + count)]
+    return main, detail
+
+
+def _sheet_values(path):
+    workbook = load_workbook(path)
+    return {worksheet.title: list(worksheet.iter_rows(values_only=True)) for worksheet in workbook.worksheets}
+
+
+def _split(main, detail, rows):
+    head, tail = main.iloc[:rows].reset_index(drop=True), main.iloc[rows:].reset_index(drop=True)
+    in_head = detail["客户单号"].isin(head["客户单号"])
+    return (head, detail[in_head].reset_index(drop=True)), (tail, detail[~in_head].reset_index(drop=True))
+
+
+def test_process_fills_sheets_and_totals(dpd_template, tmp_path):
+    main, detail = _manifest(60)
+    output_path = tmp_path / "out.xlsx"
+
+    assert DPDProcessor().process_dpd_data(main, detail, dpd_template, str(output_path))
+
+    workbook = load_workbook(output_path)
+    list_sheet = workbook["List （运单清单）"]
+    # 数据超过模板数据区时在合计行之前插入行
+    assert [list_sheet.cell(row=row, column=2).value for row in range(2, 62)] == main["转单号"].tolist()
+    assert list_sheet.cell(row=62, column=3).value == "合计 Total"
+    assert list_sheet.cell(row=62, column=4).value == main["件数"].sum()
+    assert list_sheet.cell(row=62, column=5).value == pytest.approx(main["收货实重"].sum())
+
+    sub_order = workbook["子单号"]
+    assert sub_order.cell(row=len(detail) + 2, column=1).value == "Collection Total"
+    first = sub_order.cell(row=2, column=1).value
+    assert sub_order.cell(row=2, column=3).value == main.loc[main["客户单号"] == first, "转单号"].iloc[0]
+
+    summary = workbook["总结单"]
+    categories = [summary.cell(row=SUMMARY_ROW, column=col).value for col in range(6, TOTAL_COLUMN)]
+    assert sum(categories) == summary.cell(row=SUMMARY_ROW, column=TOTAL_COLUMN).value == main["件数"].sum()
+    fr_pieces = main.loc[main["国家二字码"] == "FR", "件数"].sum()
+    assert summary.cell(row=SUMMARY_ROW, column=19).value == fr_pieces
+
+
+def test_append_matches_single_run(dpd_template, tmp_path):
+    main, detail = _manifest(60)
+    (head, head_detail), (tail, tail_detail) = _split(main, detail, 40)
+    full_path = tmp_path / "full.xlsx"
+    output_path = tmp_path / "out.xlsx"
+
+    assert DPDProcessor().process_dpd_data(main, detail, dpd_template, str(full_path))
+    assert DPDProcessor().process_dpd_data(head, head_detail, dpd_template, str(output_path))
+    assert DPDProcessor().append_dpd_data(tail, tail_detail, str(output_path))
+
+    assert _sheet_values(output_path) == _sheet_values(full_path)
+    assert [path.name for path in tmp_path.iterdir() if ".tmp" in path.name] == []
+
+
+def test_failed_append_keeps_previous_output(dpd_template, tmp_path, monkeypatch):
+    main, detail = _manifest(20)
+    (head, head_detail), (tail, tail_detail) = _split(main, detail, 10)
+    output_path = tmp_path / "out.xlsx"
+    assert DPDProcessor().process_dpd_data(head, head_detail, dpd_template, str(output_path))
+    previous = output_path.read_bytes()
+
+    # 新内容已写入临时文件后出错：之前的输出文件保持不变，临时文件被删除
+    def fail(self, saved_path):
+        raise OSError("磁盘已满")
+
+    monkeypatch.setattr(SheetWriteSession, "optimize", fail)
+    assert not DPDProcessor().append_dpd_data(tail, tail_detail, str(output_path))
+    assert output_path.read_bytes() == previous
+    assert [path.name for path in tmp_path.iterdir() if ".tmp" in path.name] == []
+
+
+def _reference_category(country, postcode, de_postcodes, other_countries):
+    """逐行分类（与原先逐个国家筛选的规则相同）"""
+    country = str(country).strip().upper() if country is not None else ""
+    if country == "DE":
+        postcode = canonical_postcode(postcode)
+        return postcode if postcode in de_postcodes else "other"
+    return country if country in other_countries else "other"
+
+
+def test_partition_matches_row_by_row_classification():
+    main, _ = _manifest(300)
+    main["收件人邮编"] = main["收件人邮编"].astype(object)
+    main.loc[0:4, "国家二字码"] = " fr"
+    main.loc[5:9, "收件人邮编"] = 4347.0
+    main.loc[10:12, "国家二字码"] = "XX"
+    processor = DPDProcessor(None)
+    config = processor.sheet_mappings["总结单"]
+    other_countries = [country for country in config["supported_countries"] if country != "DE"]
+
+    row_categories, categories = processor.partition_countries(main)
+    expected = [_reference_category(country, postcode, config["de_postcodes"], other_countries)
+                for country, postcode in zip(main["国家二字码"], main["收件人邮编"])]
+    assert [categories[index] for index in row_categories] == expected
+
+    category_pieces, category_rows = processor.count_category_pieces(main)
+    for category in categories:
+        in_category = [value == category for value in expected]
+        assert category_pieces[category] == main.loc[in_category, "件数"].sum()
+        assert category_rows[category] == sum(in_category)
+
+
+def test_sub_order_join_uses_first_matching_list_row():
+    main, detail = _manifest(30)
+    # 重复的客户单号取第一行，没有对应主单的明细行留空
+    main.loc[5, "客户单号"] = main.loc[3, "客户单号"]
+    detail.loc[0, "客户单号"] = "NOT-IN-LIST"
+    header_column_mapping = {"参考号 （必填）": 1, "子单号（必填）": 2, "主单号（必填）": 3, "公司": 4, "收件人": 5, "方数": 6}
+
+    plan = DPDProcessor(None).build_sub_order_payload(detail, main, header_column_mapping, 2)
+
+    expected_rows = []
+    for customer_order_no in detail["客户单号"]:
+        rows = main.index[main["客户单号"] == customer_order_no]
+        expected_rows.append(main.loc[rows[0]] if len(rows) else None)
+    assert plan.columns[2] == detail["子转单号"].tolist()
+    assert plan.columns[3] == [row["转单号"] if row is not None else None for row in expected_rows]
+    assert plan.columns[5] == [row["收件人姓名"] if row is not None else None for row in expected_rows]
+    # 方数合计只计入匹配到的行（每个子单号计一次）
+    assert plan.totals[6] == pytest.approx(sum(row["方数"] for row in expected_rows if row is not None))
@@ -0,0 +1,15 @@
+# -*- coding: utf-8 -*-
+"""ExcelProcessor调用处理器时的参数"""
+import inspect
+
+from src.core.dpd.dpd_processor import DPDProcessor
+from src.core.excel_processor import ExcelProcessor
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def test_output_options_are_processor_keywords():
+    options = ExcelProcessor().get_output_options()
+    for method in (UPSDataProcessor.process_ups_data, DPDProcessor.process_dpd_data):
+        parameters = inspect.signature(method).parameters
+        assert set(options) <= set(parameters), method.__name__
+        assert all(parameters[name].default is not inspect.Parameter.empty for name in options)
@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""填充计划：整列数字格式与缓存的样式ID"""
+from openpyxl import Workbook
+from openpyxl.styles import Border, Side
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.style_registry import TEXT_FORMAT, StyleRegistry
+
+
+def test_text_column_uses_cached_style_and_keeps_template_border():
+    workbook = Workbook()
+    worksheet = workbook.active
+    border = Border(bottom=Side(style="thin"))
+    worksheet.cell(row=2, column=1).border = border
+
+    plan = SheetFillPlan("Sheet", start_row=2)
+    plan.add_column(1, ["00123", "00456", "00789"], TEXT_FORMAT)
+    plan.add_column(2, [1, 2, 3])
+    registry = StyleRegistry(workbook)
+    plan.apply(worksheet, registry)
+
+    assert worksheet.column_dimensions["A"].number_format == TEXT_FORMAT
+    assert [worksheet.cell(row=row, column=1).number_format for row in (2, 3, 4)] == [TEXT_FORMAT] * 3
+    # 模板单元格原有的边框保留
+    assert worksheet["A2"].border == border
+    # 没有原有样式的单元格引用同一个样式ID
+    assert worksheet["A3"].style_id == worksheet["A4"].style_id
+    assert worksheet["B3"].number_format == "General"
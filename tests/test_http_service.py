@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""HTTP任务服务：上传文件提交任务、查询状态、下载输出文件"""
+import io
+import json
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+
+import pytest
+from openpyxl import load_workbook
+
+import src.core.job_service
+from conftest import make_manifest
+from src.core.excel_processor import ExcelProcessor
+from src.core.http_service import JobHTTPServer
+from src.core.job_runner import execute_job
+from src.core.job_service import JobService
+
+
+class InlineWorker:
+    """在当前进程中执行任务的工作进程替身（子进程中无法替换模板路径）"""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def run(self, job, timeout=None):
+        return execute_job(job)
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def server(tmp_path, ups_template, monkeypatch):
+    monkeypatch.setattr(src.core.job_service, "WorkerProcess", InlineWorker)
+    monkeypatch.setattr(ExcelProcessor, "get_template_path", lambda self, template_type: ups_template)
+    service = JobService(tmp_path / "jobs", workers=1, queue_size=2)
+    server = JobHTTPServer(("127.0.0.1", 0), service, ("UPS", "DPD"))
+    service.start()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+    service.stop()
+
+
+def _excel_bytes(data):
+    buffer = io.BytesIO()
+    data.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def _multipart(fields: dict, files: dict):
+    boundary = uuid.uuid4().hex
+    lines = []
+    for name, value in fields.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8"))
+    for name, (file_name, data) in files.items():
+        lines.append(f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"; filename="{file_name}"\r\n'
+                     f'Content-Type: application/octet-stream\r\n\r\n'.encode("utf-8") + data + b"\r\n")
+    lines.append(f"--{boundary}--\r\n".encode("utf-8"))
+    return b"".join(lines), f"multipart/form-data; boundary={boundary}"
+
+
+def _request(url, body=None, content_type=None):
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": content_type} if content_type else {})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def test_submit_poll_and_download(server):
+    main, detail = make_manifest(25)
+    body, content_type = _multipart({"template": "UPS"}, {"main": ("运单.xlsx", _excel_bytes(main)),
+                                                          "detail": ("运单_明细.xlsx", _excel_bytes(detail))})
+
+    status, headers, data = _request(f"{server}/jobs", body, content_type)
+    assert status == 202
+    job = json.loads(data)
+    assert headers["Location"] == job["url"]
+    assert (job["input"], job["detail"]) == ("运单.xlsx", "运单_明细.xlsx")
+
+    deadline = time.monotonic() + 30
+    while job["status"] in ("queued", "running") and time.monotonic() < deadline:
+        time.sleep(0.05)
+        job = json.loads(_request(f"{server}{job['url']}")[2])
+    assert job["status"] == "success", job
+    assert job["rows"] == len(main)
+
+    status, headers, data = _request(f"{server}{job['result_url']}")
+    assert status == 200
+    assert "attachment" in headers["Content-Disposition"]
+    workbook = load_workbook(io.BytesIO(data))
+    assert workbook["总结单"].cell(row=2, column=1).value == main["转单号"].iloc[0]
+    assert workbook["子单号"].max_row == len(detail) + 1
+
+    health = json.loads(_request(f"{server}/health")[2])
+    assert health["status"] == "ok"
+
+
+def test_rejected_submissions(server):
+    main, _ = make_manifest(5)
+    body, content_type = _multipart({"template": "FEDEX"}, {"main": ("运单.xlsx", _excel_bytes(main))})
+    assert _request(f"{server}/jobs", body, content_type)[0] == 400
+
+    body, content_type = _multipart({}, {"main": ("运单.csv", b"a,b")})
+    assert _request(f"{server}/jobs", body, content_type)[0] == 400
+
+    body, content_type = _multipart({}, {"detail": ("运单_明细.xlsx", b"")})
+    assert _request(f"{server}/jobs", body, content_type)[0] == 400
+
+    assert _request(f"{server}/jobs/unknown")[0] == 404
+    assert _request(f"{server}/jobs/unknown/result")[0] == 404
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""收件箱：主数据文件与明细表的配对、没有主数据文件的明细表、没有明细表的任务"""
+from pathlib import Path
+
+from openpyxl import load_workbook
+
+from conftest import make_manifest
+from src.core.inbox_daemon import ARCHIVE_FAILED, InboxDaemon
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def _daemon(tmp_path, **kwargs):
+    inbox = tmp_path / "inbox"
+    inbox.mkdir()
+    options = {"detail_suffixes": ("_明细", "明细"), "detail_wait": 60, "orphan_detail_wait": 600, "use_events": False}
+    options.update(kwargs)
+    return InboxDaemon(inbox, tmp_path / "outbox", **options)
+
+
+def _ready(daemon, name):
+    path = daemon.inbox / name
+    path.write_bytes(b"data")
+    daemon._on_file_ready(path)
+    return path
+
+
+def _queued(daemon):
+    jobs = []
+    while not daemon.queue.empty():
+        job, _ = daemon.queue.get_nowait()
+        jobs.append((Path(job.input_file).name, Path(job.detail_file).name if job.detail_file else None))
+    return jobs
+
+
+def test_main_name_ending_with_detail_suffix_is_main(tmp_path):
+    daemon = _daemon(tmp_path, detail_wait=0)
+    _ready(daemon, "运单明细.xlsx")
+
+    assert _queued(daemon) == [("运单明细.xlsx", None)]
+
+
+def test_detail_before_main_is_paired(tmp_path):
+    daemon = _daemon(tmp_path)
+    _ready(daemon, "manifest_明细.xlsx")
+    assert _queued(daemon) == []
+
+    _ready(daemon, "manifest.xlsx")
+
+    assert _queued(daemon) == [("manifest.xlsx", "manifest_明细.xlsx")]
+    assert not daemon._ready_details and not daemon._waiting_mains
+
+
+def test_orphan_detail_is_archived(tmp_path):
+    daemon = _daemon(tmp_path, orphan_detail_wait=0)
+    # 主数据文件还在收件箱中但一直没有写入完成
+    (daemon.inbox / "manifest.xlsx").write_bytes(b"data")
+    _ready(daemon, "manifest_明细.xlsx")
+
+    assert _queued(daemon) == []
+    assert not daemon._ready_details
+    assert (daemon.inbox / ARCHIVE_FAILED / "manifest_明细.xlsx").exists()
+
+
+def test_ups_without_detail_skips_sub_order_sheet(ups_template, tmp_path):
+    main, _ = make_manifest(20)
+    output_path = tmp_path / "out.xlsx"
+
+    assert UPSDataProcessor().process_ups_data(main, None, str(ups_template), str(output_path))
+
+    workbook = load_workbook(output_path)
+    assert workbook["子单号"].max_row == 1
+    assert workbook["总结单"]["A2"].value is not None
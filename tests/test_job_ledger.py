@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+"""批量任务账本：崩溃后重新执行时跳过已完成的任务，过期的租约被重新领取"""
+import time
+from pathlib import Path
+
+import pytest
+
+from src.core.job_ledger import STATE_PENDING, STATE_RUNNING, JobLedger
+from src.core.job_runner import STATUS_FAILED, STATUS_SUCCESS, BatchJob, JobResult
+
+
+@pytest.fixture
+def jobs(tmp_path):
+    jobs = []
+    for index in range(3):
+        input_file = tmp_path / f"manifest{index}.xlsx"
+        input_file.write_bytes(f"data{index}".encode())
+        jobs.append(BatchJob(input_file, "UPS", output_path=tmp_path / "out" / f"UPS总结单-manifest{index}.xlsx"))
+    return jobs
+
+
+def _complete(ledger, owner, job_id, job, status=STATUS_SUCCESS):
+    if status == STATUS_SUCCESS:
+        output_path = Path(job.output_path)
+        output_path.parent.mkdir(exist_ok=True)
+        output_path.write_bytes(b"output")
+    return ledger.complete(job_id, owner, JobResult(job, status, job.output_path, rows=10, elapsed=0.1))
+
+
+def _claim_all(ledger, owner, job_ids):
+    names = []
+    while (item := ledger.claim(owner, job_ids)) is not None:
+        job_id, job = item
+        _complete(ledger, owner, job_id, job)
+        names.append(job.name)
+    return names
+
+
+def test_resume_after_crash_skips_completed_and_reclaims_expired_lease(tmp_path, jobs):
+    db_path = tmp_path / "ledger.db"
+    ledger = JobLedger(db_path, lease_seconds=0.2)
+    job_ids, completed = ledger.register(jobs)
+    assert completed == []
+
+    # 第一个任务完成，第二个任务执行中进程崩溃（租约未释放）
+    job_id, job = ledger.claim("host:1", job_ids)
+    assert _complete(ledger, "host:1", job_id, job)
+    crashed_id, crashed_job = ledger.claim("host:1", job_ids)
+    ledger.close()
+
+    # 重新执行同一批量命令：租约过期前不会重复领取执行中的任务
+    ledger = JobLedger(db_path, lease_seconds=0.2)
+    job_ids, completed = ledger.register(jobs)
+    assert [job.name for job in completed] == ["manifest0.xlsx"]
+    assert ledger.counts(job_ids) == {STATUS_SUCCESS: 1, STATE_RUNNING: 1, STATE_PENDING: 1}
+    assert ledger.claim("host:2", job_ids)[1].name == "manifest2.xlsx"
+
+    time.sleep(0.3)
+    job_id, job = ledger.claim("host:2", job_ids)
+    assert (job_id, job.name) == (crashed_id, crashed_job.name)
+    # 崩溃的进程恢复后提交的结果不再记录
+    assert not _complete(ledger, "host:1", job_id, job)
+    assert _complete(ledger, "host:2", job_id, job)
+    ledger.close()
+
+
+def test_changed_input_or_missing_output_is_processed_again(tmp_path, jobs):
+    ledger = JobLedger(tmp_path / "ledger.db")
+    job_ids, _ = ledger.register(jobs)
+    assert _claim_all(ledger, "host:1", job_ids) == ["manifest0.xlsx", "manifest1.xlsx", "manifest2.xlsx"]
+
+    Path(jobs[0].input_file).write_bytes(b"changed")
+    Path(jobs[1].output_path).unlink()
+    job_ids, completed = ledger.register(jobs)
+
+    assert [job.name for job in completed] == ["manifest2.xlsx"]
+    assert _claim_all(ledger, "host:1", job_ids) == ["manifest0.xlsx", "manifest1.xlsx"]
+    ledger.close()
+
+
+def test_failed_and_repeatedly_crashing_jobs(tmp_path, jobs):
+    ledger = JobLedger(tmp_path / "ledger.db", lease_seconds=0.05, max_attempts=2)
+    job_ids, _ = ledger.register(jobs[:2])
+
+    # 失败的任务在下一次执行时重新处理
+    job_id, job = ledger.claim("host:1", job_ids)
+    _complete(ledger, "host:1", job_id, job, STATUS_FAILED)
+    assert ledger.register(jobs[:2])[1] == []
+    assert ledger.counts([job_id]) == {STATE_PENDING: 1}
+
+    # 执行进程每次都崩溃的任务，领取max_attempts次后记为失败
+    crashing_id = job_ids[1]
+    for _ in range(2):
+        assert ledger.claim("host:1", [crashing_id])[0] == crashing_id
+        time.sleep(0.1)
+    assert ledger.claim("host:1", [crashing_id]) is None
+    assert ledger.counts([crashing_id]) == {STATUS_FAILED: 1}
+    ledger.close()
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+"""工作进程上下文：forkserver服务进程预加载处理模块后保持单线程"""
+import multiprocessing
+import multiprocessing.forkserver
+import os
+import sys
+import threading
+
+import pytest
+
+from src.core import job_runner
+from src.core.job_runner import JobRunner, get_worker_context
+
+
+def _inspect_worker(queue):
+    queue.put({
+        "preloaded": "src.core.worker_preload" in sys.modules,
+        "polars": "polars" in sys.modules,
+        "threads": threading.active_count(),
+    })
+
+
+@pytest.mark.skipif("forkserver" not in multiprocessing.get_all_start_methods() or not os.path.isdir("/proc/self/task"),
+                    reason="需要forkserver和/proc")
+def test_forkserver_server_is_single_threaded():
+    context = get_worker_context("forkserver")
+    queue = context.Queue()
+    process = context.Process(target=_inspect_worker, args=(queue,))
+    process.start()
+    worker = queue.get(timeout=60)
+    process.join(timeout=60)
+
+    # 工作进程继承了服务进程预加载的模块，Polars未被导入
+    assert worker == {"preloaded": True, "polars": False, "threads": 1}
+    # 服务进程本身（包括原生线程）只有一个线程
+    server_pid = multiprocessing.forkserver._forkserver._forkserver_pid
+    assert len(os.listdir(f"/proc/{server_pid}/task")) == 1
+
+
+def _worker_modules():
+    return {"preloaded": "src.core.worker_preload" in sys.modules}
+
+
+@pytest.mark.skipif("forkserver" not in multiprocessing.get_all_start_methods(), reason="需要forkserver")
+def test_batch_pool_uses_forkserver_without_changing_environment(monkeypatch):
+    monkeypatch.setenv("PYTHONPATH", "/opt/other")
+    runner = JobRunner(2, start_method="forkserver")
+    pool = runner._create_pool()
+    try:
+        results = [pool.apply(_worker_modules) for _ in range(2)]
+    finally:
+        pool.terminate()
+        pool.join()
+
+    assert all(result["preloaded"] for result in results)
+    assert os.environ["PYTHONPATH"] == "/opt/other"
+
+
+def test_spawn_pool_warms_templates_in_initializer(monkeypatch):
+    """spawn方式（Windows、打包后的程序）没有预加载，由进程池的初始化函数在处理任务之前载入模板"""
+    runner = JobRunner(1, start_method="spawn", warm_templates=("UPS",))
+    created = {}
+    monkeypatch.setattr(runner._context, "Pool", lambda processes, **kwargs: created.update(kwargs, processes=processes))
+    runner._create_pool()
+    assert created["initializer"] is job_runner.init_worker
+
+    warmed = []
+    monkeypatch.setattr(job_runner, "warm_worker", warmed.append)
+    monkeypatch.setattr(job_runner.signal, "signal", lambda signum, handler: None)
+    created["initializer"](*created["initargs"])
+    assert warmed == [("UPS",)]
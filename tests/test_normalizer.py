@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""规范化视图：保存在DataFrame.attrs中，派生数据不沿用；国家代码去空格、转大写后比较"""
+import pickle
+
+import pandas as pd
+
+from src.core.normalizer import get_normalized_view
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def _manifest():
+    return pd.DataFrame({
+        "国家二字码": ["DE", " de", "de ", "FR", None],
+        "收件人邮编": ["4347", "4347", 6126.0, "75001", "1"],
+        "件数": [1, 2, 3, 4, 5],
+        "收货实重": [1.0, 2.0, 3.0, 4.0, 5.0],
+        "收货材积重": [0.5, 0.5, 0.5, 0.5, 0.5],
+    })
+
+
+def test_view_is_shared_per_dataframe_and_not_inherited():
+    data = _manifest()
+    view = get_normalized_view(data)
+    assert get_normalized_view(data) is view
+    assert get_normalized_view(data, refresh=True) is not view
+
+    # 筛选、复制得到的新DataFrame有自己的视图
+    subset = data[data["件数"] > 2]
+    assert get_normalized_view(subset).data is subset
+    assert get_normalized_view(data.copy()).data is not data
+
+    # 整体复制attrs时不会取到其他数据的视图
+    other = _manifest()
+    other.attrs = data.attrs
+    assert get_normalized_view(other).data is other
+
+
+def test_view_is_not_pickled_with_dataframe():
+    data = _manifest()
+    get_normalized_view(data).country_codes("国家二字码")
+    restored = pickle.loads(pickle.dumps(data))
+
+    assert get_normalized_view(restored).data is restored
+    pd.testing.assert_frame_equal(restored, data)
+
+
+def test_country_codes_are_stripped_and_upper_cased():
+    aggregates = UPSDataProcessor(None).compute_summary_aggregates(_manifest())
+
+    country = aggregates["country"].set_index("国家二字码")["件数"].to_dict()
+    assert country == {"DE": 6, "FR": 4}
+    postcode = aggregates["postcode"].set_index("收件人邮编")["件数"].to_dict()
+    assert postcode == {"4347": 3, "6126": 3}
+    # 无效国家代码的行不计入总计
+    assert aggregates["totals"]["件数"] == 10
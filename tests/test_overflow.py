@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""超大数据分片写入：超过单表行数上限的数据写入续表或独立的续簿，续表复制表头"""
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.overflow import SheetOverflowWriter
+from src.core.style_registry import TEXT_FORMAT
+
+
+def _template():
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "子单号"
+    worksheet.append(["参考号", "子单号"])
+    worksheet["A1"].font = Font(bold=True)
+    worksheet.column_dimensions["B"].width = 30
+    return workbook, worksheet
+
+
+def _plan(rows):
+    plan = SheetFillPlan("子单号", start_row=2)
+    plan.add_column(1, [f"FBA{index:04d}" for index in range(rows)], TEXT_FORMAT)
+    plan.add_column(2, list(range(rows)))
+    plan.set_cell(3, 5, "固定单元格")
+    return plan
+
+
+def _data_rows(worksheet):
+    return list(worksheet.iter_rows(min_row=2, values_only=True))
+
+
+def test_sheet_mode_continues_in_copied_sheets():
+    workbook, worksheet = _template()
+    workbook.create_sheet("统计")
+
+    locations = SheetOverflowWriter("sheet", max_rows=11).write(workbook, worksheet, _plan(25))
+
+    assert locations == ["子单号", "子单号 (2)", "子单号 (3)"]
+    # 续表紧跟在原表之后，复制表头、表头样式和列宽
+    assert workbook.sheetnames == ["子单号", "子单号 (2)", "子单号 (3)", "统计"]
+    for title in locations[1:]:
+        shard = workbook[title]
+        assert [cell.value for cell in shard[1]][:2] == ["参考号", "子单号"]
+        assert shard["A1"].font.bold
+        assert shard.column_dimensions["B"].width == 30
+        assert shard["A2"].number_format == TEXT_FORMAT
+    rows = [row[:2] for title in locations for row in _data_rows(workbook[title])]
+    assert rows == [(f"FBA{index:04d}", index) for index in range(25)]
+    # 固定位置单元格只写入第一个分片
+    assert worksheet["E3"].value == "固定单元格"
+    assert workbook["子单号 (2)"]["E3"].value is None
+
+
+def test_workbook_mode_writes_shards_next_to_output(tmp_path):
+    workbook, worksheet = _template()
+    output_path = tmp_path / "UPS总结单.xlsx"
+
+    locations = SheetOverflowWriter("workbook", max_rows=11).write(workbook, worksheet, _plan(25), str(output_path))
+
+    assert workbook.sheetnames == ["子单号"]
+    assert locations == ["子单号", str(tmp_path / "UPS总结单_子单号_2.xlsx"), str(tmp_path / "UPS总结单_子单号_3.xlsx")]
+    rows = _data_rows(worksheet)
+    for shard_path in locations[1:]:
+        shard = load_workbook(shard_path).active
+        assert [cell.value for cell in shard[1]] == ["参考号", "子单号"]
+        rows += _data_rows(shard)
+    assert [row[:2] for row in rows] == [(f"FBA{index:04d}", index) for index in range(25)]
+
+
+def test_data_within_limit_is_not_sharded():
+    workbook, worksheet = _template()
+
+    assert SheetOverflowWriter("sheet", max_rows=11).write(workbook, worksheet, _plan(10)) == ["子单号"]
+    assert workbook.sheetnames == ["子单号"]
+    assert worksheet.max_row == 11
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""Polars引擎：阈值为0（始终使用Polars）与None（始终使用pandas）的结果一致"""
+import numpy as np
+import pandas as pd
+import pytest
+
+from conftest import make_manifest
+from src.core.dpd.dpd_processor import DPDProcessor
+from src.core.polars_engine import POLARS_AVAILABLE, PolarsEngine
+from src.core.ups.ups_processor import UPSDataProcessor
+
+pytestmark = pytest.mark.skipif(not POLARS_AVAILABLE, reason="需要Polars")
+
+
+def _messy_manifest():
+    main, detail = make_manifest(200)
+    main["收件人邮编"] = main["收件人邮编"].astype(object)
+    # 需要规范化的国家代码和邮编
+    main.loc[0:9, "国家二字码"] = " de"
+    main.loc[10:14, "国家二字码"] = "fr "
+    main.loc[15:19, "收件人邮编"] = 4347.0
+    main.loc[20:22, "收件人邮编"] = None
+    # 重复的客户单号和缺失的客户单号
+    main.loc[30, "客户单号"] = main.loc[31, "客户单号"]
+    main.loc[40, "客户单号"] = None
+    return main, detail
+
+
+@pytest.fixture
+def polars_calls(monkeypatch):
+    """记录Polars引擎方法的调用结果（返回None表示回退到pandas）"""
+    calls = []
+    for name in ("summary_aggregates", "category_counts", "match_first_rows"):
+        original = getattr(PolarsEngine, name)
+
+        def spy(self, *args, original=original, name=name, **kwargs):
+            result = original(self, *args, **kwargs)
+            calls.append((name, result is not None))
+            return result
+
+        monkeypatch.setattr(PolarsEngine, name, spy)
+    return calls
+
+
+def _frames_equal(left, right):
+    pd.testing.assert_frame_equal(left.reset_index(drop=True), right.reset_index(drop=True), check_dtype=False)
+
+
+def test_ups_summary_aggregates_match(polars_calls):
+    main, _ = _messy_manifest()
+    pandas_result = UPSDataProcessor(None).compute_summary_aggregates(main.copy())
+    polars_result = UPSDataProcessor(0).compute_summary_aggregates(main.copy())
+
+    assert polars_calls == [("summary_aggregates", True)]
+    _frames_equal(polars_result["country"], pandas_result["country"])
+    _frames_equal(polars_result["postcode"], pandas_result["postcode"])
+    assert polars_result["totals"] == pytest.approx(pandas_result["totals"])
+
+
+def test_dpd_category_pieces_match(polars_calls):
+    main, _ = _messy_manifest()
+    pandas_result = DPDProcessor(None).count_category_pieces(main.copy())
+    polars_result = DPDProcessor(0).count_category_pieces(main.copy())
+
+    assert polars_calls == [("category_counts", True)]
+    assert polars_result == pandas_result
+
+
+def test_dpd_match_first_rows_match(polars_calls):
+    main, detail = _messy_manifest()
+    lookup = list(detail["客户单号"]) + ["missing", None]
+    pandas_rows, pandas_duplicates = DPDProcessor(None).match_first_rows(main, "客户单号", lookup)
+    polars_rows, polars_duplicates = DPDProcessor(0).match_first_rows(main, "客户单号", lookup)
+
+    assert polars_calls == [("match_first_rows", True)]
+    np.testing.assert_array_equal(polars_rows, pandas_rows)
+    assert sorted(polars_duplicates) == sorted(pandas_duplicates)
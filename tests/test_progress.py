@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+"""保存进度与取消：处理、追加、汇总表共用的保存步骤"""
+from openpyxl import Workbook, load_workbook
+
+from conftest import make_manifest
+from src.core.progress import ProgressToken, save_workbook
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def _workbook(rows=3000):
+    workbook = Workbook()
+    for row in range(rows):
+        workbook.active.append([row, f"ZX{row:08d}", "DE", row * 0.5])
+    return workbook
+
+
+def test_save_reports_progress_per_written_block(tmp_path):
+    reports = []
+    progress = ProgressToken(reports.append, report_interval=0)
+    output_path = tmp_path / "out.xlsx"
+
+    save_workbook(_workbook(), str(output_path), progress)
+
+    saving = [info for info in reports if info.stage == "保存"]
+    # 阶段开始、写入过程中和完成时都有报告，完成后已保存全部单元格
+    assert len(saving) > 2
+    assert saving[-1].rows_done == saving[-1].rows_total == 3000
+    assert load_workbook(output_path).active.max_row == 3000
+
+
+def test_cancel_during_save_keeps_previous_output(tmp_path, ups_template):
+    output_path = tmp_path / "out.xlsx"
+    output_path.write_bytes(b"previous")
+    progress = ProgressToken()
+    # 开始保存时请求取消，写入第一块数据时停止
+    progress.callback = lambda info: progress.cancel() if info.stage == "保存" else None
+    main, _ = make_manifest(20)
+
+    assert not UPSDataProcessor().process_ups_data(main, None, str(ups_template), str(output_path), progress=progress)
+    assert output_path.read_bytes() == b"previous"
+    assert [path.name for path in tmp_path.iterdir() if ".tmp" in path.name] == []
+
+
+def test_rollup_uses_shared_save(tmp_path, ups_template):
+    aggregates = UPSDataProcessor().compute_summary_aggregates(make_manifest(30)[0])
+    output_path = tmp_path / "rollup.xlsx"
+    output_path.write_bytes(b"previous")
+    progress = ProgressToken()
+    progress.cancel()
+
+    # 已取消时不写出任何内容，之前的文件保持不变
+    assert not UPSDataProcessor().process_ups_rollup(aggregates, str(ups_template), str(output_path), progress=progress)
+    assert output_path.read_bytes() == b"previous"
+
+    reports = []
+    assert UPSDataProcessor().process_ups_rollup(aggregates, str(ups_template), str(output_path), progress=ProgressToken(reports.append))
+    assert any(info.stage == "保存" for info in reports)
+    assert load_workbook(output_path)["统计"]["A2"].value is not None
+    assert [path.name for path in tmp_path.iterdir() if ".tmp" in path.name] == []
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""共享字符串表：低基数列改写为共享字符串引用，高基数列保持内联，读回的值不变"""
+import re
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.shared_strings import SHARED_STRINGS_PART
+from src.core.style_registry import TEXT_FORMAT
+from src.core.write_session import SheetWriteSession
+
+ROWS = 200
+COUNTRIES = ["DE", "FR", "IT", "ES"]
+
+
+def _save(tmp_path, shared_strings):
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.title = "子单号"
+    worksheet.append(["跟踪号", "国家", "件数"])
+    plan = SheetFillPlan("子单号", start_row=2)
+    plan.add_column(1, [f"1Z{index:010d}" for index in range(ROWS)], TEXT_FORMAT)
+    plan.add_column(2, [COUNTRIES[index % len(COUNTRIES)] for index in range(ROWS)], TEXT_FORMAT)
+    plan.add_column(3, list(range(ROWS)))
+    output_path = tmp_path / f"shared_{shared_strings}.xlsx"
+
+    write_session = SheetWriteSession(workbook, str(output_path), shared_strings=shared_strings)
+    write_session.write(worksheet, plan, None)
+    write_session.finalize()
+    write_session.save()
+    return output_path
+
+
+def _cell_types(path, column):
+    """数据区中某列单元格的类型（t属性）"""
+    with zipfile.ZipFile(path) as archive:
+        sheet_xml = archive.read("xl/worksheets/sheet1.xml").decode("utf-8")
+    cells = re.findall(r'<c r="([A-Z]+)(\d+)"([^>]*)>', sheet_xml)
+    return {re.search(r't="(\w+)"', attributes).group(1) for cell_column, row, attributes in cells
+            if cell_column == column and int(row) > 1}
+
+
+def test_low_cardinality_column_moves_to_shared_strings(tmp_path):
+    output_path = _save(tmp_path, shared_strings=True)
+
+    with zipfile.ZipFile(output_path) as archive:
+        assert SHARED_STRINGS_PART in archive.namelist()
+        shared_strings = archive.read(SHARED_STRINGS_PART).decode("utf-8")
+        assert 'sharedStrings+xml' in archive.read("[Content_Types].xml").decode("utf-8")
+        assert "sharedStrings.xml" in archive.read("xl/_rels/workbook.xml.rels").decode("utf-8")
+    # 整列改写（包括表头），每个不同字符串只存一次
+    assert f'count="{ROWS + 1}" uniqueCount="{len(COUNTRIES) + 1}"' in shared_strings
+    # 国家列为共享字符串引用，跟踪号列保持内联
+    assert _cell_types(output_path, "B") == {"s"}
+    assert _cell_types(output_path, "A") == {"inlineStr"}
+
+
+def test_shared_strings_read_back_unchanged(tmp_path):
+    def values(path):
+        worksheet = load_workbook(path)["子单号"]
+        return [[(cell.value, cell.number_format) for cell in row] for row in worksheet.iter_rows()]
+
+    assert values(_save(tmp_path, shared_strings=True)) == values(_save(tmp_path, shared_strings=False))
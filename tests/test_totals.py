@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""合计行：数据区不够时在合计行之前插入行，按模式写入合计值或改写SUM区域，超过单表上限时不再更新"""
+import pytest
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+from src.core.fill_plan import SheetFillPlan
+from src.core.totals import TotalsWriter
+
+# 模板：表头 + 第2~4行数据区 + 第5行合计行
+TOTAL_ROW = 5
+
+
+def _template():
+    workbook = Workbook()
+    worksheet = workbook.active
+    worksheet.append(["单号", "件数", "重量"])
+    worksheet["A4"].font = Font(bold=True)
+    worksheet.cell(row=TOTAL_ROW, column=1, value="合计 Total")
+    worksheet.cell(row=TOTAL_ROW, column=2, value="=SUM(B2:B4)")
+    worksheet.cell(row=TOTAL_ROW, column=3, value="=SUM($C$2:$C$4)")
+    return workbook, worksheet
+
+
+def _plan(rows):
+    plan = SheetFillPlan("List", start_row=2)
+    plan.add_column(1, [f"FBA{index}" for index in range(rows)])
+    plan.add_column(2, [1] * rows)
+    plan.set_total(2, rows)
+    plan.set_total(3, 0.1 * rows, scale=1000)
+    return plan
+
+
+def test_value_mode_inserts_rows_and_writes_totals():
+    workbook, worksheet = _template()
+    writer = TotalsWriter("value")
+
+    total_row = writer.reserve_rows(worksheet, 2, 10, TOTAL_ROW)
+    writer.write_totals(worksheet, _plan(10), total_row)
+    writer.finalize(workbook)
+
+    assert total_row == 12
+    assert worksheet.cell(row=12, column=1).value == "合计 Total"
+    assert [worksheet.cell(row=12, column=col).value for col in (2, 3)] == [10, pytest.approx(1.0)]
+    # 插入的行沿用数据区最后一行的样式
+    assert worksheet["A11"].font.bold
+    # 不再有公式时关闭打开时的全量重算
+    assert workbook.calculation.fullCalcOnLoad is False
+
+
+def test_formula_mode_rewrites_sum_ranges():
+    workbook, worksheet = _template()
+    writer = TotalsWriter("formula")
+
+    total_row = writer.reserve_rows(worksheet, 2, 10, TOTAL_ROW)
+    writer.write_totals(worksheet, _plan(10), total_row)
+    writer.finalize(workbook)
+
+    assert worksheet.cell(row=total_row, column=2).value == "=SUM(B2:B11)"
+    assert worksheet.cell(row=total_row, column=3).value == "=SUM($C$2:$C$11)"
+    assert workbook.calculation.fullCalcOnLoad is not False
+
+
+def test_accumulate_adds_fixed_point_totals():
+    workbook, worksheet = _template()
+    worksheet.cell(row=TOTAL_ROW, column=2, value=7)
+    worksheet.cell(row=TOTAL_ROW, column=3, value=0.2)
+
+    TotalsWriter("value").write_totals(worksheet, _plan(1), TOTAL_ROW, accumulate=True)
+
+    assert worksheet.cell(row=TOTAL_ROW, column=2).value == 8
+    # 定点相加：0.2 + 0.1 不出现 0.30000000000000004
+    assert worksheet.cell(row=TOTAL_ROW, column=3).value == 0.3
+
+
+def test_data_beyond_sheet_limit_leaves_total_row_unchanged():
+    workbook, worksheet = _template()
+    writer = TotalsWriter("value", max_rows=8)
+
+    # 插入行后超过单表上限：不插入行，合计行不再更新
+    total_row = writer.reserve_rows(worksheet, 2, 10, TOTAL_ROW)
+    writer.write_totals(worksheet, _plan(10), total_row)
+
+    assert total_row is None
+    assert worksheet.max_row == TOTAL_ROW
+    assert worksheet.cell(row=TOTAL_ROW, column=2).value == "=SUM(B2:B4)"
+
+
+def test_no_total_row():
+    _, worksheet = _template()
+    writer = TotalsWriter("value")
+
+    assert writer.reserve_rows(worksheet, 2, 10, None) is None
+    assert writer.reserve_rows(worksheet, 2, 2, TOTAL_ROW) == TOTAL_ROW
+    assert worksheet.max_row == TOTAL_ROW
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""UPS处理：各工作表的填充数据在线程池、进程池中计算与顺序计算结果一致"""
+import pytest
+from openpyxl import load_workbook
+
+from conftest import make_manifest
+from src.core.ups.ups_processor import UPSDataProcessor
+
+
+def _sheet_values(path):
+    workbook = load_workbook(path)
+    return {worksheet.title: list(worksheet.iter_rows(values_only=True)) for worksheet in workbook.worksheets}
+
+
+@pytest.mark.parametrize("parallel", ["thread", "process"])
+def test_parallel_fill_plans_match_sequential(parallel, ups_template, tmp_path):
+    main, detail = make_manifest(60)
+    sequential_path = tmp_path / "sequential.xlsx"
+    parallel_path = tmp_path / f"{parallel}.xlsx"
+
+    assert UPSDataProcessor().process_ups_data(main, detail, ups_template, str(sequential_path))
+    assert UPSDataProcessor().process_ups_data(main, detail, ups_template, str(parallel_path), parallel=parallel, max_workers=2)
+
+    assert _sheet_values(parallel_path) == _sheet_values(sequential_path)
+
+
+def test_missing_template_fails_without_output(tmp_path):
+    main, detail = make_manifest(10)
+    output_path = tmp_path / "out.xlsx"
+
+    assert not UPSDataProcessor().process_ups_data(main, detail, str(tmp_path / "missing.xlsx"), str(output_path))
+    assert not output_path.exists()
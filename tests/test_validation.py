@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+输入数据检查：行号与源文件对应、检查结果在输出文件保存之后写入
+"""
+import json
+
+import pandas as pd
+from openpyxl import Workbook
+
+from conftest import make_manifest
+from src.core.excel_processor import ExcelProcessor
+from src.core.ups.ups_processor import UPSDataProcessor
+from src.core.validation import InputValidator, get_report_json_path
+
+
+def test_rows_are_source_rows_after_blank_rows(tmp_path):
+    """源文件中的空行在读取时被删除，检查结果的行号仍为源文件中的Excel行号"""
+    data = pd.DataFrame({"转单号": ["A1", None, "A2", None, "A3"], "件数": [1, None, 2, None, -3]})
+    input_file = tmp_path / "input.xlsx"
+    data.to_excel(input_file, index=False)
+    loaded = ExcelProcessor().get_original_file_data(str(input_file), 0)
+    assert len(loaded) == 3
+
+    report = InputValidator(numeric_fields=["件数"]).validate(loaded)
+
+    # 源文件：第1行为表头，A3（件数为负数）在第6行
+    assert report.rules["negative_件数"]["rows"] == [4]
+    workbook = Workbook()
+    report.write_sheet(workbook)
+    assert workbook["数据检查"]["E2"].value == "6"
+
+
+def test_detail_rows_use_detail_labels():
+    data = pd.DataFrame({"客户单号": ["O1", "O2"]})
+    detail = pd.DataFrame({"客户单号": ["O1", "X9", "O2"]}, index=[0, 3, 5])
+
+    report = InputValidator(numeric_fields=[]).validate(data, detail)
+
+    assert report.rules["orphan_detail_order"]["rows"] == [3]
+
+
+def test_json_report_written_after_save(ups_template, tmp_path):
+    main, detail = make_manifest(20)
+    output_path = tmp_path / "out.xlsx"
+
+    assert UPSDataProcessor().process_ups_data(main, detail, str(ups_template), str(output_path), validation="json")
+
+    report = json.loads(get_report_json_path(output_path).read_text(encoding="utf-8"))
+    assert "issue_count" in report
+    assert output_path.exists()
+
+
+def test_json_report_failure_does_not_fail_processing(ups_template, tmp_path):
+    main, detail = make_manifest(20)
+    output_path = tmp_path / "out.xlsx"
+    # 检查结果文件的位置被目录占用，无法写入
+    get_report_json_path(output_path).mkdir()
+
+    assert UPSDataProcessor().process_ups_data(main, detail, str(ups_template), str(output_path), validation="json")
+    assert output_path.exists()